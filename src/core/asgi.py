@@ -7,10 +7,30 @@ For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
 
+import asyncio
 import os
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from localpay.services.pooled_client import close_all_clients  # noqa: E402  (needs configured settings)
+
+
+async def application(scope, receive, send):
+    # Django does not speak the lifespan protocol; handle it here so the
+    # pooled clients (OSMP gateway, Planup, KKM, Telegram) are closed cleanly
+    # when the server shuts down.
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await asyncio.to_thread(close_all_clients)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
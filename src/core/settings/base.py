@@ -102,6 +102,17 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Первый хешер - политика для новых паролей; пароль, сделанный другим хешером или
+# с другим числом итераций, перехешируется при следующем входе.
+# Argon2 (нужен пакет argon2-cffi): поставить Argon2PasswordHasher первым.
+PASSWORD_HASHERS = [
+    'localpay.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 
 
 INTERNAL_IPS = [
@@ -146,7 +157,7 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.TokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'localpay.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_RENDERER_CLASSES': (
         'rest_framework.renderers.JSONRenderer',
@@ -154,6 +165,11 @@ REST_FRAMEWORK = {
 }
 
 
+# Настройки localpay: значения по умолчанию - только в DEFAULT_* модуля, который их читает; здесь - лишь отличия,
+# например KKM = {'URL': 'http://10.0.0.5:1234'}.
+#   OSMP_GATEWAY, PLANUP, PLANUP_MIRROR, REPORT_JOBS, MOBILE_HISTORY, USER_PROJECTIONS, AUTH_USER_CACHE,
+#   ACCOUNT_CHECK_CACHE, LISTING_COUNTS, KKM, KKM_SCHEDULER, FISCAL_RECEIPTS, TELEGRAM - localpay/services/<имя строчными>.py
+#   PASSWORD_HASHING - localpay/hashers.py; SEARCH_BACKEND - localpay/search.py
 
 
 SIMPLE_JWT = {
@@ -229,6 +245,13 @@ LOGGING = {
             'filename': './logs/mobile_user_detail.log',
             'formatter': 'verbose',},
 
+        'file_kkm': {
+            'level': 'INFO',
+            'class': 'logging.FileHandler',
+            'filename': './logs/kkm.log',
+            'formatter': 'verbose',
+        },
+
         'console': {
             'level': 'DEBUG',
             'class': 'logging.StreamHandler',
@@ -254,5 +277,10 @@ LOGGING = {
             'propagate': True,
          
         },
+        'kkm': {
+            'handlers': ['file_kkm', 'console'],
+            'level': 'INFO',
+            'propagate': True,
+        },
     }
 }
@@ -30,6 +30,12 @@ DATABASES = {
     }
 }
 
+# Уведомления в Telegram (localpay/services/telegram.py); без токена или чата - выключены
+TELEGRAM = {
+    'BOT_TOKEN': env('TELEGRAM_BOT_TOKEN', default=''),
+    'CHAT_ID': env('TELEGRAM_CHAT_ID', default=''),
+}
+
 # TEST_MODE = 'test' in sys.argv or 'pytest' in sys.argv[0]
 
 
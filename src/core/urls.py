@@ -3,16 +3,17 @@ from django.urls import path, re_path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework import permissions
 from localpay.views.user_views.user_views import UserListAPIView, UpdateUserAPIView , CreateUserAPIView , DeleteUserAPIView , UserDetailAPIView , RegionListView
-from localpay.views.payment_views.unloading_payments import  CombinedPaymentComparisonView
+from localpay.views.payment_views.unloading_payments import  CombinedPaymentComparisonView, CombinedPaymentComparisonStreamView
+from localpay.views.payment_views.comparison_jobs import ComparisonReportJobCreateView, ComparisonReportJobDetailView, ComparisonReportJobResultView
 from localpay.views.user_views.login_views import CustomTokenObtainPairView
 from localpay.views.payment_views.payment import PaymentCreateAPIView , PaymentUpdateAPIView
-from localpay.views.payment_views.payment_history import PaymentHistoryListAPIView 
+from localpay.views.payment_views.payment_history import PaymentHistoryListAPIView, PaymentHistoryExportAPIView, PaymentSummaryAPIView
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from localpay.views.mobile.user_payment import MobileUserPaymentHistoryListAPIView
 from localpay.views.mobile.user_detail import MobileUserDetailAPIView 
-from localpay.views.mobile.check_ls import AccountCheckView
-from localpay.views.comments_views.comments import CommentsList
+from localpay.views.mobile.check_ls import AccountCheckView, AccountCheckCacheStatsView
+from localpay.views.comments_views.comments import CommentsList, UserCommentsList, MobileUserCommentsList
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -33,6 +34,8 @@ urlpatterns = [
 
     path('api/create-payment/', PaymentCreateAPIView.as_view(), name='create-payment'), 
     path('api/payment-history/', PaymentHistoryListAPIView.as_view(), name='payment-history'),
+    path('api/payment-history/export/', PaymentHistoryExportAPIView.as_view(), name='payment-history-export'),
+    path('api/payment-history/summary/', PaymentSummaryAPIView.as_view(), name='payment-history-summary'),
     
     
     re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
@@ -50,11 +53,16 @@ urlpatterns+= [
 
 urlpatterns += [
     path('user/create/',CreateUserAPIView.as_view(), name='user-create'),
-    path('api/user/payment-comparison/', CombinedPaymentComparisonView.as_view(), name='payment-compare')]
+    path('api/user/payment-comparison/', CombinedPaymentComparisonView.as_view(), name='payment-compare'),
+    path('api/user/payment-comparison/stream/', CombinedPaymentComparisonStreamView.as_view(), name='payment-compare-stream'),
+    path('api/user/payment-comparison/jobs/', ComparisonReportJobCreateView.as_view(), name='payment-compare-jobs'),
+    path('api/user/payment-comparison/jobs/<uuid:pk>/', ComparisonReportJobDetailView.as_view(), name='payment-compare-job'),
+    path('api/user/payment-comparison/jobs/<uuid:pk>/result/', ComparisonReportJobResultView.as_view(), name='payment-compare-job-result')]
 
 
 urlpatterns += [
     path('users/<int:pk>/', UserDetailAPIView.as_view(), name='user-detail'),
+    path('users/<int:pk>/comments/', UserCommentsList.as_view(), name='user-comments'),
     path('users/', UserListAPIView.as_view(), name='user-list-create'),
     path('users/<int:pk>/update_user/',UpdateUserAPIView.as_view(), name='update_user'),
     path('user/<int:pk>/delete_user/',DeleteUserAPIView.as_view(), name='delete-user'),
@@ -64,7 +72,9 @@ urlpatterns += [
 urlpatterns += [
     path('mobile/user-payments/', MobileUserPaymentHistoryListAPIView.as_view() , name='mobile-user-payments'),
     path('mobile/user-detail/', MobileUserDetailAPIView.as_view(), name='mobile-user-detail'),
-    path('api/check-account/',AccountCheckView.as_view(), name='check_account')]
+    path('mobile/user-comments/', MobileUserCommentsList.as_view(), name='mobile-user-comments'),
+    path('api/check-account/',AccountCheckView.as_view(), name='check_account'),
+    path('api/check-account/stats/',AccountCheckCacheStatsView.as_view(), name='check_account_stats')]
 
 
 urlpatterns += [
@@ -1,5 +1,50 @@
 from django.contrib import admin
+from django.db import transaction
 from .models import User_mon , Pays
+from .services.payment_rollup import rollup_state
+from .services.payments import payment_changed
+from .services.auth_user_cache import invalidate_auth_user
 
-admin.site.register(User_mon)
-admin.site.register(Pays)
+
+# Правки платежей из админки тоже переносятся в сводку по дням и сбрасывают кэш истории
+class PaysAdmin(admin.ModelAdmin):
+
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        before = rollup_state(Pays.objects.filter(pk=obj.pk).first()) if change else None
+        super().save_model(request, obj, form, change)
+        payment_changed(obj, before, rollup_state(obj))
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        payment_changed(obj, rollup_state(obj), None)
+        super().delete_model(request, obj)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            payment_changed(obj, rollup_state(obj), None)
+        super().delete_queryset(request, queryset)
+
+
+# Изменения монтажника из админки сбрасывают его в кэше JWT-аутентификации
+class UserMonAdmin(admin.ModelAdmin):
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidate_auth_user(obj.pk)
+
+    def delete_model(self, request, obj):
+        pk = obj.pk
+        super().delete_model(request, obj)
+        invalidate_auth_user(pk)
+
+    def delete_queryset(self, request, queryset):
+        pks = list(queryset.values_list('pk', flat=True))
+        super().delete_queryset(request, queryset)
+        for pk in pks:
+            invalidate_auth_user(pk)
+
+
+admin.site.register(User_mon, UserMonAdmin)
+admin.site.register(Pays, PaysAdmin)
@@ -0,0 +1,63 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from localpay.services.auth_user_cache import auth_users
+
+
+# JWT authentication that takes the user from the per-process cache (services/auth_user_cache.py)
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user = auth_users.get(self.get_user_id(validated_token))
+        if user is not None:
+            return self.check_revoked(user, validated_token)
+
+        user = super().get_user(validated_token)
+        auth_users.put(user)
+        return user
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+    def check_revoked(self, user, validated_token):
+        # неактивные в кэш не попадают; смену пароля проверяем и для закэшированных
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
+
+
+# JWT authentication with a native async user lookup (for async views)
+class AsyncJWTAuthentication(CachedJWTAuthentication):
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        user = auth_users.get(user_id)
+        if user is not None:
+            return self.check_revoked(user, validated_token)
+
+        user = await self.user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).afirst()
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        auth_users.put(user)
+        return self.check_revoked(user, validated_token)
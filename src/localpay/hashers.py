@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+DEFAULT_PASSWORD_HASHING = {
+    # None - число итераций Django по умолчанию
+    'PBKDF2_ITERATIONS': None,
+}
+
+
+def password_hashing_settings():
+    return {**DEFAULT_PASSWORD_HASHING, **getattr(settings, 'PASSWORD_HASHING', {})}
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with the work factor taken from settings.PASSWORD_HASHING.
+
+    It keeps Django's algorithm name, so stored hashes stay valid. A hash
+    made with another iteration count is re-hashed on the next successful
+    login (check_password() saves it through must_update()).
+    """
+
+    @property
+    def iterations(self):
+        return password_hashing_settings()['PBKDF2_ITERATIONS'] or PBKDF2PasswordHasher.iterations
@@ -0,0 +1,117 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import AsyncClient, RequestFactory, override_settings
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from localpay.management.fake_osmp import FakeOsmpGateway
+from localpay.models import Pays, User_mon
+from localpay.permission import IsUser
+from localpay.serializers.payment_serializers.payment_serializer import PaymentSerializer
+from localpay.services.osmp_gateway import gateway
+
+
+BENCH_LOGIN = 'bench-installer'
+
+
+# Прежний путь: синхронный DRF view + async_to_sync (gunicorn sync worker)
+class LegacyPaymentCreateAPIView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsUser]
+
+    def post(self, request):
+        serializer = PaymentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(async_to_sync(serializer.process_payment)())
+
+
+def summarize(label, latencies, elapsed):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    return (
+        f'{label:<28} {len(latencies):>6} req  {elapsed:>7.2f} s  {len(latencies) / elapsed:>8.1f} req/s  '
+        f'p50 {statistics.median(latencies) * 1000:>7.1f} ms  p95 {p95 * 1000:>7.1f} ms'
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark /api/create-payment/: legacy WSGI path (sync workers + async_to_sync) '
+        'against the native async ASGI view, both talking to a local fake OSMP gateway. '
+        'Writes payments for a temporary "bench-installer" user into the configured database '
+        'and removes them afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--concurrency', type=int, default=200, help='in-flight requests on the ASGI path')
+        parser.add_argument('--wsgi-workers', type=int, default=2, help='gunicorn sync workers to emulate')
+        parser.add_argument('--delay', type=float, default=0.1, help='fake gateway latency per call, seconds')
+
+    def handle(self, *args, **options):
+        fake = FakeOsmpGateway(delay=options['delay']).start()
+        user = User_mon.objects.create_user(
+            name='Bench', login=BENCH_LOGIN, password=None,
+            balance=10 ** 12, avail_balance=0, access=True, is_active=True, role='user',
+        )
+        token = str(AccessToken.for_user(user))
+        payload = {'ls': 175050620, 'login': BENCH_LOGIN, 'money': 1.0, 'service_type': 'bench'}
+
+        try:
+            with override_settings(OSMP_GATEWAY={'URL': fake.url, 'MAX_CONNECTIONS': options['concurrency'] * 2}):
+                gateway.close()  # пересоздать пул с настройками бенчмарка
+                wsgi = self.run_wsgi(options, token, payload)
+                asgi = self.run_asgi(options, token, payload)
+        finally:
+            Pays.objects.filter(user=user).delete()
+            user.delete()
+            gateway.close()
+            fake.stop()
+
+        self.stdout.write(f'fake gateway: {options["delay"] * 1000:.0f} ms per call, {fake.connections} TCP connections opened')
+        self.stdout.write(summarize(f'WSGI ({options["wsgi_workers"]} sync workers)', *wsgi))
+        self.stdout.write(summarize(f'ASGI ({options["concurrency"]} in flight)', *asgi))
+
+    def run_wsgi(self, options, token, payload):
+        view = LegacyPaymentCreateAPIView.as_view()
+        factory = RequestFactory()
+
+        def one(_):
+            started = time.perf_counter()
+            request = factory.post('/api/create-payment/', payload, HTTP_AUTHORIZATION=f'Bearer {token}')
+            response = view(request)
+            assert response.status_code == 200, response.data
+            close_old_connections()
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['wsgi_workers']) as pool:
+            latencies = list(pool.map(one, range(options['requests'])))
+        return latencies, time.perf_counter() - started
+
+    def run_asgi(self, options, token, payload):
+        async def run():
+            client = AsyncClient()
+            headers = {'Authorization': f'Bearer {token}'}
+            semaphore = asyncio.Semaphore(options['concurrency'])
+
+            async def one():
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.post('/api/create-payment/', payload, headers=headers)
+                    assert response.status_code == 200, response.content
+                    return time.perf_counter() - started
+
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*(one() for _ in range(options['requests'])))
+            return list(latencies), time.perf_counter() - started
+
+        return asyncio.run(run())
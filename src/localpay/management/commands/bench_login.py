@@ -0,0 +1,69 @@
+import time
+
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from localpay.models import User_mon
+from localpay.serializers.login import CustomTokenObtainPairSerializer
+
+
+BENCH_LOGIN = 'bench-login'
+BENCH_PASSWORD = 'bench-password-123'
+ARGON2 = 'django.contrib.auth.hashers.Argon2PasswordHasher'
+
+
+# Прежний вход: check_password(), затем TokenObtainSerializer.validate() -> authenticate() хеширует еще раз
+class LegacyTokenObtainPairSerializer(CustomTokenObtainPairSerializer):
+    def validate(self, attrs):
+        attrs['username'] = attrs['login']
+        user = User_mon.objects.get(login=attrs['login'])
+        if not user.check_password(attrs['password']):
+            raise serializers.ValidationError('Invalid login or password.')
+        self.user = user
+        return TokenObtainPairSerializer.validate(self, attrs)
+
+
+class Command(BaseCommand):
+    help = (
+        'Logins per second on one core: the legacy double password check vs the single check, '
+        'for the configured hasher and optional PBKDF2 iteration counts / Argon2.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20, help='logins per measurement')
+        parser.add_argument('--iterations', type=int, nargs='*', default=[], help='extra PBKDF2 iteration counts to try')
+        parser.add_argument('--argon2', action='store_true', help='also measure Argon2 (needs argon2-cffi)')
+
+    def handle(self, *args, **options):
+        user = User_mon.objects.create_user(name='Bench', login=BENCH_LOGIN, password=BENCH_PASSWORD, is_active=True, role='user')
+        try:
+            hasher = get_hasher()
+            self.stdout.write(f'{options["logins"]} logins per measurement, hasher {hasher.algorithm}')
+            self.stdout.write(self.row('legacy (2 hashes)', self.measure(LegacyTokenObtainPairSerializer, options)))
+            self.stdout.write(self.row('single check', self.measure(CustomTokenObtainPairSerializer, options)))
+
+            for iterations in options['iterations']:
+                with override_settings(PASSWORD_HASHING={'PBKDF2_ITERATIONS': iterations}):
+                    self.stdout.write(self.row(f'single, {iterations} it.', self.measure(CustomTokenObtainPairSerializer, options)))
+            if options['argon2']:
+                with override_settings(PASSWORD_HASHERS=[ARGON2, 'localpay.hashers.TunedPBKDF2PasswordHasher']):
+                    self.stdout.write(self.row('single, argon2', self.measure(CustomTokenObtainPairSerializer, options)))
+        finally:
+            user.delete()
+
+    def measure(self, serializer_class, options):
+        def login():
+            serializer = serializer_class(data={'login': BENCH_LOGIN, 'password': BENCH_PASSWORD})
+            serializer.is_valid(raise_exception=True)
+
+        login()  # первый вход перехеширует пароль под текущую политику
+        started = time.process_time()
+        for _ in range(options['logins']):
+            login()
+        return options['logins'] / (time.process_time() - started)
+
+    def row(self, label, rate):
+        return f'  {label:<24} {rate:>8.1f} logins/s per core  {1000 / rate:>7.1f} ms CPU per login'
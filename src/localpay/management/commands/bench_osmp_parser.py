@@ -0,0 +1,50 @@
+import timeit
+import warnings
+
+from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
+from django.core.management.base import BaseCommand
+
+from localpay.management.fake_osmp import PAY_REPLY
+from localpay.services.osmp_parser import parse_osmp_response
+
+
+# Прежний разбор: BeautifulSoup(xml), при ошибке повторный разбор через lxml HTML
+def legacy_parse(text):
+    try:
+        soup = BeautifulSoup(text, features="xml")
+        return {
+            'transaction_id': soup.find('osmp_txn_id').string,
+            'comment': soup.find('comment').string,
+            'sum': soup.find('sum').string,
+            'status': soup.find('result').string,
+        }
+    except Exception as e:
+        soup = BeautifulSoup(text, 'lxml')
+        return {
+            'transaction_id': soup.find('osmp_txn_id').string,
+            'sum': soup.find('sum').string,
+            'status': soup.find('result').string,
+            'error': str(e),
+        }
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark of OSMP reply parsing: legacy BeautifulSoup path vs localpay.services.osmp_parser.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=5000, help='parses per measurement')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        pay = PAY_REPLY.format(txn_id=123456789, sum='50.0')
+        samples = {
+            'pay reply': pay,
+            'pay reply without <comment> (double parse)': pay.replace('<comment>OK</comment>', ''),
+        }
+        warnings.filterwarnings('ignore', category=XMLParsedAsHTMLWarning)
+        for label, text in samples.items():
+            body = text.encode('utf-8')
+            self.stdout.write(label)
+            for name, func in (('BeautifulSoup', lambda: legacy_parse(text)), ('osmp_parser', lambda: parse_osmp_response(body))):
+                best = min(timeit.repeat(func, number=options['number'], repeat=options['repeat']))
+                self.stdout.write(f'  {name:<14} {best / options["number"] * 1e6:>9.1f} us/parse')
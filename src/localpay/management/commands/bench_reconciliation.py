@@ -0,0 +1,90 @@
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+
+from localpay.services.reconciliation import MISSING_IN_LOCALPAY, MISSING_IN_PLANUP, format_money, reconcile
+from localpay.utils import format_payment_date
+
+
+# Прежнее сопоставление из CombinedPaymentComparisonView.compare_payments (без запросов к БД):
+# для каждого платежа Planup линейный поиск по платежам монтажника
+def legacy_compare(localpay, planup_payments, names):
+    report = {}
+    for row in localpay:
+        user_id = row['user_id']
+        if user_id not in report:
+            report[user_id] = {"user_id": user_id, "name": row['user__name'], "surname": row['user__surname'], "payments": []}
+        report[user_id]["payments"].append({
+            "ls_abon": row['ls_abon'], "localpay_money": format_money(row['amount_minor'] or 0),
+            "planup_money": MISSING_IN_PLANUP, "planup_id": None, "date_payment": format_payment_date(row['paid_at']),
+        })
+    for payment in planup_payments:
+        user_id = payment["user_id"]
+        if user_id not in report:
+            name, surname = names[user_id]
+            report[user_id] = {"user_id": user_id, "name": name, "surname": surname, "payments": []}
+        matching = next((p for p in report[user_id]["payments"]
+                         if p["ls_abon"] == payment["ls_abon"] and p["localpay_money"] == format_money(payment["money"])), None)
+        if matching:
+            matching["planup_money"] = format_money(payment["money"])
+            matching["planup_id"] = payment["planup_id"]
+        else:
+            report[user_id]["payments"].append({
+                "ls_abon": payment["ls_abon"], "localpay_money": MISSING_IN_LOCALPAY,
+                "planup_money": format_money(payment["money"]), "planup_id": payment["planup_id"],
+            })
+    return list(report.values())
+
+
+def synthetic(installers, per_installer, seed=1):
+    """LocalPay rows and Planup payments: ~90% matched, the rest missing on one side."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+    localpay, planup_payments = [], []
+    for user_id in range(1, installers + 1):
+        for i in range(per_installer):
+            ls_abon = str(175000000 + rng.randrange(per_installer * 2))
+            money = rng.choice((30000, 50000, 70000, 100000))
+            side = rng.random()
+            if side < 0.95:
+                localpay.append({
+                    'user_id': user_id, 'ls_abon': ls_abon, 'amount_minor': money, 'status_payment': 'Выполнен',
+                    'paid_at': start + timedelta(minutes=i), 'user__name': f'Имя{user_id}', 'user__surname': 'Фамилия',
+                })
+            if side > 0.05:
+                planup_payments.append({'user_id': user_id, 'ls_abon': ls_abon, 'money': money,
+                                        'planup_id': user_id * 100000 + i, 'end_date': None})
+    return localpay, planup_payments
+
+
+class Command(BaseCommand):
+    help = 'Benchmark of payment comparison matching: legacy linear scan vs localpay.services.reconciliation.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--installers', type=int, default=20)
+        parser.add_argument('--per-installer', type=int, default=2000, help='payments per installer on each side')
+        parser.add_argument('--skip-legacy', action='store_true', help='only time the hash join (for large sizes)')
+
+    def handle(self, *args, **options):
+        localpay, planup_payments = synthetic(options['installers'], options['per_installer'])
+        names = {user_id: (f'Имя{user_id}', 'Фамилия') for user_id in range(1, options['installers'] + 1)}
+        self.stdout.write(f'{len(localpay)} LocalPay rows, {len(planup_payments)} Planup payments')
+
+        started = time.perf_counter()
+        report = reconcile(localpay, planup_payments, load_names=lambda ids: {i: names[i] for i in ids})
+        self.stdout.write(f'  hash join    {time.perf_counter() - started:>8.3f} s')
+        matched = sum(p['planup_id'] is not None and p['localpay_money'] != MISSING_IN_LOCALPAY
+                      for row in report for p in row['payments'])
+
+        if not options['skip_legacy']:
+            started = time.perf_counter()
+            legacy = legacy_compare(localpay, planup_payments, names)
+            self.stdout.write(f'  linear scan  {time.perf_counter() - started:>8.3f} s')
+            legacy_matched = sum(p['planup_id'] is not None and p['localpay_money'] != MISSING_IN_LOCALPAY
+                                 for row in legacy for p in row['payments'])
+            # прежний код мог сопоставить одну строку LocalPay нескольким платежам Planup
+            self.stdout.write(f'  matched pairs: hash join {matched}, linear scan {legacy_matched}')
+        else:
+            self.stdout.write(f'  matched pairs: {matched}')
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from localpay.services.payment_rollup import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily payment rollup from Pays (historic data, or after edits made outside the services).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', help='first day, YYYY-MM-DD (default: from the beginning)')
+        parser.add_argument('--date-to', help='last day, YYYY-MM-DD (default: up to now)')
+        parser.add_argument('--user-id', type=int, help='only this installer')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = rebuild_rollup(options['date_from'], options['date_to'], options['user_id'])
+        self.stdout.write(f'{written} rollup row(s) written in {time.perf_counter() - started:.1f} s')
@@ -0,0 +1,36 @@
+import asyncio
+import signal
+
+from django.core.management.base import BaseCommand
+
+from localpay.services.kkm_scheduler import kkm_jobs, run_kkm_worker
+
+
+class Command(BaseCommand):
+    help = (
+        'KKM worker: opens and closes the shift and checks the register on schedule. '
+        'Several workers can run for failover; only the holder of the PostgreSQL advisory lock fires the jobs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--run', choices=[job.name for job in kkm_jobs()],
+            help='run one job right away (without the leader lock) and exit',
+        )
+
+    def handle(self, *args, **options):
+        if options['run']:
+            job = next(job for job in kkm_jobs() if job.name == options['run'])
+            asyncio.run(job.func())
+            return
+
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+
+    async def serve(self):
+        stop = asyncio.Event()
+        # docker stop: доделать начатые задания и отпустить замок
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        await run_kkm_worker(stop)
@@ -0,0 +1,25 @@
+import asyncio
+import signal
+
+from django.core.management.base import BaseCommand
+
+from localpay.services.fiscal_receipts import run_receipt_worker
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker for the fiscal receipt queue: sends queued receipts to the KKM, '
+        'FISCAL_RECEIPTS["CONCURRENCY"] at a time, with retries and backoff.'
+    )
+
+    def handle(self, *args, **options):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+
+    async def serve(self):
+        stop = asyncio.Event()
+        # docker stop: доделать начатые чеки
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        await run_receipt_worker(stop)
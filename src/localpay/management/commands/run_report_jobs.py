@@ -0,0 +1,51 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from localpay.services.report_jobs import claim_next_job, report_job_settings, requeue_abandoned_jobs, run_report_job
+
+
+logger = logging.getLogger('payment_actions')
+
+
+class Command(BaseCommand):
+    help = 'Worker for background payment comparison reports (separate process from the web workers).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='process the queued jobs and exit')
+
+    def handle(self, *args, **options):
+        self.requeued_at = None
+        try:
+            while True:
+                try:
+                    self.requeue_abandoned()
+                    self.run_queued_jobs()
+                except Exception:
+                    # сбой БД и т.п. не должен останавливать воркер: повторим на следующем опросе
+                    logger.exception('Comparison report worker: poll failed')
+                if options['once']:
+                    return
+                time.sleep(report_job_settings()['POLL_INTERVAL'])
+                # долгоживущий процесс: между опросами закрыть устаревшие и сломанные соединения
+                close_old_connections()
+        except KeyboardInterrupt:
+            pass
+
+    def requeue_abandoned(self):
+        # задания упавшего воркера возвращаются в очередь, пока работают остальные воркеры
+        if self.requeued_at is not None and time.monotonic() - self.requeued_at < report_job_settings()['REQUEUE_INTERVAL']:
+            return
+        requeued = requeue_abandoned_jobs()
+        self.requeued_at = time.monotonic()
+        if requeued:
+            self.stdout.write(f'requeued {requeued} abandoned job(s)')
+
+    def run_queued_jobs(self):
+        while (job := claim_next_job()) is not None:
+            started = time.perf_counter()
+            run_report_job(job)
+            job.refresh_from_db(fields=['status'])
+            self.stdout.write(f'job {job.pk}: {job.status} in {time.perf_counter() - started:.1f} s')
@@ -0,0 +1,45 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from localpay.services.comparison_report import report_installers
+from localpay.services.planup_mirror import planup_mirror_settings, sync_planup
+
+
+class Command(BaseCommand):
+    help = 'Refresh the local copy of Planup work orders (only the stale days of each installer).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', help='first day, YYYY-MM-DD (default: SETTLED_AFTER_DAYS days ago)')
+        parser.add_argument('--date-to', help='last day, YYYY-MM-DD (default: today)')
+        parser.add_argument('--user-id', type=int, action='append', help='installer id, can be repeated')
+        parser.add_argument('--force', action='store_true', help='refetch every day of the period')
+        parser.add_argument('--interval', type=float, help='keep running, syncing every INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                self.sync(options)
+                if not options['interval']:
+                    return
+                time.sleep(options['interval'])
+                # долгоживущий процесс: между прогонами закрыть устаревшие и сломанные соединения
+                close_old_connections()
+        except KeyboardInterrupt:
+            pass
+
+    def sync(self, options):
+        today = timezone.localdate()
+        date_from = options['date_from'] or (today - timedelta(days=planup_mirror_settings()['SETTLED_AFTER_DAYS'])).isoformat()
+        date_to = options['date_to'] or today.isoformat()
+        installers, failures = report_installers(options['user_id'])
+
+        started = time.perf_counter()
+        synced, sync_failures = sync_planup(installers, date_from, date_to, force=options['force'])
+        failures += sync_failures
+        self.stdout.write(f'{date_from} - {date_to}: {synced} window(s) refreshed in {time.perf_counter() - started:.1f} s')
+        for failure in failures:
+            self.stderr.write(f"  installer {failure['user_id']} (planup_id {failure['planup_id']}): {failure['error']}")
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+
+CHECK_REPLY = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<response><osmp_txn_id></osmp_txn_id><result>0</result><fio>Тестовый Абонент</fio>'
+    '<comment>OK</comment></response>'
+)
+PAY_REPLY = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<response><osmp_txn_id>{txn_id}</osmp_txn_id><sum>{sum}</sum><result>0</result>'
+    '<comment>OK</comment></response>'
+)
+
+
+class FakeOsmpGateway:
+    """Keep-alive HTTP/1.1 stand-in for the OSMP gateway, used by benchmarks.
+
+    Answers check/pay commands with a successful reply after `delay` seconds,
+    which models the gateway round trip without touching pay.snt.kg.
+    """
+
+    def __init__(self, delay=0.1, host='127.0.0.1'):
+        self.delay = delay
+        self.host = host
+        self.port = None
+        self.connections = 0
+        self.requests = 0
+        self._loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self.port}/localpayskynet_osmp/main'
+
+    def start(self):
+        threading.Thread(target=self._run, name='fake-osmp', daemon=True).start()
+        self._started.wait()
+        return self
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        server = self._loop.run_until_complete(asyncio.start_server(self._handle, self.host, 0, backlog=1024))
+        self.port = server.sockets[0].getsockname()[1]
+        self._started.set()
+        self._loop.run_forever()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                headers = dict(line.split(': ', 1) for line in header_lines if ': ' in line)
+                length = int(headers.get('Content-Length', headers.get('content-length', 0)))
+                if length:
+                    await reader.readexactly(length)
+
+                self.requests += 1
+                params = {k: v[0] for k, v in parse_qs(urlsplit(request_line.split()[1]).query).items()}
+                await asyncio.sleep(self.delay)
+
+                if params.get('command') == 'pay':
+                    body = PAY_REPLY.format(txn_id=self.requests, sum=params.get('sum', '0'))
+                else:
+                    body = CHECK_REPLY
+                body = body.encode('utf-8')
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Type: text/xml; charset=utf-8\r\n'
+                    b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,42 @@
+from django.contrib.postgres.indexes import PostgresIndex
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db.migrations import AddIndex, RunSQL
+
+
+class AddIndexConcurrentlyIfPostgres(AddIndexConcurrently):
+    """CREATE INDEX CONCURRENTLY on PostgreSQL, a plain AddIndex elsewhere (SQLite in tests).
+
+    PostgreSQL-only indexes (GIN, ...) are skipped on other databases.
+    Migrations using it must set atomic = False.
+    """
+
+    def _portable(self):
+        return not isinstance(self.index, PostgresIndex)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        if self._portable():
+            return AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        if self._portable():
+            return AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class RunSQLIfPostgres(RunSQL):
+    """RunSQL that runs on PostgreSQL only and is a no-op elsewhere (SQLite in tests).
+
+    For PostgreSQL-only objects that Django cannot render or keep in model
+    state, e.g. expression GIN indexes with an operator class.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('localpay', '0003_alter_user_mon_avail_balance_alter_user_mon_balance_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pays',
+            name='amount_minor',
+            field=models.BigIntegerField(null=True, verbose_name='Сумма (тыйын)'),
+        ),
+        migrations.AddField(
+            model_name='pays',
+            name='paid_at',
+            field=models.DateTimeField(null=True, verbose_name='Дата оплаты'),
+        ),
+    ]
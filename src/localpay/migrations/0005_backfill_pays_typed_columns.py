@@ -0,0 +1,80 @@
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.db import migrations, transaction
+from django.utils import timezone
+
+
+BATCH_SIZE = 2000
+
+_FRACTION = re.compile(r'\.(\d+)$')
+
+
+def parse_money(value):
+    try:
+        return int((Decimal(str(value).strip().replace(',', '.')) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def parse_date_payment(value):
+    # str(datetime.now())[:-4] -> '2024-11-13 08:48:12.12'; fromisoformat до 3.11 требует 3 или 6 знаков
+    if not value:
+        return None
+    value = _FRACTION.sub(lambda m: '.' + m.group(1).ljust(6, '0')[:6], value.strip())
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def backfill(apps, schema_editor):
+    """Fill amount_minor/paid_at from the legacy string columns.
+
+    Walks the table by primary key in batches of BATCH_SIZE, each batch in
+    its own short transaction, so rows are never locked for long and the
+    migration can be re-run after an interruption.
+    """
+    Pays = apps.get_model('localpay', 'Pays')
+    alias = schema_editor.connection.alias
+    last_id = 0
+
+    while True:
+        batch = list(
+            Pays.objects.using(alias)
+            .filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'money', 'date_payment', 'updated_at', 'amount_minor', 'paid_at')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_id = batch[-1][0]
+
+        changed = []
+        for pk, money, date_payment, updated_at, amount_minor, paid_at in batch:
+            if amount_minor is not None and paid_at is not None:
+                continue
+            changed.append(Pays(
+                id=pk,
+                amount_minor=amount_minor if amount_minor is not None else parse_money(money),
+                paid_at=paid_at or parse_date_payment(date_payment) or updated_at,
+            ))
+
+        if changed:
+            with transaction.atomic(using=alias):
+                Pays.objects.using(alias).bulk_update(changed, ['amount_minor', 'paid_at'])
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('localpay', '0004_pays_amount_minor_paid_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
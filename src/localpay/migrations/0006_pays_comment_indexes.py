@@ -0,0 +1,37 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:01
+
+from django.db import migrations, models
+from localpay.migration_operations import AddIndexConcurrentlyIfPostgres
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY не работает внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('localpay', '0005_backfill_pays_typed_columns'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfPostgres(
+            model_name='comment',
+            index=models.Index(fields=['-created_at', '-id'], name='comment_created_at_idx'),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='pays',
+            index=models.Index(fields=['user', '-paid_at', '-id'], name='pays_user_paid_at_idx'),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='pays',
+            index=models.Index(fields=['-paid_at', '-id'], name='pays_paid_at_idx'),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='pays',
+            index=models.Index(fields=['ls_abon'], name='pays_ls_abon_idx'),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='pays',
+            index=models.Index(fields=['number_payment'], name='pays_number_payment_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:05
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+from localpay.migration_operations import RunSQLIfPostgres
+
+
+# под UPPER(field) LIKE '%...%', который Django строит для __icontains
+TRIGRAM_INDEXES = [
+    ('pays_ls_abon_trgm_idx', 'localpay_pays', 'ls_abon'),
+    ('user_name_trgm_idx', 'localpay_user_mon', 'name'),
+    ('user_surname_trgm_idx', 'localpay_user_mon', 'surname'),
+    ('user_login_trgm_idx', 'localpay_user_mon', 'login'),
+]
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY не работает внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('localpay', '0006_pays_comment_indexes'),
+    ]
+
+    operations = [
+        # pg_trgm; на других базах операция ничего не делает
+        TrigramExtension(),
+        # индексы выражений с классом операторов Django 5.1 собирает в неверный SQL,
+        # поэтому они создаются вручную и в состояние моделей не попадают
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                RunSQLIfPostgres(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" USING gin (UPPER("{column}") gin_trgm_ops)',
+                    reverse_sql=f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"',
+                )
+                for name, table, column in TRIGRAM_INDEXES
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:28
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('localpay', '0007_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComparisonReportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_from', models.DateField(verbose_name='С')),
+                ('date_to', models.DateField(verbose_name='По')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка'), ('cancelled', 'Отменено')], default='queued', max_length=20, verbose_name='Статус')),
+                ('cancel_requested', models.BooleanField(default=False, verbose_name='Запрошена отмена')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Результат')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('installer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Монтажник')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Кто запросил')),
+            ],
+            options={
+                'verbose_name': 'Сверка с Planup',
+                'verbose_name_plural': 'Сверки с Planup',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='report_job_queue_idx'), models.Index(fields=['installer', 'date_from', 'date_to', '-created_at'], name='report_job_params_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('localpay', '0008_comparison_report_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlanupPayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('planup_id', models.BigIntegerField(unique=True, verbose_name='Наряд Planup')),
+                ('ls_abon', models.CharField(max_length=100, verbose_name='Лицевой счет')),
+                ('amount_minor', models.BigIntegerField(verbose_name='Сумма (тыйын)')),
+                ('end_date', models.CharField(blank=True, max_length=100, null=True)),
+                ('closed_on', models.DateField(verbose_name='Дата')),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+                ('installer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='planup_payments', to=settings.AUTH_USER_MODEL, verbose_name='Монтажник')),
+            ],
+            options={
+                'verbose_name': 'Наряд Planup',
+                'verbose_name_plural': 'Наряды Planup',
+                'indexes': [models.Index(fields=['installer', 'closed_on'], name='planup_payment_period_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PlanupSyncWindow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('synced_at', models.DateTimeField(verbose_name='Синхронизировано')),
+                ('installer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Монтажник')),
+            ],
+            options={
+                'verbose_name': 'Окно синхронизации Planup',
+                'verbose_name_plural': 'Окна синхронизации Planup',
+                'constraints': [models.UniqueConstraint(fields=('installer', 'day'), name='planup_sync_window_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill(apps, schema_editor):
+    # первое наполнение сводки; дальше - manage.py rebuild_payment_rollup
+    Pays = apps.get_model('localpay', 'Pays')
+    PaymentDailyRollup = apps.get_model('localpay', 'PaymentDailyRollup')
+    alias = schema_editor.connection.alias
+    days = (Pays.objects.using(alias)
+            .filter(paid_at__isnull=False)
+            .annotate(day=TruncDate('paid_at'), status=Coalesce('status_payment', Value('')))
+            .values_list('user_id', 'day', 'status', 'annulment')
+            .annotate(count=Count('id'), amount=Coalesce(Sum('amount_minor'), 0))
+            .order_by())
+    PaymentDailyRollup.objects.using(alias).bulk_create(
+        (PaymentDailyRollup(user_id=user_id, day=day, status_payment=status, annulment=annulment,
+                            count=count, amount_minor=amount)
+         for user_id, day, status, annulment, count, amount in days),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('localpay', '0009_planup_mirror'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('status_payment', models.CharField(blank=True, max_length=100, verbose_name='Статус  оплаты')),
+                ('annulment', models.BooleanField(default=False, verbose_name='Аннулирование')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество')),
+                ('amount_minor', models.BigIntegerField(default=0, verbose_name='Сумма (тыйын)')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Монтажник')),
+            ],
+            options={
+                'verbose_name': 'Сводка платежей за день',
+                'verbose_name_plural': 'Сводки платежей за день',
+                'indexes': [models.Index(fields=['day'], name='payment_rollup_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'day', 'status_payment', 'annulment'), name='payment_rollup_key')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('localpay', '0010_payment_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user_mon',
+            name='payments_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Версия истории платежей'),
+        ),
+    ]
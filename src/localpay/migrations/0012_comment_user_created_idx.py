@@ -0,0 +1,21 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:57
+
+from django.db import migrations, models
+from localpay.migration_operations import AddIndexConcurrentlyIfPostgres
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY не работает внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('localpay', '0011_user_mon_payments_version'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfPostgres(
+            model_name='comment',
+            index=models.Index(fields=['user2', '-created_at', '-id'], name='comment_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('localpay', '0012_comment_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FiscalReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.JSONField(verbose_name='Данные чека')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Отправляется'), ('done', 'Пробит'), ('failed', 'Ошибка')], default='queued', max_length=20, verbose_name='Статус')),
+                ('steps_done', models.PositiveSmallIntegerField(default=0, verbose_name='Выполнено шагов')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Неудачных попыток')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Следующая попытка')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Ответ кассы')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('payment', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='fiscal_receipt', to='localpay.pays', verbose_name='Платеж')),
+            ],
+            options={
+                'verbose_name': 'Фискальный чек',
+                'verbose_name_plural': 'Фискальные чеки',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='fiscal_receipt_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('localpay', '0013_fiscal_receipt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fiscalreceipt',
+            name='in_doubt',
+            field=models.BooleanField(default=False, verbose_name='Итог шага неизвестен'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('localpay', '0014_fiscal_receipt_in_doubt'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pays',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='user_id', to=settings.AUTH_USER_MODEL, verbose_name='Монтажник'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('localpay', '0015_pays_user_drop_fk_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comparisonreportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
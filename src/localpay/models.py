@@ -1,25 +1,25 @@
+import uuid
+from decimal import InvalidOperation
+
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.base_user import AbstractBaseUser, BaseUserManager
-from django.db.models import Q
+from localpay.search import get_search_backend
+from localpay.utils import to_minor_units
 
 
 
 class BaseSearchManager(models.Manager):
-    def search(self, query=None, fields=None):
+    def search(self, query=None, fields=None, backend=None):
         qs = self.get_queryset()
         if query and fields:
             terms = query.strip().split()
-            final_query = Q()
-            for term in terms:
-                term_query = Q()
-                for field in fields:
-                    term_query |= Q(**{f"{field}__icontains": term})
-                final_query &= term_query
-            qs = qs.filter(final_query).distinct()
+            if terms:
+                backend = backend or get_search_backend(self.db)
+                qs = backend.search(qs, terms, fields)
         return qs
 
 
-
 # models for register users
 class UserManager(BaseUserManager):
     def _create_user(self, name, login,password=None, **extra_fields):
@@ -68,6 +68,8 @@ class User_mon(AbstractBaseUser):
     comment = models.TextField(blank=True)
     planup_id = models.BigIntegerField(default=0, null=True)
     role = models.CharField(max_length=20, default='user')
+    # растет при каждой записи платежа монтажника: ключ кэша мобильной истории
+    payments_version = models.PositiveIntegerField(default=0, verbose_name = 'Версия истории платежей')
 
 
     objects = UserManager()
@@ -78,6 +80,7 @@ class User_mon(AbstractBaseUser):
     class Meta:
          verbose_name = 'Пользователь'
          verbose_name_plural = 'Пользователи'
+         # GIN-индексы pg_trgm по UPPER(name/surname/login) - только в PostgreSQL, миграция 0007
     
     def __str__(self):
         return f"{self.surname} {self.name}"
@@ -118,11 +121,16 @@ class Pays(models.Model):
     accept_payment = models.CharField(max_length=100, null=True)
     ls_abon = models.CharField(max_length=100, null=True,verbose_name = 'Лицевой счет')
     money = models.CharField(max_length=30, null=True ,verbose_name = 'Сумма')
+    amount_minor = models.BigIntegerField(null=True, verbose_name = 'Сумма (тыйын)')
+    paid_at = models.DateTimeField(null=True, verbose_name = 'Дата оплаты')
     status_payment = models.CharField(max_length=100, null=True,verbose_name = 'Статус  оплаты')
     user = models.ForeignKey(verbose_name = 'Монтажник',
         to=User_mon,
         on_delete=models.CASCADE,
-        related_name='user_id'
+        related_name='user_id',
+        # отдельный индекс по user_id не нужен: его покрывает pays_user_paid_at_idx (user - первая колонка),
+        # а с ним планировщик уходил в user_id + Filter по периоду
+        db_index=False,
     )
     annulment = models.BooleanField(default=False, verbose_name = 'Аннулирование')
     document_number = models.CharField(max_length=100, null=True, blank=True)
@@ -135,10 +143,31 @@ class Pays(models.Model):
     class Meta:
          verbose_name = 'История  платежа'
          verbose_name_plural = 'История  платежей'
+         indexes = [
+             # история монтажника и сверка: user_id + период, новые сверху
+             models.Index(fields=['user', '-paid_at', '-id'], name='pays_user_paid_at_idx'),
+             # общая история: период, новые сверху
+             models.Index(fields=['-paid_at', '-id'], name='pays_paid_at_idx'),
+             models.Index(fields=['ls_abon'], name='pays_ls_abon_idx'),
+             models.Index(fields=['number_payment'], name='pays_number_payment_idx'),
+             # GIN-индекс pg_trgm по UPPER(ls_abon) - только в PostgreSQL, миграция 0007
+         ]
  
     def __str__(self) -> str:
         return self.status_payment
 
+    def save(self, *args, **kwargs):
+        # платеж без amount_minor (админка, старый код) - сумму берем из строковой колонки money
+        if self.amount_minor is None and self.money not in (None, ''):
+            try:
+                self.amount_minor = to_minor_units(str(self.money).strip().replace(',', '.'))
+            except (InvalidOperation, ValueError):
+                pass
+            else:
+                if kwargs.get('update_fields') is not None:
+                    kwargs['update_fields'] = {*kwargs['update_fields'], 'amount_minor'}
+        super().save(*args, **kwargs)
+
     # validate a write_off for payments
     def validate_write_off(self):
         if self.annulment is True:
@@ -149,8 +178,8 @@ class Pays(models.Model):
             if self.user.avail_balance >= 0:
                 raise ValueError("Доступный баланс не может быть больше 0")
 
-            new_balance = self.user.balance + self.money
-            new_avail_balance = self.user.avail_balance + self.money
+            new_balance = self.user.balance + self.amount_minor // 100
+            new_avail_balance = self.user.avail_balance + self.amount_minor // 100
 
             if new_balance <= 0:
                 raise ValueError("Итоговый баланс не может быть отрицательным после списания")
@@ -161,6 +190,34 @@ class Pays(models.Model):
             return new_balance, new_avail_balance
 
 
+# Сводка платежей монтажника по дням: ведется вместе с записью Pays (services/payment_rollup.py)
+class PaymentDailyRollup(models.Model):
+    user = models.ForeignKey(verbose_name = 'Монтажник',
+        to=User_mon,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    day = models.DateField(verbose_name = 'День')
+    status_payment = models.CharField(max_length=100, blank=True, verbose_name = 'Статус  оплаты')
+    annulment = models.BooleanField(default=False, verbose_name = 'Аннулирование')
+    count = models.IntegerField(default=0, verbose_name = 'Количество')
+    amount_minor = models.BigIntegerField(default=0, verbose_name = 'Сумма (тыйын)')
+
+    class Meta:
+         verbose_name = 'Сводка платежей за день'
+         verbose_name_plural = 'Сводки платежей за день'
+         constraints = [
+             models.UniqueConstraint(fields=['user', 'day', 'status_payment', 'annulment'], name='payment_rollup_key'),
+         ]
+         indexes = [
+             # итоги периода по всем монтажникам
+             models.Index(fields=['day'], name='payment_rollup_day_idx'),
+         ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.day} {self.status_payment}"
+
+
 # Payment history 
 class Comment(models.Model):
     user2 = models.ForeignKey(verbose_name = 'Монтажник',
@@ -181,6 +238,160 @@ class Comment(models.Model):
     class Meta:
          verbose_name = 'Операции платежей'
          verbose_name_plural = 'Операции платежей'
+         indexes = [
+             models.Index(fields=['-created_at', '-id'], name='comment_created_at_idx'),
+             models.Index(fields=['user2', '-created_at', '-id'], name='comment_user_created_idx'),
+         ]
 
     def __str__(self):
         return str(self.old_balance)
+
+
+# Фоновые задания сверки платежей с Planup
+class ComparisonReportJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+        (CANCELLED, 'Отменено'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    installer = models.ForeignKey(verbose_name = 'Монтажник',
+        to=User_mon,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    date_from = models.DateField(verbose_name = 'С')
+    date_to = models.DateField(verbose_name = 'По')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED, verbose_name = 'Статус')
+    cancel_requested = models.BooleanField(default=False, verbose_name = 'Запрошена отмена')
+    requested_by = models.ForeignKey(verbose_name = 'Кто запросил',
+        to=User_mon,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    result = models.JSONField(null=True, blank=True, verbose_name = 'Результат')
+    error = models.TextField(blank=True, verbose_name = 'Ошибка')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # воркер обновляет, пока считает задание; давно не обновлялось - воркер упал
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+         verbose_name = 'Сверка с Planup'
+         verbose_name_plural = 'Сверки с Planup'
+         indexes = [
+             # очередь воркера
+             models.Index(fields=['status', 'created_at'], name='report_job_queue_idx'),
+             # готовый отчет с теми же параметрами
+             models.Index(fields=['installer', 'date_from', 'date_to', '-created_at'], name='report_job_params_idx'),
+         ]
+
+    def __str__(self):
+        return f"{self.date_from} - {self.date_to} ({self.status})"
+
+
+# Очередь фискальных чеков ККМ (outbox): чек пишется в БД, на кассу его отправляет воркер
+class FiscalReceipt(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Отправляется'),
+        (DONE, 'Пробит'),
+        (FAILED, 'Ошибка'),
+    )
+
+    payment = models.OneToOneField(verbose_name = 'Платеж',
+        to=Pays,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='fiscal_receipt'
+    )
+    payload = models.JSONField(verbose_name = 'Данные чека')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED, verbose_name = 'Статус')
+    # сколько запросов open/add/close уже принято кассой; повтор продолжает со следующего
+    steps_done = models.PositiveSmallIntegerField(default=0, verbose_name = 'Выполнено шагов')
+    # попытка начала слать шаги и не узнала их итог (таймаут, падение воркера): шаг steps_done мог дойти до кассы
+    in_doubt = models.BooleanField(default=False, verbose_name = 'Итог шага неизвестен')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name = 'Неудачных попыток')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name = 'Следующая попытка')
+    result = models.JSONField(null=True, blank=True, verbose_name = 'Ответ кассы')
+    error = models.TextField(blank=True, verbose_name = 'Ошибка')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+         verbose_name = 'Фискальный чек'
+         verbose_name_plural = 'Фискальные чеки'
+         indexes = [
+             # очередь воркера
+             models.Index(fields=['status', 'next_attempt_at'], name='fiscal_receipt_queue_idx'),
+         ]
+
+    def __str__(self):
+        return f"Чек {self.pk} ({self.status})"
+
+
+# Локальная копия нарядов Planup для сверки
+class PlanupPayment(models.Model):
+    planup_id = models.BigIntegerField(unique=True, verbose_name = 'Наряд Planup')
+    installer = models.ForeignKey(verbose_name = 'Монтажник',
+        to=User_mon,
+        on_delete=models.CASCADE,
+        related_name='planup_payments'
+    )
+    ls_abon = models.CharField(max_length=100, verbose_name = 'Лицевой счет')
+    amount_minor = models.BigIntegerField(verbose_name = 'Сумма (тыйын)')
+    # end_date как пришел из Planup
+    end_date = models.CharField(max_length=100, null=True, blank=True)
+    # день окна синхронизации, в которое попал наряд
+    closed_on = models.DateField(verbose_name = 'Дата')
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+         verbose_name = 'Наряд Planup'
+         verbose_name_plural = 'Наряды Planup'
+         indexes = [
+             models.Index(fields=['installer', 'closed_on'], name='planup_payment_period_idx'),
+         ]
+
+    def __str__(self):
+        return f"{self.planup_id} ({self.ls_abon})"
+
+
+# Когда день монтажника последний раз забирался из Planup
+class PlanupSyncWindow(models.Model):
+    installer = models.ForeignKey(verbose_name = 'Монтажник',
+        to=User_mon,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    day = models.DateField(verbose_name = 'День')
+    synced_at = models.DateTimeField(verbose_name = 'Синхронизировано')
+
+    class Meta:
+         verbose_name = 'Окно синхронизации Planup'
+         verbose_name_plural = 'Окна синхронизации Planup'
+         constraints = [
+             models.UniqueConstraint(fields=['installer', 'day'], name='planup_sync_window_uniq'),
+         ]
+
+    def __str__(self):
+        return f"{self.installer_id} {self.day}"
@@ -0,0 +1,133 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from localpay.services.listing_counts import count_mode, listing_count
+
+
+class CustomLimitOffsetPagination(LimitOffsetPagination):
+    default_limit = 50  # количество элементов на странице по умолчанию
+    limit_query_param = 'limit'  # параметр запроса для установки лимита
+    offset_query_param = 'offset'  # параметр запроса для установки смещения
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        # один подсчет на запрос: точный, оценка или без подсчета (?count=)
+        self.count_mode = count_mode(request)
+        self.count = self.get_count(queryset, view)
+        self.offset = self.get_offset(request)
+        if self.count_mode == 'exact' and (self.count == 0 or self.offset > self.count):
+            return []
+        return list(queryset[self.offset:self.offset + self.limit])
+
+    def get_count(self, queryset, view=None):
+        # вью может знать точное количество без COUNT(*) (например, из сводной таблицы)
+        if self.count_mode != 'none' and hasattr(view, 'known_count'):
+            count = view.known_count()
+            if count is not None:
+                return count
+        return listing_count(queryset, self.count_mode)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,               # Общее количество элементов
+            'limit': self.get_limit(self.request),    # Лимит (количество элементов на порцию)
+            'offset': self.get_offset(self.request),  # Текущее смещение
+            'results': data,                   # Данные текущей порции
+        })
+
+
+class KeysetPagination(CustomLimitOffsetPagination):
+    """limit/offset by default; keyset pagination once the client sends ?cursor=.
+
+    `ordering` is (date field, 'id'), both descending. The cursor encodes the
+    key of the last row of a page, so every next page is an index range scan
+    from that key instead of skipping OFFSET rows, and no COUNT(*) is run.
+    An empty ?cursor= asks for the first page. Rows without a date are not
+    reachable in this mode.
+    """
+    cursor_query_param = 'cursor'
+    ordering = None
+    invalid_cursor_message = 'Invalid cursor'
+
+    def is_keyset(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.is_keyset(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.count = None
+        date_field = self.ordering[0].lstrip('-')
+
+        queryset = queryset.filter(**{f'{date_field}__isnull': False}).order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            date, pk = position
+            # <= по дате задает начало диапазона индекса, OR уточняет равные даты
+            queryset = queryset.filter(
+                Q(**{f'{date_field}__lt': date}) | Q(**{date_field: date, 'id__lt': pk}),
+                **{f'{date_field}__lte': date},
+            )
+
+        rows = list(queryset[:self.limit + 1])
+        self.next_position = None
+        if len(rows) > self.limit:
+            rows = rows[:self.limit]
+            last = rows[-1]
+            self.next_position = (getattr(last, date_field), last.id)
+        return rows
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            date, pk = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            return datetime.fromisoformat(date), int(pk)
+        except (binascii.Error, UnicodeError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        date, pk = position
+        return base64.urlsafe_b64encode(json.dumps([date.isoformat(), pk]).encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'limit': self.limit,
+            'next_cursor': self.encode_cursor(self.next_position) if self.next_position else None,
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class PaymentHistoryPagination(KeysetPagination):
+    ordering = ('-paid_at', '-id')
+
+
+class CommentsPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
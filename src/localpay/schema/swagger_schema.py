@@ -6,3 +6,20 @@ search_param = openapi.Parameter(
     description="Search by name, surname, or login",
     type=openapi.TYPE_STRING
 )
+
+
+count_param = openapi.Parameter(
+    'count',
+    openapi.IN_QUERY,
+    description="Total count: exact (default), estimate or none",
+    type=openapi.TYPE_STRING,
+    enum=['exact', 'estimate', 'none']
+)
+
+
+month_param = openapi.Parameter(
+    'month',
+    openapi.IN_QUERY,
+    description="Month of the history, YYYY-MM (default: current month)",
+    type=openapi.TYPE_STRING
+)
@@ -0,0 +1,60 @@
+from functools import reduce
+from operator import add
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils.module_loading import import_string
+
+
+class IcontainsSearchBackend:
+    """Every term must occur in one of the fields (case-insensitive substring)."""
+
+    def filter(self, queryset, terms, fields):
+        final_query = Q()
+        for term in terms:
+            term_query = Q()
+            for field in fields:
+                term_query |= Q(**{f'{field}__icontains': term})
+            final_query &= term_query
+        queryset = queryset.filter(final_query)
+        # дубли возможны только при поиске через связанные таблицы
+        if any('__' in field for field in fields):
+            queryset = queryset.distinct()
+        return queryset
+
+    def search(self, queryset, terms, fields):
+        return self.filter(queryset, terms, fields)
+
+
+class TrigramSearchBackend(IcontainsSearchBackend):
+    """PostgreSQL: the same matching, ranked by pg_trgm word similarity.
+
+    UPPER(field) LIKE '%TERM%' is what Django emits for __icontains, and it
+    is served by the GIN gin_trgm_ops indexes on UPPER(field) created by
+    migration 0007, so the filter never scans the whole table.
+    """
+
+    def rank(self, terms, fields):
+        per_term = []
+        for term in terms:
+            similarities = [TrigramWordSimilarity(term, field) for field in fields]
+            best = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+            per_term.append(Coalesce(best, Value(0.0), output_field=FloatField()))
+        return reduce(add, per_term)
+
+    def search(self, queryset, terms, fields):
+        queryset = self.filter(queryset, terms, fields)
+        return queryset.annotate(search_rank=self.rank(terms, fields)).order_by('-search_rank', 'pk')
+
+
+def get_search_backend(using='default'):
+    """settings.SEARCH_BACKEND (dotted path) or a backend matching the database vendor."""
+    path = getattr(settings, 'SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    if connections[using].vendor == 'postgresql':
+        return TrigramSearchBackend()
+    return IcontainsSearchBackend()
@@ -1,7 +1,11 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
 from django.utils.translation import gettext_lazy as _
+from localpay.services.auth_user_cache import invalidate_auth_user
 
 User = get_user_model()
 
@@ -12,32 +16,41 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         super().__init__(*args, **kwargs)
         self.fields['login'] = serializers.CharField()
         self.fields['password'] = serializers.CharField()
-        
+
         if 'username' in self.fields:
             del self.fields['username']
 
     def validate(self, attrs):
         login = attrs.get('login')
         password = attrs.get('password')
-        
+
 
         if not login or not password:
             raise serializers.ValidationError(_('Both login and password are required.'))
 
-        attrs['username'] = login
-
+        # Пароль хешируется ровно один раз: без повторного authenticate() из TokenObtainSerializer
         try:
             user = User.objects.get(login=login)
-            if not user.check_password(password):
-                raise serializers.ValidationError(_('Invalid login or password.'))
-
-            self.user = user
-
         except User.DoesNotExist:
+            User().set_password(password)  # неизвестный логин отвечает так же долго, как известный
             raise serializers.ValidationError(_('Invalid login or password.'))
 
-        data = super().validate(attrs)
-        return data
+        # check_password() сам перехеширует пароль, если он сделан не по текущей политике PASSWORD_HASHERS
+        stored_password = user.password
+        if not user.check_password(password):
+            raise serializers.ValidationError(_('Invalid login or password.'))
+        if user.password != stored_password:
+            invalidate_auth_user(user.pk)
+
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        self.user = user
+        refresh = self.get_token(user)
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, user)
+
+        return {'refresh': str(refresh), 'access': str(refresh.access_token)}
 
     @classmethod
     def get_token(cls, user):
@@ -0,0 +1,23 @@
+from rest_framework import serializers
+from localpay.models import ComparisonReportJob, User_mon
+
+
+class ComparisonReportJobRequestSerializer(serializers.Serializer):
+    user_id = serializers.PrimaryKeyRelatedField(queryset=User_mon.objects.all(), required=False, allow_null=True)
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+
+    def validate(self, attrs):
+        if attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError("date_from не может быть позже date_to")
+        return attrs
+
+
+class ComparisonReportJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.UUIDField(source='id', read_only=True)
+    user_id = serializers.IntegerField(source='installer_id', read_only=True)
+
+    class Meta:
+        model = ComparisonReportJob
+        fields = ['job_id', 'user_id', 'date_from', 'date_to', 'status', 'cancel_requested', 'error',
+                  'created_at', 'started_at', 'finished_at']
@@ -1,8 +1,11 @@
 from rest_framework import serializers
 from localpay.models import Pays
+from localpay.utils import format_minor_units, format_payment_date
 
 
 class PaymentHistorySerializer(serializers.ModelSerializer):
+    date_payment = serializers.SerializerMethodField()
+    money = serializers.SerializerMethodField()
     user_name = serializers.SerializerMethodField()
     planup_id = serializers.SerializerMethodField()
     user_id = serializers.SerializerMethodField()
@@ -12,6 +15,12 @@ class PaymentHistorySerializer(serializers.ModelSerializer):
         model = Pays
         fields = ['number_payment', 'date_payment', 'accept_payment', 'ls_abon', 'money', 'status_payment' , 'user_name' , 'planup_id' , 'user_id' , 'login', 'id', 'annulment']
 
+    def get_date_payment(self, obj):
+        return format_payment_date(obj.paid_at)
+
+    def get_money(self, obj):
+        return format_minor_units(obj.amount_minor)
+
     def get_user_name(self, obj):
         return f"{obj.user.name} {obj.user.surname}"
    
@@ -26,3 +35,37 @@ class PaymentHistorySerializer(serializers.ModelSerializer):
 
 
 
+
+
+# Быстрый путь для списков: одна выборка с join на монтажника, без экземпляров моделей
+PAYMENT_HISTORY_COLUMNS = (
+    'id', 'number_payment', 'paid_at', 'accept_payment', 'ls_abon', 'amount_minor', 'status_payment',
+    'annulment', 'user_id', 'user__name', 'user__surname', 'user__planup_id', 'user__login',
+)
+
+
+def payment_history_rows(queryset):
+    """Flat named tuples of exactly the columns PaymentHistorySerializer outputs."""
+    return queryset.values_list(*PAYMENT_HISTORY_COLUMNS, named=True)
+
+
+def serialize_payment_history(rows):
+    """Rows from payment_history_rows -> the same dicts PaymentHistorySerializer produces."""
+    return [
+        {
+            'number_payment': number_payment,
+            'date_payment': format_payment_date(paid_at),
+            'accept_payment': accept_payment,
+            'ls_abon': ls_abon,
+            'money': format_minor_units(amount_minor),
+            'status_payment': status_payment,
+            'user_name': f"{name} {surname}",
+            'planup_id': planup_id,
+            'user_id': user_id,
+            'login': login,
+            'id': pk,
+            'annulment': annulment,
+        }
+        for (pk, number_payment, paid_at, accept_payment, ls_abon, amount_minor, status_payment,
+             annulment, user_id, name, surname, planup_id, login) in rows
+    ]
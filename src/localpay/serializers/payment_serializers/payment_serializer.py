@@ -1,33 +1,46 @@
+import logging
+
 from asgiref.sync import sync_to_async
 from rest_framework import serializers
 from localpay.models import User_mon, Pays , Comment
 from datetime import datetime 
 import httpx 
 from django.utils import timezone
+from django.db import transaction
+from localpay.services.osmp_gateway import gateway
+from localpay.services.account_check_cache import account_checks, account_check_settings
+from localpay.services.osmp_parser import parse_osmp_response, OsmpResponseError
+from localpay.services.payments import (
+    reserve_payment, settle_payment, release_payment, mark_unconfirmed, debit_amount, annul_payment,
+    lock_balance, add_balance,
+)
+
 
-from bs4 import BeautifulSoup
-import requests
+logger = logging.getLogger('payment_actions')
 
 
+# Проверка лицевого счета: кэш + один запрос к шлюзу на одинаковые ls
 async def check_ls(ls):
-    url = f'http://pay.snt.kg:9080/localpayskynet_osmp/main?command=check&account={ls}'
-    print(f'Запрос к {url}')
-    
+    return await account_checks.fetch(ls, _check_ls_upstream)
+
+
+async def _check_ls_upstream(ls):
     try:
-        x = requests.post(url)
-        x.encoding = 'utf-8'
-        print(f'Ответ сервера: {x.text}')
+        x = await gateway.check(ls)
+        logger.debug('Account check %s: gateway replied %s', ls, x.text)
 
-        soup = BeautifulSoup(x.text, features="xml")
-        abon = soup.find('fio').string if soup.find('fio') else 'Не указано'
-        status = soup.find('result').string if soup.find('result') else 'Нет статуса'
+        reply = parse_osmp_response(x.content)
+        abon = reply.fio or 'Не указано'
         
-        print(f'Найден абонент: {abon}, статус: {status}')
-        return {'fio': abon, 'status': status}
+        logger.info('Account check %s: subscriber %s, status %s', ls, abon, reply.result)
+        return {'fio': abon, 'status': reply.result}
     
-    except requests.exceptions.RequestException as e:
-        print(f'Ошибка при запросе: {str(e)}')
+    except httpx.HTTPError as e:
+        logger.warning('Account check %s: gateway request failed: %s', ls, e)
         return {'error': 'Ошибка при обращении к серверу'}
+    except OsmpResponseError as e:
+        logger.warning('Account check %s: malformed gateway reply: %s', ls, e)
+        return {'error': 'Некорректный ответ сервера'}
 
 
 
@@ -46,79 +59,58 @@ class PaymentSerializer(serializers.Serializer):
         comment = self.validated_data.get('comment', '')
 
 
+        # свежая положительная проверка из кэша избавляет от лишнего запроса к шлюзу
+        if not account_check_settings()['SKIP_PAYMENT_PRECHECK']:
+            account_checks.invalidate(ls)
         account_check_result = await check_ls(ls)
-        if account_check_result['status'] != '0':
+        if account_check_result.get('status') != '0':
             return {'error': 'Неверный лицевой счет или статус: ' + account_check_result.get('comment', '')}
 
-        user_data = await sync_to_async(User_mon.objects.filter(login=login).first)()
+        user_data = await User_mon.objects.filter(login=login).afirst()
         if not user_data:
             return {'error': 'Пользователь не найден'}
 
-        user_id = user_data.id
-
-        
-        user_balance = user_data.balance
-
-        user_avail_balance = user_data.avail_balance
-        user_access = user_data.access
-
-        if user_balance < money or not user_access:
-            return {'error': 'Недостаточно средств или отсутствует доступ'}
-
         current_time = datetime.now()
         service_id_hydra = current_time.strftime("%Y%m%d%H%M%S")
-        txn_date = str(current_time)[:-4]
         txn_id = service_id_hydra + str(ls)
 
-        # URL для платежа
-        payment_url = (
-            f'http://pay.snt.kg:9080/localpayskynet_osmp/main?command=pay&txn_id={txn_id}'
-            f'&txn_date={service_id_hydra}&account={ls}&sum={money}'
-        )
+        # списание (условный UPDATE) и запись платежа "В обработке" одной транзакцией.
+        # Записи платежа идут через sync_to_async намеренно: async-ORM Django сам выполняется в потоке
+        # и не работает с transaction.atomic, а так каждая транзакция - один переход в поток,
+        # ожидание шлюза поток не занимает
+        payment = await sync_to_async(reserve_payment)(user_data.id, ls, money, timezone.now())
+        if payment is None:
+            return {'error': 'Недостаточно средств или отсутствует доступ'}
 
-        async with httpx.AsyncClient() as client:
-            payment_response = await client.post(payment_url)
-            payment_response.encoding = 'utf-8'
+        try:
+            payment_response = await gateway.pay(txn_id=txn_id, txn_date=service_id_hydra, account=ls, amount=money)
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            # запрос до шлюза не дошел - возвращаем средства
+            await sync_to_async(release_payment)(payment)
+            return {'error': 'Ошибка при обращении к серверу'}
+        except httpx.HTTPError:
+            await sync_to_async(mark_unconfirmed)(payment)
+            return {'error': 'Платеж не подтвержден шлюзом, проверьте статус'}
 
         response_time = str(datetime.now())[:-4]
 
         try:
-            # Парсинг XML ответа
-            soup = BeautifulSoup(payment_response.text, features="xml")
-            transaction_id = soup.find('osmp_txn_id').string
-            comment = soup.find('comment').string
-            transaction_sum = soup.find('sum').string
-            payment_status = soup.find('result').string
-            result = {
-                'transaction_id': transaction_id,
-                'sum': transaction_sum,
-                'comment': comment,
-                'status': payment_status
-            }
-        except Exception as e:
-            soup = BeautifulSoup(payment_response.text, 'lxml')
-            transaction_id = soup.find('osmp_txn_id').string
-            transaction_sum = soup.find('sum').string
-            payment_status = soup.find('result').string
-            result = {
-                'transaction_id': transaction_id,
-                'sum': transaction_sum,
-                'status': payment_status,
-                'error': str(e)
-            }
-
-        if payment_status == '0':
-            payment_status_desc = 'Выполнен'
-            await sync_to_async(Pays.objects.create)(
-                number_payment=transaction_id, date_payment=txn_date,
-                accept_payment=response_time, ls_abon=ls,
-                money=transaction_sum, status_payment=payment_status_desc, user_id=user_id
-            )
-
-            transaction_sum_int = int(str(transaction_sum)[:-2])
-            user_data.balance -= transaction_sum_int
-            user_data.avail_balance -= transaction_sum_int
-            await sync_to_async(user_data.save)(update_fields=['balance', 'avail_balance'])
+            reply = parse_osmp_response(payment_response.content)
+        except OsmpResponseError as e:
+            await sync_to_async(mark_unconfirmed)(payment)
+            return {'error': f'Некорректный ответ шлюза: {e}'}
+
+        result = {
+            'transaction_id': reply.osmp_txn_id,
+            'sum': reply.sum,
+            'comment': reply.comment,
+            'status': reply.result
+        }
+
+        if reply.ok:
+            await sync_to_async(settle_payment)(payment, reply.osmp_txn_id, reply.sum, response_time)
+        else:
+            await sync_to_async(release_payment)(payment)
 
         return result
 
@@ -135,28 +127,18 @@ class PaymentUpdateSerializer(serializers.ModelSerializer):
         fields = ['annulment']
 
     def update_balance(self, instance):
-        user_data = User_mon.objects.get(id=instance.user.id)
-        print(user_data)
-
         if instance.annulment != True:
+            if instance.amount_minor is None:
+                raise serializers.ValidationError('У платежа не указана сумма, аннулирование невозможно')
 
-            transaction_sum_float = float(instance.money)
-            transaction_sum_int = int(transaction_sum_float)  
-
-            old_balance = user_data.balance
-            old_avail_balance = user_data.avail_balance
-
+            transaction_sum_int = debit_amount(instance.amount_minor)
 
-            print(f"Transaction Sum (int): {transaction_sum_int}")
-            print(f"User Balance before: {user_data.balance}")
-            print(f"User Available Balance before: {user_data.avail_balance}")
-
-            user_data.balance += transaction_sum_int
-            user_data.avail_balance += transaction_sum_int
-            user_data.save()
+            # строка монтажника заблокирована до конца транзакции: параллельное списание не потеряется
+            old_balance, old_avail_balance = lock_balance(instance.user_id)
+            balance, avail_balance = add_balance(instance.user_id, transaction_sum_int, transaction_sum_int)
 
             Comment.objects.create(
-                user2=user_data,
+                user2_id=instance.user_id,
                 text="Аннулирование платежа",
                 type_pay="Аннулирование",
                 old_balance=old_balance,
@@ -164,26 +146,25 @@ class PaymentUpdateSerializer(serializers.ModelSerializer):
                 new_balance=transaction_sum_int,
 
                 
-                mont_balance=user_data.balance,
+                mont_balance=balance,
                 old_avail_balance=old_avail_balance,
                 new_avail_balance=transaction_sum_int,
-                mont_avail_balance=user_data.avail_balance,
+                mont_avail_balance=avail_balance,
                 created_at=timezone.now()
             )
 
 
 
-            print(f"User Balance after: {user_data.balance}")  
-            print(f"User Available Balance after: {user_data.avail_balance}")  
-
-            user_data.save()  
+            logger.info('Payment %s annulled: %s returned to installer %s, balance %s -> %s, available %s -> %s',
+                        instance.pk, transaction_sum_int, instance.user_id, old_balance, balance,
+                        old_avail_balance, avail_balance)
 
-            instance.annulment = True 
-            instance.save() 
+            annul_payment(instance)
         else:
-            print('123456789')
+            logger.info('Payment %s is already annulled', instance.pk)
         return instance
 
+    @transaction.atomic
     def update(self, instance, validated_data): 
 
         instance = self.update_balance(instance)
@@ -3,20 +3,22 @@ from localpay.models import User_mon , Pays , Comment
 from django.contrib.auth.hashers import make_password
 from datetime import datetime
 from localpay.serializers.comments_serializer.comments_serializer import CommentSerializer
+from localpay.utils import to_minor_units
+from localpay.services.payments import create_payment, debit_amount, lock_balance, add_balance
 
 from rest_framework import serializers
+from django.db import transaction
 from django.utils import timezone
 
 class UserSerializer(serializers.ModelSerializer):
     region = serializers.ChoiceField(choices=User_mon.REGION_CHOICES, required=True)
-    comments = CommentSerializer(many=True, read_only=True)
 
     class Meta:
         model = User_mon
         fields = [
             'id', 'name', 'surname', 'login', 'password', 'access', 
             'balance', 'avail_balance', 'region', 'date_reg', 
-            'refill', 'write_off', 'comment', 'role', 'is_active', 'planup_id' , 'comments'
+            'refill', 'write_off', 'comment', 'role', 'is_active', 'planup_id'
         ]
         extra_kwargs = {
             'password': {'write_only': True , 'required': True},
@@ -34,7 +36,10 @@ class UserSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+    @transaction.atomic
     def update(self, instance, validated_data):
+        # баланс меняется только под блокировкой строки: платеж монтажника не затрется save()
+        instance.balance, instance.avail_balance = lock_balance(instance.pk)
         old_balance = instance.balance
         old_avail_balance = instance.avail_balance
         comment_text = validated_data.pop('comment', None)
@@ -48,13 +53,13 @@ class UserSerializer(serializers.ModelSerializer):
                 try:
                     refill_amount = float(value)
                     write_off_amount = float(validated_data['write_off'])
-                    instance.balance += refill_amount
+                    instance.balance, instance.avail_balance = add_balance(
+                        instance.pk, debit_amount(to_minor_units(refill_amount)))
 
                     time = str(datetime.now())[:-4]
                     status_payment = 'Пополнение с бухгалтерии'
                     ls = '*********'
-                    check_pay = Pays.objects.create(user=instance,date_payment=time,accept_payment=time,ls_abon=ls,money=refill_amount, status_payment=status_payment)
-                    check_pay.save() 
+                    check_pay = create_payment(user=instance,date_payment=time,accept_payment=time,ls_abon=ls,money=refill_amount, status_payment=status_payment, amount_minor=to_minor_units(refill_amount), paid_at=timezone.now())
 
                     # Сохраняем операцию пополнения в истории
                     Comment.objects.create(
@@ -69,7 +74,6 @@ class UserSerializer(serializers.ModelSerializer):
                         mont_avail_balance=instance.avail_balance,
                         created_at=timezone.now()
                     )
-                    instance.save()
                 except (ValueError, TypeError):
                     raise serializers.ValidationError(
                         "Сумма пополнения должна быть числом"
@@ -82,15 +86,14 @@ class UserSerializer(serializers.ModelSerializer):
                             "Сумма списания не может быть больше затрат"
                         )
                     old_avail_balance = instance.avail_balance
-                    instance.balance += write_off_amount
-                    instance.avail_balance += write_off_amount
+                    amount = debit_amount(to_minor_units(write_off_amount))
+                    instance.balance, instance.avail_balance = add_balance(instance.pk, amount, amount)
                     # Сохраняем операцию списания в истории
 
                     time = str(datetime.now())[:-4]
                     status_payment = 'Списание с бухгалтерии'
                     ls = '*********'
-                    check_pay = Pays.objects.create(user=instance,date_payment=time,accept_payment=time,ls_abon=ls,money=write_off_amount, status_payment=status_payment)
-                    check_pay.save() 
+                    check_pay = create_payment(user=instance,date_payment=time,accept_payment=time,ls_abon=ls,money=write_off_amount, status_payment=status_payment, amount_minor=to_minor_units(write_off_amount), paid_at=timezone.now())
 
 
                     Comment.objects.create(
@@ -116,6 +119,35 @@ class UserSerializer(serializers.ModelSerializer):
         return instance 
 
 
+# Список монтажников: только поля самой записи, без истории операций
+class UserListSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User_mon
+        fields = [
+            'id', 'name', 'surname', 'login', 'access',
+            'balance', 'avail_balance', 'region', 'date_reg',
+            'refill', 'write_off', 'comment', 'role', 'is_active', 'planup_id'
+        ]
+
+
+# Карточка монтажника: последние операции из with_latest_comments()
+class UserDetailSerializer(UserListSerializer):
+    comments = CommentSerializer(source='latest_comments', many=True, read_only=True)
+
+    class Meta(UserListSerializer.Meta):
+        fields = UserListSerializer.Meta.fields + ['comments']
+
+
+# Профиль в мобильном приложении: без полей ввода бухгалтерии
+class MobileUserSerializer(UserDetailSerializer):
+    class Meta(UserDetailSerializer.Meta):
+        fields = [
+            'id', 'name', 'surname', 'login', 'access',
+            'balance', 'avail_balance', 'region', 'date_reg',
+            'is_active', 'planup_id', 'comments'
+        ]
+
+
 
 class CommentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from django.conf import settings
+
+
+DEFAULT_ACCOUNT_CHECK_CACHE = {
+    'TTL': 300,
+    'NEGATIVE_TTL': 30,
+    'MAX_ENTRIES': 10000,
+    'SKIP_PAYMENT_PRECHECK': True,
+}
+
+
+def account_check_settings():
+    return {**DEFAULT_ACCOUNT_CHECK_CACHE, **getattr(settings, 'ACCOUNT_CHECK_CACHE', {})}
+
+
+class _Abandoned(Exception):
+    """The request a waiter was sharing was cancelled by its owner."""
+
+
+class AccountCheckCache:
+    """Per-process TTL cache of OSMP account checks keyed by `ls`.
+
+    Valid accounts (status '0') live for TTL seconds, invalid ones for
+    NEGATIVE_TTL, gateway errors are not cached. Concurrent misses for the
+    same `ls` share one upstream request (single-flight); the in-flight
+    futures are thread-safe, so callers on different event loops coalesce too.
+    Cancelling one caller never cancels the shared request for the others.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_fresh(self, ls):
+        """Cached result for `ls` if it has not expired yet, otherwise None."""
+        with self._lock:
+            return self._lookup(ls)
+
+    def has_valid(self, ls):
+        result = self.get_fresh(ls)
+        return result is not None and result.get('status') == '0'
+
+    async def fetch(self, ls, loader):
+        with self._lock:
+            result = self._lookup(ls)
+            if result is not None:
+                self.hits += 1
+                return result
+
+            future = self._inflight.get(ls)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = self._inflight[ls] = Future()
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            try:
+                # отмена ожидающего (клиент отключился) не должна отменять общий запрос
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except _Abandoned:
+                return await self.fetch(ls, loader)
+
+        try:
+            result = await loader(ls)
+        except Exception as e:
+            self._finish(ls)
+            future.set_exception(e)
+            raise
+        except BaseException:
+            # владельца отменили: ожидающие повторяют запрос сами, один из них станет владельцем
+            self._finish(ls)
+            future.set_exception(_Abandoned())
+            raise
+
+        self._finish(ls, result)
+        future.set_result(result)
+        return result
+
+    def invalidate(self, ls=None):
+        with self._lock:
+            if ls is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(ls, None)
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.coalesced = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'entries': len(self._entries),
+                'in_flight': len(self._inflight),
+            }
+
+    def _lookup(self, ls):
+        entry = self._entries.get(ls)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at <= time.monotonic():
+            del self._entries[ls]
+            return None
+        return result
+
+    def _finish(self, ls, result=None):
+        conf = account_check_settings()
+        with self._lock:
+            self._inflight.pop(ls, None)
+            if result is None or 'error' in result:
+                return
+            ttl = conf['TTL'] if result.get('status') == '0' else conf['NEGATIVE_TTL']
+            self._entries[ls] = (time.monotonic() + ttl, result)
+            self._entries.move_to_end(ls)
+            while len(self._entries) > conf['MAX_ENTRIES']:
+                self._entries.popitem(last=False)
+
+
+account_checks = AccountCheckCache()
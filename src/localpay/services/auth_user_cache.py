@@ -0,0 +1,87 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+
+DEFAULT_AUTH_USER_CACHE = {
+    'ENABLED': True,
+    # другие процессы узнают об изменении монтажника не позже чем через TTL секунд
+    'TTL': 30,
+    'MAX_ENTRIES': 5000,
+}
+
+
+def auth_user_cache_settings():
+    return {**DEFAULT_AUTH_USER_CACHE, **getattr(settings, 'AUTH_USER_CACHE', {})}
+
+
+class AuthUserCache:
+    """Per-process TTL cache of authenticated User_mon rows keyed by pk.
+
+    Saves the one SELECT per request that JWTAuthentication spends on the
+    user. Every hit is a copy, so a view changing request.user never touches
+    the cached row. Writes in this process drop the entry at once (see
+    invalidate_auth_user); other processes see them after TTL at the latest.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, pk):
+        with self._lock:
+            entry = self._entries.get(pk)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[pk]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(pk)
+        return copy.copy(entry[1])
+
+    def put(self, user):
+        conf = auth_user_cache_settings()
+        if not conf['ENABLED']:
+            return
+        with self._lock:
+            self._entries[user.pk] = (time.monotonic() + conf['TTL'], copy.copy(user))
+            self._entries.move_to_end(user.pk)
+            while len(self._entries) > conf['MAX_ENTRIES']:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, pk=None):
+        with self._lock:
+            if pk is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(pk, None)
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+
+auth_users = AuthUserCache()
+
+
+def invalidate_auth_user(pk):
+    """Drop the cached user now and once more after commit.
+
+    The second drop covers a request of this process that re-read the old
+    row while the writing transaction was still open.
+    """
+    auth_users.invalidate(pk)
+    transaction.on_commit(lambda: auth_users.invalidate(pk))
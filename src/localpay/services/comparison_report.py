@@ -0,0 +1,106 @@
+from localpay.models import Pays, User_mon
+from localpay.services.planup import planup
+from localpay.services.planup_mirror import mirror_payments, parse_money, planup_mirror_settings, sync_planup
+from localpay.services.reconciliation import localpay_rows, reconcile, reconcile_stream
+from localpay.utils import filter_paid_period
+
+
+class ReportCancelled(Exception):
+    """The report job was cancelled while it was being built."""
+
+
+def localpay_payments(date_from, date_to, user_id=None):
+    queryset = Pays.objects.all()
+    if user_id:
+        queryset = queryset.filter(user__id=user_id)
+    return filter_paid_period(queryset, date_from, date_to)
+
+
+def report_installers(user_ids):
+    """(user_id, planup_id) of the installers to compare and the failures for those without planup_id."""
+    installers = User_mon.objects.all()
+    if user_ids is None:
+        # без planup_id у пользователя не может быть нарядов в Planup
+        installers = installers.exclude(planup_id__isnull=True).exclude(planup_id=0)
+    else:
+        installers = installers.filter(id__in=user_ids)
+    installers = list(installers.values_list('id', 'planup_id'))
+
+    failures = [
+        {'user_id': user_id, 'planup_id': planup_id, 'error': 'planup_id не задан'}
+        for user_id, planup_id in installers if not planup_id
+    ]
+    return [(user_id, planup_id) for user_id, planup_id in installers if planup_id], failures
+
+
+def installer_planup_payments(installers, start_date, end_date):
+    """Planup payments of (user_id, planup_id) installers ordered by installer, and Planup failures."""
+    if planup_mirror_settings()['ENABLED']:
+        # из Planup забираются только устаревшие дни, остальное - из локальной копии
+        _, failures = sync_planup(installers, start_date, end_date, client=planup)
+        return mirror_payments([user_id for user_id, _ in installers], start_date, end_date), failures
+
+    by_user, failures = planup.fetch_payments(installers, start_date, end_date)
+    payments = []
+    for user_id, user_payments in sorted(by_user.items()):
+        for p in user_payments:
+            money = parse_money(p["money"])
+            if money != 0:
+                payments.append({
+                    "user_id": user_id,
+                    "ls_abon": p["ls_abon"],
+                    "money": money,
+                    "planup_id": p['id'],
+                    "end_date": p.get('end_date')
+                })
+    return payments, failures
+
+
+def planup_payments(user_ids, start_date, end_date):
+    """Planup payments of the installers and the list of installers Planup could not answer for."""
+    installers, failures = report_installers(user_ids)
+    payments, planup_failures = installer_planup_payments(installers, start_date, end_date)
+    return payments, failures + planup_failures
+
+
+def load_names(user_ids):
+    return {
+        user_id: (name, surname)
+        for user_id, name, surname in User_mon.objects.filter(id__in=user_ids).values_list('id', 'name', 'surname')
+    }
+
+
+def build_comparison_report(user_id, date_from, date_to, cancelled=None):
+    """LocalPay vs Planup report for one installer (or everyone when user_id is empty).
+
+    `cancelled` is polled between the stages; when it returns True the
+    build stops with ReportCancelled.
+    """
+    def check():
+        if cancelled is not None and cancelled():
+            raise ReportCancelled()
+
+    check()
+    planup_side, failures = planup_payments([user_id] if user_id else None, date_from, date_to)
+    check()
+    report = reconcile(localpay_rows(localpay_payments(date_from, date_to, user_id)), planup_side, load_names=load_names)
+    return {
+        'count': len(report),
+        'results': report,
+        # монтажники, по которым Planup не ответил: их данные в отчете неполные
+        'failures': failures,
+    }
+
+
+def stream_comparison_report(user_id, date_from, date_to, chunk_size=2000):
+    """The same report row by row: each installer as soon as it is reconciled, then the totals.
+
+    LocalPay rows and mirrored Planup payments are read with server-side
+    cursors in installer order, so memory is bounded by the largest
+    installer. The totals row carries the Planup failures.
+    """
+    installers, failures = report_installers([user_id] if user_id else None)
+    planup_side, planup_failures = installer_planup_payments(installers, date_from, date_to)
+    localpay = localpay_rows(localpay_payments(date_from, date_to, user_id)).iterator(chunk_size=chunk_size)
+    totals = yield from reconcile_stream(localpay, planup_side, load_names([user_id for user_id, _ in installers]))
+    yield {**totals, 'failures': failures + planup_failures}
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from localpay.models import FiscalReceipt
+from localpay.services.kkm import kkm_device, kkm_settings
+from localpay.services.telegram import notify
+
+
+logger = logging.getLogger('kkm')
+
+DEFAULT_FISCAL_RECEIPTS = {
+    # ставить ли чек в очередь при проведении каждого платежа
+    'FOR_PAYMENTS': False,
+    # сколько чеков касса ведет одновременно; больше 1 - только если касса это допускает
+    'CONCURRENCY': 1,
+    'MAX_ATTEMPTS': 8,
+    # пауза перед повтором: BACKOFF * 2 ** (попытка - 1), не больше BACKOFF_MAX (секунды)
+    'BACKOFF': 5.0,
+    'BACKOFF_MAX': 600.0,
+    'POLL_INTERVAL': 1.0,
+    # чек в статусе running без нового шага дольше этого считается брошенным (воркер упал)
+    'RUNNING_TIMEOUT': 600,
+    # как часто воркер ищет брошенные чеки (секунды)
+    'REQUEUE_INTERVAL': 60,
+    'COMMODITY_NAME': 'Оплата услуг связи',
+}
+
+# 4xx, после которых повтор имеет смысл; остальные 4xx - отказ кассы принять данные чека
+RETRYABLE_STATUSES = {408, 429}
+
+
+class ReceiptInDoubt(Exception):
+    """Whether the device printed the receipt is unknown; only a person can check it."""
+
+
+def fiscal_receipt_settings():
+    return {**DEFAULT_FISCAL_RECEIPTS, **getattr(settings, 'FISCAL_RECEIPTS', {})}
+
+
+def enqueue_receipt(open_ticket, commodities, close_ticket, payment=None):
+    """Queue a receipt: the open, add-commodity and close request bodies of the KKM API."""
+    return FiscalReceipt.objects.create(
+        payment=payment,
+        payload={'open': open_ticket, 'commodities': list(commodities), 'close': close_ticket},
+    )
+
+
+def payment_receipt(payment):
+    """Request bodies of the sale receipt for a settled payment (one commodity)."""
+    cashier = kkm_settings()['CASHIER_CODE']
+    amount = str(Decimal(payment.amount_minor) / 100)
+    commodity = {
+        'name': f"{fiscal_receipt_settings()['COMMODITY_NAME']}, л/с {payment.ls_abon}",
+        'price': amount,
+        'quantity': 1,
+        'sum': amount,
+    }
+    return {'cashierCode': cashier}, [commodity], {'cashierCode': cashier, 'sum': amount}
+
+
+def enqueue_payment_receipt(payment):
+    """Queue the receipt of `payment` once; call it in the transaction that settles the payment."""
+    receipt = FiscalReceipt.objects.filter(payment=payment).first()
+    if receipt is None:
+        receipt = enqueue_receipt(*payment_receipt(payment), payment=payment)
+    return receipt
+
+
+def receipt_steps(payload):
+    return [('open', payload['open']), *(('add', item) for item in payload['commodities']), ('close', payload['close'])]
+
+
+def retry_delay(attempts):
+    conf = fiscal_receipt_settings()
+    return min(conf['BACKOFF'] * 2 ** (attempts - 1), conf['BACKOFF_MAX'])
+
+
+def claim_receipts(limit):
+    """Take up to `limit` due receipts, oldest first; the conditional UPDATE lets workers share the queue."""
+    now = timezone.now()
+    candidates = (FiscalReceipt.objects
+                  .filter(status=FiscalReceipt.QUEUED, next_attempt_at__lte=now)
+                  .order_by('next_attempt_at', 'id')
+                  .values_list('pk', flat=True)[:limit])
+    claimed = [pk for pk in candidates
+               if FiscalReceipt.objects.filter(pk=pk, status=FiscalReceipt.QUEUED).update(
+                   status=FiscalReceipt.RUNNING, started_at=now)]
+    return list(FiscalReceipt.objects.filter(pk__in=claimed).order_by('next_attempt_at', 'id'))
+
+
+def requeue_abandoned_receipts():
+    """Put back receipts whose worker died mid-sequence (no step saved for RUNNING_TIMEOUT); they continue from steps_done."""
+    stale_before = timezone.now() - timedelta(seconds=fiscal_receipt_settings()['RUNNING_TIMEOUT'])
+    return FiscalReceipt.objects.filter(status=FiscalReceipt.RUNNING, started_at__lt=stale_before).update(
+        status=FiscalReceipt.QUEUED, started_at=None,
+    )
+
+
+def save_step(receipt):
+    # started_at - заодно отметка живого воркера: чек с движущимися шагами не считается брошенным
+    FiscalReceipt.objects.filter(pk=receipt.pk).update(
+        steps_done=receipt.steps_done, in_doubt=receipt.in_doubt, started_at=timezone.now(),
+    )
+
+
+def receipt_done(receipt, result):
+    FiscalReceipt.objects.filter(pk=receipt.pk).update(
+        status=FiscalReceipt.DONE, steps_done=receipt.steps_done, in_doubt=False, result=result, error='',
+        finished_at=timezone.now(),
+    )
+
+
+def is_rejection(error):
+    return (isinstance(error, httpx.HTTPStatusError) and error.response.status_code < 500
+            and error.response.status_code not in RETRYABLE_STATUSES)
+
+
+def receipt_failed(receipt, error):
+    """Schedule a retry with backoff, or give up after MAX_ATTEMPTS or when the KKM rejects the data."""
+    attempts = receipt.attempts + 1
+    message = str(error) or type(error).__name__
+    if is_rejection(error) or isinstance(error, ReceiptInDoubt) or attempts >= fiscal_receipt_settings()['MAX_ATTEMPTS']:
+        logger.error('Fiscal receipt %s failed after %s attempt(s): %s', receipt.pk, attempts, message)
+        FiscalReceipt.objects.filter(pk=receipt.pk).update(
+            status=FiscalReceipt.FAILED, in_doubt=receipt.in_doubt, attempts=attempts, error=message,
+            finished_at=timezone.now(),
+        )
+        notify(f'Чек {receipt.pk} не пробит, пожалуйста проверьте. Ошибка {message}', key='kkm:receipt_failed')
+        return
+    logger.warning('Fiscal receipt %s: attempt %s failed, retrying: %s', receipt.pk, attempts, message)
+    FiscalReceipt.objects.filter(pk=receipt.pk).update(
+        status=FiscalReceipt.QUEUED, in_doubt=receipt.in_doubt, attempts=attempts, error=message, started_at=None,
+        next_attempt_at=timezone.now() + timedelta(seconds=retry_delay(attempts)),
+    )
+
+
+async def recover_receipt(receipt, client):
+    """Start over after an attempt that lost track of step `steps_done`.
+
+    The step may have reached the device, and resending it would add a
+    second ticket or commodity line. So the open ticket is cancelled and
+    the receipt starts again from 'open'. If there is no open ticket and
+    the lost step was 'close', the receipt may be printed already, and it
+    is left for a person to check.
+    """
+    try:
+        await client.ticket('cancel', receipt.payload['open'])
+    except httpx.HTTPStatusError as e:
+        if not is_rejection(e):
+            raise
+        # открытого чека на кассе нет
+        if receipt.steps_done == len(receipt_steps(receipt.payload)) - 1:
+            raise ReceiptInDoubt('Неизвестно, пробит ли чек: касса не ответила на закрытие, проверьте вручную') from e
+    receipt.steps_done = 0
+
+
+async def send_receipt(receipt, client=kkm_device):
+    """Send the remaining open -> add -> close requests of one receipt, strictly in order.
+
+    A step is never sent twice: while requests are in flight the receipt is
+    in_doubt, and an attempt that ends without the device's answer (timeout,
+    crash) leaves it so, for recover_receipt() to sort out next time.
+    """
+    steps = receipt_steps(receipt.payload)
+    result = None
+    try:
+        if receipt.in_doubt and receipt.steps_done < len(steps):
+            await recover_receipt(receipt, client)
+        receipt.in_doubt = True
+        await sync_to_async(save_step)(receipt)
+        for step, data in steps[receipt.steps_done:]:
+            try:
+                result = await client.ticket(step, data)
+            except httpx.HTTPStatusError:
+                # касса ответила ошибкой - шаг не выполнен, повтор продолжит с него же
+                receipt.in_doubt = False
+                raise
+            receipt.steps_done += 1
+            await sync_to_async(save_step)(receipt)
+    except (httpx.HTTPError, ReceiptInDoubt) as e:
+        await sync_to_async(receipt_failed)(receipt, e)
+        return False
+    except Exception as e:
+        # например, испорченный payload: чек не должен навсегда остаться в running
+        logger.exception('Fiscal receipt %s: unexpected error', receipt.pk)
+        await sync_to_async(receipt_failed)(receipt, e)
+        return False
+    await sync_to_async(receipt_done)(receipt, result)
+    return True
+
+
+async def run_receipt_worker(stop, client=kkm_device):
+    """Send queued receipts until `stop`, up to CONCURRENCY of them at a time.
+
+    The steps of one receipt are sequential; different receipts overlap, so
+    the device round trips of one receipt hide the others' waits. The
+    CONCURRENCY limit applies per worker process.
+    """
+    conf = fiscal_receipt_settings()
+    requeued_at = None
+    running = set()
+    while not stop.is_set():
+        try:
+            # чеки упавшего воркера возвращаются в очередь, пока этот работает
+            if requeued_at is None or time.monotonic() - requeued_at >= conf['REQUEUE_INTERVAL']:
+                requeued = await sync_to_async(requeue_abandoned_receipts)()
+                requeued_at = time.monotonic()
+                if requeued:
+                    logger.info('Requeued %s abandoned fiscal receipt(s)', requeued)
+
+            free = conf['CONCURRENCY'] - len(running)
+            for receipt in (await sync_to_async(claim_receipts)(free) if free > 0 else []):
+                task = asyncio.create_task(send_receipt(receipt, client))
+                running.add(task)
+                task.add_done_callback(running.discard)
+        except Exception:
+            # сбой БД не останавливает воркер: повторим на следующем опросе
+            logger.exception('Fiscal receipt worker: poll failed')
+
+        # ждем освобождения места, новых чеков или остановки
+        stopping = asyncio.ensure_future(stop.wait())
+        await asyncio.wait({stopping, *running}, timeout=conf['POLL_INTERVAL'], return_when=asyncio.FIRST_COMPLETED)
+        stopping.cancel()
+
+    if running:
+        await asyncio.gather(*running, return_exceptions=True)
@@ -0,0 +1,122 @@
+import logging
+
+import httpx
+from django.conf import settings
+from tenacity import retry, wait_fixed, stop_after_attempt
+
+from localpay.services.pooled_client import PooledAsyncClient
+from localpay.services.telegram import notify
+
+
+logger = logging.getLogger('kkm')
+
+DEFAULT_KKM = {
+    'URL': 'http://185.39.79.6:1234',
+    'CASHIER_CODE': 1,
+    'TIMEOUT': 20.0,
+    'CONNECT_TIMEOUT': 5.0,
+    # касса - одно устройство, много соединений ей не нужно
+    'MAX_CONNECTIONS': 4,
+    'MAX_KEEPALIVE_CONNECTIONS': 4,
+    'KEEPALIVE_EXPIRY': 60.0,
+}
+
+TICKET_PATHS = {
+    'open': '/api/Ticket/OpenTicket',
+    'add': '/api/Ticket/AddCommodity',
+    'close': '/api/Ticket/CloseTicket',
+    # аннулирует открытый, еще не закрытый чек
+    'cancel': '/api/Ticket/CancelTicket',
+}
+
+
+def kkm_settings():
+    return {**DEFAULT_KKM, **getattr(settings, 'KKM', {})}
+
+
+class KkmClient(PooledAsyncClient):
+    """Process-wide keep-alive client for the KKM (cash register) HTTP API."""
+    thread_name = 'kkm'
+
+    def settings(self):
+        return kkm_settings()
+
+    async def _send(self, method, path, **kwargs):
+        # runs on the kkm loop only
+        response = await self.client.request(method, kkm_settings()['URL'] + path, **kwargs)
+        response.raise_for_status()
+        if not response.text.strip():
+            return {}
+        try:
+            return response.json()
+        except ValueError:
+            # запрос касса уже выполнила - непонятный ответ не повод повторять его
+            return {'text': response.text}
+
+    async def request(self, method, path, **kwargs):
+        return await self.submit(self._send(method, path, **kwargs))
+
+    async def ticket(self, step, data):
+        """One step of a receipt: 'open', 'add' (a commodity), 'close' or 'cancel'."""
+        return await self.request('POST', TICKET_PATHS[step], json=data)
+
+    async def shift(self, action):
+        return await self.request('POST', f'/api/Shift/{action}', params={'cashierCode': kkm_settings()['CASHIER_CODE']})
+
+    async def state(self):
+        return await self.request('GET', '/api/Service/State')
+
+
+kkm_device = KkmClient()
+
+
+# Задания смены ККМ; запускаются только воркером manage.py run_kkm_worker (см. kkm_scheduler.py).
+# Повторы tenacity идут молча: в Telegram - одно уведомление об итоге.
+
+# None - проверок еще не было
+_kkm_healthy = None
+
+
+@retry(wait=wait_fixed(5), stop=stop_after_attempt(4), reraise=True)
+async def _shift(action):
+    await kkm_device.shift(action)
+
+
+@retry(wait=wait_fixed(5), stop=stop_after_attempt(4), reraise=True)
+async def _state():
+    await kkm_device.state()
+
+
+async def open_shift():
+    try:
+        await _shift('OpenShift')
+    except httpx.HTTPError as e:
+        logger.error('KKM shift was not opened: %s', e)
+        notify(f'Смена не открылась, пожалуйста проверьте. Ошибка {e}', key='kkm:open_shift')
+        return
+    notify('Смена открыта')
+
+
+async def close_shift():
+    try:
+        await _shift('CloseShift')
+    except httpx.HTTPError as e:
+        logger.error('KKM shift was not closed: %s', e)
+        notify(f'Смена не закрылась, пожалуйста проверьте. Ошибка {e}', key='kkm:close_shift')
+        return
+    notify('Смена закрыта')
+
+
+async def keep_awake():
+    """Poll the KKM; tell the chat only when it fails or recovers, not every hour."""
+    global _kkm_healthy
+    try:
+        await _state()
+    except httpx.HTTPError as e:
+        logger.error('KKM state check failed: %s', e)
+        _kkm_healthy = False
+        notify(f'Проверка ККМ: что-то не так, пожалуйста проверьте. Ошибка {e}', key='kkm:state')
+        return
+    if _kkm_healthy is False:
+        notify('Проверка ККМ: касса снова работает')
+    _kkm_healthy = True
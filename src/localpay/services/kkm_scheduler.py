@@ -0,0 +1,205 @@
+import asyncio
+import logging
+from datetime import time as dt_time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+from localpay.services import kkm
+
+
+logger = logging.getLogger('kkm')
+
+DEFAULT_KKM_SCHEDULER = {
+    # время - в settings.TIME_ZONE
+    'OPEN_SHIFT_AT': '00:00',
+    'CLOSE_SHIFT_AT': '23:59',
+    'KEEP_AWAKE_EVERY': 3600,
+    # ключ pg_advisory_lock: задания запускает только воркер, который держит этот замок
+    'LOCK_KEY': 7_315_020_301,
+    # как часто резервный воркер пытается стать ведущим, а ведущий проверяет свой замок (секунды)
+    'LEADER_POLL': 15,
+}
+
+
+def kkm_scheduler_settings():
+    return {**DEFAULT_KKM_SCHEDULER, **getattr(settings, 'KKM_SCHEDULER', {})}
+
+
+async def sleep_or_stop(stop, seconds):
+    """Sleep `seconds` unless `stop` is set earlier; True when stopped."""
+    try:
+        await asyncio.wait_for(stop.wait(), seconds)
+    except asyncio.TimeoutError:
+        return False
+    return True
+
+
+class DailyJob:
+    def __init__(self, name, at, func):
+        self.name = name
+        self.at = dt_time.fromisoformat(at)
+        self.func = func
+
+    def next_run(self, now):
+        run = now.replace(hour=self.at.hour, minute=self.at.minute, second=0, microsecond=0)
+        return run if run > now else run + timedelta(days=1)
+
+
+class IntervalJob:
+    def __init__(self, name, every, func):
+        self.name = name
+        self.every = timedelta(seconds=every)
+        self.func = func
+
+    def next_run(self, now):
+        return now + self.every
+
+
+def kkm_jobs():
+    conf = kkm_scheduler_settings()
+    return [
+        DailyJob('open_shift', conf['OPEN_SHIFT_AT'], kkm.open_shift),
+        DailyJob('close_shift', conf['CLOSE_SHIFT_AT'], kkm.close_shift),
+        IntervalJob('keep_awake', conf['KEEP_AWAKE_EVERY'], kkm.keep_awake),
+    ]
+
+
+class Scheduler:
+    """Runs async jobs at their next_run() as tasks of the current event loop.
+
+    A failing job is logged and scheduled again as usual. Once `stop` is
+    set, run() waits for the jobs already started and returns; cancelling
+    run() cancels them.
+    """
+    # длинные ожидания дробятся, чтобы перевод системных часов не сдвигал запуск
+    max_sleep = 60
+
+    def __init__(self, jobs, now=timezone.localtime):
+        self.jobs = jobs
+        self.now = now
+        self._running = set()
+
+    async def run(self, stop):
+        due = {job: job.next_run(self.now()) for job in self.jobs}
+        try:
+            while not stop.is_set():
+                job = min(due, key=due.get)
+                delay = (due[job] - self.now()).total_seconds()
+                if delay > 0:
+                    await sleep_or_stop(stop, min(delay, self.max_sleep))
+                    continue
+                self.fire(job)
+                due[job] = job.next_run(self.now())
+        except asyncio.CancelledError:
+            for task in self._running:
+                task.cancel()
+            raise
+        finally:
+            if self._running:
+                await asyncio.gather(*self._running, return_exceptions=True)
+
+    def fire(self, job):
+        task = asyncio.create_task(self._run_job(job))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run_job(self, job):
+        logger.info('KKM job %s started', job.name)
+        try:
+            await job.func()
+        except Exception:
+            logger.exception('KKM job %s failed', job.name)
+        else:
+            logger.info('KKM job %s finished', job.name)
+
+
+class LeaderLock:
+    """Session-level PostgreSQL advisory lock of the leading KKM worker.
+
+    The lock belongs to the database session, so PostgreSQL frees it when
+    the leader exits or loses its connection, and a standby takes over. It
+    needs a session connection (pgbouncer pool_mode = session, as in
+    pgbouncer.ini). Other databases have no advisory locks; there the only
+    worker is always the leader. Call it from one thread: the worker uses
+    sync_to_async(), which keeps every call on the same thread and connection.
+    """
+
+    def __init__(self, key, using='default'):
+        self.key = key
+        self.using = using
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def acquire(self):
+        if self.connection.vendor != 'postgresql':
+            return True
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute('SELECT pg_try_advisory_lock(%s)', [self.key])
+                return cursor.fetchone()[0]
+        except DatabaseError:
+            self.connection.close()
+            return False
+
+    def held(self):
+        # после переподключения у сессии замка уже нет - смотрим pg_locks своей сессии
+        if self.connection.vendor != 'postgresql':
+            return True
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT EXISTS (SELECT 1 FROM pg_locks WHERE locktype = 'advisory' AND pid = pg_backend_pid()"
+                    " AND classid = %s AND objid = %s AND objsubid = 1 AND granted)",
+                    [self.key >> 32, self.key & 0xFFFFFFFF],
+                )
+                return cursor.fetchone()[0]
+        except DatabaseError:
+            self.connection.close()
+            return False
+
+    def release(self):
+        if self.connection.vendor != 'postgresql':
+            return
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [self.key])
+        except DatabaseError:
+            self.connection.close()
+
+
+async def run_kkm_worker(stop, jobs=None, lock=None):
+    """Standby until this process holds the leader lock, then run the KKM jobs until `stop`."""
+    conf = kkm_scheduler_settings()
+    lock = lock or LeaderLock(conf['LOCK_KEY'])
+    jobs = kkm_jobs() if jobs is None else jobs
+
+    while not stop.is_set():
+        if not await sync_to_async(lock.acquire)():
+            await sleep_or_stop(stop, conf['LEADER_POLL'])
+            continue
+
+        logger.info('KKM worker became the leader')
+        scheduler = asyncio.create_task(Scheduler(jobs).run(stop))
+        try:
+            while not scheduler.done():
+                if await sleep_or_stop(stop, conf['LEADER_POLL']):
+                    break
+                if not await sync_to_async(lock.held)():
+                    # другой воркер может уже стать ведущим - останавливаемся сразу
+                    logger.warning('KKM worker lost the leader lock')
+                    break
+        finally:
+            # при остановке начатые задания доделываются, при потере замка - прерываются
+            if not stop.is_set():
+                scheduler.cancel()
+            result, = await asyncio.gather(scheduler, return_exceptions=True)
+            if isinstance(result, Exception):
+                logger.error('KKM scheduler crashed: %r', result)
+            await sync_to_async(lock.release)()
+        if isinstance(result, Exception):
+            await sleep_or_stop(stop, conf['LEADER_POLL'])
@@ -0,0 +1,70 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.exceptions import ValidationError
+
+
+COUNT_QUERY_PARAM = 'count'
+COUNT_MODES = ('exact', 'estimate', 'none')
+
+DEFAULT_LISTING_COUNTS = {
+    'DEFAULT_MODE': 'exact',
+    'TTL': 60,
+}
+
+
+def listing_count_settings():
+    return {**DEFAULT_LISTING_COUNTS, **getattr(settings, 'LISTING_COUNTS', {})}
+
+
+def count_mode(request):
+    """?count=exact|estimate|none, LISTING_COUNTS['DEFAULT_MODE'] when absent."""
+    mode = request.query_params.get(COUNT_QUERY_PARAM) or listing_count_settings()['DEFAULT_MODE']
+    if mode not in COUNT_MODES:
+        raise ValidationError({COUNT_QUERY_PARAM: f'Expected one of: {", ".join(COUNT_MODES)}.'})
+    return mode
+
+
+def table_estimate(model, using='default'):
+    """Planner row estimate of the model's table (PostgreSQL), None if unknown."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+        row = cursor.fetchone()
+    # -1/0 - таблица еще не анализировалась
+    if row is None or row[0] <= 0:
+        return None
+    return row[0]
+
+
+def is_unfiltered(queryset):
+    query = queryset.query
+    return not query.where and not query.distinct and not query.combinator
+
+
+def cached_count(queryset):
+    sql, params = queryset.query.sql_with_params()
+    key = 'listing-count:' + hashlib.md5(f'{sql}|{params!r}'.encode('utf-8')).hexdigest()
+    return cache.get_or_set(key, queryset.count, listing_count_settings()['TTL'])
+
+
+def listing_count(queryset, mode):
+    """Total for a listing page: exact COUNT(*), a cheap estimate, or None.
+
+    `estimate` takes pg_class.reltuples for an unfiltered table and a
+    COUNT(*) cached for LISTING_COUNTS['TTL'] seconds for filtered ones, so
+    repeated page requests do not rescan the same set.
+    """
+    if mode == 'none':
+        return None
+    if mode == 'estimate':
+        if is_unfiltered(queryset):
+            estimate = table_estimate(queryset.model, queryset.db)
+            if estimate is not None:
+                return estimate
+        return cached_count(queryset)
+    return queryset.count()
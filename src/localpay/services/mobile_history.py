@@ -0,0 +1,48 @@
+import hashlib
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from localpay.models import User_mon
+
+
+MONTH_QUERY_PARAM = 'month'
+
+DEFAULT_MOBILE_HISTORY = {
+    # сколько секунд держится страница истории; устаревает она раньше - при смене payments_version
+    'TTL': 600,
+}
+
+
+def mobile_history_settings():
+    return {**DEFAULT_MOBILE_HISTORY, **getattr(settings, 'MOBILE_HISTORY', {})}
+
+
+def parse_month(value):
+    """?month=YYYY-MM -> first day of that month; the current month when absent."""
+    if not value:
+        return timezone.localdate().replace(day=1)
+    try:
+        return date.fromisoformat(f'{value}-01')
+    except ValueError:
+        raise ValidationError({MONTH_QUERY_PARAM: 'Expected YYYY-MM.'})
+
+
+def month_bounds(first_day):
+    """(first day, last day) of the month, inclusive."""
+    next_month = (first_day + timedelta(days=32)).replace(day=1)
+    return first_day, next_month - timedelta(days=1)
+
+
+def history_cache_key(user, month, query_params):
+    """Cache key of one history page: the installer's payments_version changes with every payment write.
+
+    The version is read from the database: request.user is a per-process
+    cached copy and may miss a payment made through another worker.
+    """
+    version = User_mon.objects.filter(pk=user.pk).values_list('payments_version', flat=True).first()
+    params = '&'.join(f'{name}={query_params[name]}' for name in sorted(query_params) if name != MONTH_QUERY_PARAM)
+    digest = hashlib.md5(params.encode('utf-8')).hexdigest()
+    return f'mobile-history:{user.pk}:{version}:{month:%Y-%m}:{digest}'
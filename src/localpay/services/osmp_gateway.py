@@ -0,0 +1,44 @@
+
+from django.conf import settings
+
+from localpay.services.pooled_client import PooledAsyncClient
+
+
+DEFAULT_OSMP_GATEWAY = {
+    'URL': 'http://pay.snt.kg:9080/localpayskynet_osmp/main',
+    'TIMEOUT': 30.0,
+    'CONNECT_TIMEOUT': 5.0,
+    'MAX_CONNECTIONS': 100,
+    'MAX_KEEPALIVE_CONNECTIONS': 20,
+    'KEEPALIVE_EXPIRY': 30.0,
+}
+
+
+def gateway_settings():
+    return {**DEFAULT_OSMP_GATEWAY, **getattr(settings, 'OSMP_GATEWAY', {})}
+
+
+class OsmpGatewayClient(PooledAsyncClient):
+    """Process-wide keep-alive client for the OSMP gateway (pay.snt.kg)."""
+    thread_name = 'osmp-gateway'
+
+    def settings(self):
+        return gateway_settings()
+
+    async def _send(self, params):
+        # runs on the gateway loop only
+        response = await self.client.post(gateway_settings()['URL'], params=params)
+        response.encoding = 'utf-8'
+        return response
+
+    async def request(self, command, **params):
+        return await self.submit(self._send({'command': command, **params}))
+
+    async def check(self, account):
+        return await self.request('check', account=account)
+
+    async def pay(self, txn_id, txn_date, account, amount):
+        return await self.request('pay', txn_id=txn_id, txn_date=txn_date, account=account, sum=amount)
+
+
+gateway = OsmpGatewayClient()
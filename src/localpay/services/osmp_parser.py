@@ -0,0 +1,56 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from lxml import etree
+
+
+OSMP_FIELDS = ('result', 'osmp_txn_id', 'sum', 'comment', 'fio')
+
+# без сети и подстановки сущностей: ответ шлюза - внешние данные
+_parser = etree.XMLParser(resolve_entities=False, no_network=True, remove_comments=True, huge_tree=False)
+
+
+class OsmpResponseError(ValueError):
+    """Gateway reply is not well-formed XML or has no <result>."""
+
+
+@dataclass(frozen=True, slots=True)
+class OsmpResponse:
+    result: str
+    osmp_txn_id: Optional[str] = None
+    sum: Optional[str] = None
+    comment: Optional[str] = None
+    fio: Optional[str] = None
+
+    @property
+    def ok(self):
+        return self.result == '0'
+
+
+def parse_osmp_response(body):
+    """Parse an OSMP gateway reply in one pass over the element tree.
+
+    `body` is the raw reply (bytes, or str which is encoded as UTF-8). The
+    first occurrence of each known tag wins; empty tags give ''. Raises
+    OsmpResponseError for malformed XML or a reply without <result>.
+    """
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    if not body or not body.strip():
+        raise OsmpResponseError('empty gateway reply')
+
+    try:
+        root = etree.fromstring(body, _parser)
+    except etree.XMLSyntaxError as e:
+        raise OsmpResponseError(f'malformed gateway reply: {e}') from None
+
+    values = {}
+    for element in root.iter(*OSMP_FIELDS):
+        if element.tag not in values:
+            values[element.tag] = (element.text or '').strip()
+            if len(values) == len(OSMP_FIELDS):
+                break
+
+    if 'result' not in values:
+        raise OsmpResponseError('gateway reply has no <result>')
+    return OsmpResponse(**values)
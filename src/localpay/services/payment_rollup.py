@@ -0,0 +1,135 @@
+from datetime import date
+
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from localpay.models import PaymentDailyRollup, Pays
+from localpay.utils import filter_paid_period, format_minor_units
+
+
+def rollup_state(payment):
+    """((user_id, day, status, annulment), amount_minor) the payment adds to the rollup; None without paid_at."""
+    if payment is None or payment.paid_at is None:
+        return None
+    key = (payment.user_id, timezone.localdate(payment.paid_at), payment.status_payment or '', payment.annulment)
+    return key, payment.amount_minor or 0
+
+
+def _add(key, count, amount_minor):
+    user_id, day, status_payment, annulment = key
+    row = PaymentDailyRollup.objects.filter(user_id=user_id, day=day, status_payment=status_payment, annulment=annulment)
+    if row.update(count=F('count') + count, amount_minor=F('amount_minor') + amount_minor):
+        return
+    try:
+        with transaction.atomic():
+            PaymentDailyRollup.objects.create(
+                user_id=user_id, day=day, status_payment=status_payment, annulment=annulment,
+                count=count, amount_minor=amount_minor,
+            )
+    except IntegrityError:
+        # строку того же дня только что вставил параллельный платеж
+        row.update(count=F('count') + count, amount_minor=F('amount_minor') + amount_minor)
+
+
+def apply_rollup(before, after):
+    """Move a payment's contribution from `before` to `after` (rollup_state() values, either may be None).
+
+    Call it in the transaction that writes the Pays row, so the rollup
+    commits or rolls back together with the payment.
+    """
+    if before == after:
+        return
+    if before is not None:
+        _add(before[0], -1, -before[1])
+    if after is not None:
+        _add(after[0], 1, after[1])
+
+
+def rollup_days(queryset):
+    """(user_id, day, status, annulment, count, amount_minor) aggregated from Pays rows."""
+    return (queryset
+            .filter(paid_at__isnull=False)
+            .annotate(day=TruncDate('paid_at'), status=Coalesce('status_payment', Value('')))
+            .values_list('user_id', 'day', 'status', 'annulment')
+            .annotate(count=Count('id'), amount=Coalesce(Sum('amount_minor'), 0))
+            .order_by())
+
+
+def rebuild_rollup(date_from=None, date_to=None, user_id=None):
+    """Recompute the rollup of a period (ISO dates, inclusive) from Pays; returns the number of rollup rows written.
+
+    Writers of the payments table wait for the rebuild on PostgreSQL
+    (SHARE lock), so no payment lands between the delete and the insert.
+    """
+    payments = filter_paid_period(Pays.objects.all(), date_from, date_to)
+    rollup = PaymentDailyRollup.objects.all()
+    if user_id:
+        payments, rollup = payments.filter(user_id=user_id), rollup.filter(user_id=user_id)
+    if date_from:
+        rollup = rollup.filter(day__gte=date_from)
+    if date_to:
+        rollup = rollup.filter(day__lte=date_to)
+
+    with transaction.atomic():
+        connection = connections[payments.db]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {Pays._meta.db_table} IN SHARE MODE')
+        rollup.delete()
+        rows = [
+            PaymentDailyRollup(user_id=user, day=day, status_payment=status, annulment=annulment,
+                               count=count, amount_minor=amount)
+            for user, day, status, annulment, count, amount in rollup_days(payments)
+        ]
+        PaymentDailyRollup.objects.bulk_create(rows, batch_size=2000)
+    return len(rows)
+
+
+def parse_day(value):
+    # только календарная дата: время в фильтре не совпадает с границами дней сводки
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def period_rollup(date_from, date_to, user_id=None):
+    """Rollup rows of an inclusive period of ISO dates; None when the period is not a pair of plain dates."""
+    start, end = parse_day(date_from), parse_day(date_to)
+    if start is None or end is None:
+        return None
+    rollup = PaymentDailyRollup.objects.filter(day__range=(start, end))
+    if user_id:
+        rollup = rollup.filter(user_id=user_id)
+    return rollup
+
+
+def period_count(date_from, date_to, user_id=None):
+    """Number of payments in the period read from the rollup (O(days)), None if it cannot answer."""
+    rollup = period_rollup(date_from, date_to, user_id)
+    if rollup is None:
+        return None
+    return rollup.aggregate(total=Coalesce(Sum('count'), 0))['total']
+
+
+def period_summary(date_from, date_to, user_id=None):
+    """Per-day and per-status counts and sums of a period from the rollup; None unless both are plain dates."""
+    rollup = period_rollup(date_from, date_to, user_id)
+    if rollup is None:
+        return None
+    rollup = rollup.filter(count__gt=0)
+
+    def rows(*fields):
+        return [
+            {**{field: row[field] for field in fields}, 'count': row['payments'], 'amount': format_minor_units(row['amount'])}
+            for row in rollup.values(*fields).annotate(payments=Sum('count'), amount=Sum('amount_minor')).order_by(*fields)
+        ]
+
+    return {
+        'date_from': date_from,
+        'date_to': date_to,
+        'days': rows('day', 'status_payment', 'annulment'),
+        'totals': rows('status_payment', 'annulment'),
+    }
@@ -0,0 +1,165 @@
+from decimal import InvalidOperation
+
+from django.db import transaction
+from django.db.models import F
+
+from localpay.models import User_mon, Pays
+from localpay.services.auth_user_cache import invalidate_auth_user
+from localpay.services.fiscal_receipts import enqueue_payment_receipt, fiscal_receipt_settings
+from localpay.services.payment_rollup import apply_rollup, rollup_state
+from localpay.services.telegram import notify
+from localpay.utils import to_minor_units, format_payment_date
+
+
+PENDING_STATUS = 'В обработке'
+DONE_STATUS = 'Выполнен'
+UNCONFIRMED_STATUS = 'Не подтвержден'
+
+
+def debit_amount(amount_minor):
+    """Whole som debited from the installer balance for a payment of `amount_minor` tyiyn."""
+    return amount_minor // 100
+
+
+def payment_changed(payment, before, after):
+    """Carry a Pays write into the daily rollup and bump the installer's payments_version.
+
+    `before`/`after` are rollup_state() of the row around the write. Call it
+    in the transaction of the write; the version invalidates the cached
+    mobile history on commit, and the installer is dropped from the
+    authenticated-user cache.
+
+    Every payment transaction locks the User_mon row before the rollup row
+    (reserve_payment debits first), otherwise two payments of one installer
+    deadlock on PostgreSQL.
+    """
+    User_mon.objects.filter(pk=payment.user_id).update(payments_version=F('payments_version') + 1)
+    apply_rollup(before, after)
+    # баланс и версия поменялись UPDATE'ом - закэшированный для JWT монтажник устарел
+    invalidate_auth_user(payment.user_id)
+    # монтажник, загруженный вместе с платежом, не должен затереть версию своим save()
+    if Pays.user.is_cached(payment):
+        payment.user.refresh_from_db(fields=['payments_version'])
+
+
+def lock_balance(user_id):
+    """Lock the installer row and return its current balances; call inside transaction.atomic.
+
+    Checks and audit records that need the balance before a change read it
+    here: a concurrent reserve_payment debit either committed before the lock
+    or waits until this transaction ends.
+    """
+    return User_mon.objects.select_for_update().values_list('balance', 'avail_balance').get(pk=user_id)
+
+
+def add_balance(user_id, balance=0, avail_balance=0):
+    """Add to the installer balances with a relative UPDATE and return the new (balance, avail_balance)."""
+    User_mon.objects.filter(pk=user_id).update(
+        balance=F('balance') + balance,
+        avail_balance=F('avail_balance') + avail_balance,
+    )
+    invalidate_auth_user(user_id)
+    return User_mon.objects.values_list('balance', 'avail_balance').get(pk=user_id)
+
+
+@transaction.atomic
+def create_payment(**fields):
+    """Insert a Pays row and count it in the daily rollup."""
+    payment = Pays.objects.create(**fields)
+    payment_changed(payment, None, rollup_state(payment))
+    return payment
+
+
+@transaction.atomic
+def reserve_payment(user_id, ls, money, paid_at):
+    """Debit the installer and insert a pending Pays row in one transaction.
+
+    The debit is a single conditional UPDATE (balance >= money, access
+    granted), so concurrent payments of one installer neither overspend nor
+    lose updates, and no row lock is held while the gateway is called.
+    Returns the pending payment, or None when funds or access are missing.
+    """
+    amount_minor = to_minor_units(money)
+    amount = debit_amount(amount_minor)
+    debited = User_mon.objects.filter(pk=user_id, access=True, balance__gte=money).update(
+        balance=F('balance') - amount,
+        avail_balance=F('avail_balance') - amount,
+    )
+    if not debited:
+        return None
+    return create_payment(
+        user_id=user_id, ls_abon=ls, status_payment=PENDING_STATUS,
+        amount_minor=amount_minor, paid_at=paid_at,
+        # прежние строковые колонки пишутся для совместимости
+        money=str(money), date_payment=format_payment_date(paid_at),
+    )
+
+
+@transaction.atomic
+def settle_payment(payment, transaction_id, transaction_sum, accepted_at):
+    """Mark a reserved payment as done; correct the debit if the gateway charged another sum.
+
+    With FISCAL_RECEIPTS['FOR_PAYMENTS'] the sale receipt is queued in the same transaction.
+    """
+    before = rollup_state(payment)
+    reserved = debit_amount(payment.amount_minor)
+    try:
+        charged_minor = to_minor_units(transaction_sum)
+    except (InvalidOperation, ValueError):
+        charged_minor, transaction_sum = payment.amount_minor, payment.money
+    charged = debit_amount(charged_minor)
+
+    if charged != reserved:
+        User_mon.objects.filter(pk=payment.user_id).update(
+            balance=F('balance') - (charged - reserved),
+            avail_balance=F('avail_balance') - (charged - reserved),
+        )
+
+    payment.number_payment = transaction_id
+    payment.accept_payment = accepted_at
+    payment.amount_minor = charged_minor
+    payment.money = transaction_sum
+    payment.status_payment = DONE_STATUS
+    payment.save(update_fields=['number_payment', 'accept_payment', 'amount_minor', 'money', 'status_payment', 'updated_at'])
+    payment_changed(payment, before, rollup_state(payment))
+    # чек пробивает воркер (manage.py run_receipt_worker); платеж кассу не ждет
+    if fiscal_receipt_settings()['FOR_PAYMENTS']:
+        enqueue_payment_receipt(payment)
+    return payment
+
+
+@transaction.atomic
+def release_payment(payment):
+    """Return the reserved sum and drop the pending row (gateway refused or was unreachable)."""
+    amount = debit_amount(payment.amount_minor)
+    User_mon.objects.filter(pk=payment.user_id).update(
+        balance=F('balance') + amount,
+        avail_balance=F('avail_balance') + amount,
+    )
+    payment_changed(payment, rollup_state(payment), None)
+    payment.delete()
+
+
+@transaction.atomic
+def mark_unconfirmed(payment):
+    """Keep the reservation when the gateway outcome is unknown (timeout, garbled reply)."""
+    before = rollup_state(payment)
+    payment.status_payment = UNCONFIRMED_STATUS
+    payment.save(update_fields=['status_payment', 'updated_at'])
+    payment_changed(payment, before, rollup_state(payment))
+    # при сбое шлюза таких платежей много - ключ сводит их в одно сообщение за окно
+    transaction.on_commit(lambda: notify(
+        f'Платеж {payment.pk} (л/с {payment.ls_abon}) не подтвержден шлюзом, проверьте статус',
+        key='payment:unconfirmed',
+    ))
+    return payment
+
+
+@transaction.atomic
+def annul_payment(payment):
+    """Flag the payment as annulled and move it to the annulled rollup bucket."""
+    before = rollup_state(payment)
+    payment.annulment = True
+    payment.save()
+    payment_changed(payment, before, rollup_state(payment))
+    return payment
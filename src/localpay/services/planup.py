@@ -0,0 +1,81 @@
+import asyncio
+
+import httpx
+from django.conf import settings
+
+from localpay.services.pooled_client import PooledAsyncClient
+
+
+DEFAULT_PLANUP = {
+    'URL': 'http://planup.skynet.kg:8000/planup/localpay_naryd/',
+    'TIMEOUT': 30.0,
+    'CONNECT_TIMEOUT': 5.0,
+    # предельное время одного запроса целиком, секунды
+    'REQUEST_TIMEOUT': 60.0,
+    # сколько монтажников запрашивать одновременно
+    'CONCURRENCY': 10,
+    'MAX_CONNECTIONS': 20,
+    'MAX_KEEPALIVE_CONNECTIONS': 10,
+    'KEEPALIVE_EXPIRY': 30.0,
+}
+
+
+def planup_settings():
+    return {**DEFAULT_PLANUP, **getattr(settings, 'PLANUP', {})}
+
+
+class PlanupClient(PooledAsyncClient):
+    """Keep-alive client for Planup work orders (planup.skynet.kg)."""
+    thread_name = 'planup'
+
+    def settings(self):
+        return planup_settings()
+
+    async def _fetch(self, planup_id, start_date, end_date):
+        # runs on the planup loop only
+        conf = planup_settings()
+        data = {'planup_id': planup_id, 'start_date': start_date, 'end_date': end_date}
+        response = await asyncio.wait_for(self.client.post(conf['URL'], data=data), conf['REQUEST_TIMEOUT'])
+        response.raise_for_status()
+        return response.json()
+
+    async def _fetch_many(self, requests):
+        semaphore = asyncio.Semaphore(planup_settings()['CONCURRENCY'])
+        payments, failures = {}, []
+
+        async def one(key, planup_id, start_date, end_date):
+            async with semaphore:
+                try:
+                    payments[key] = await self._fetch(planup_id, start_date, end_date)
+                except asyncio.TimeoutError:
+                    failures.append((key, planup_id, 'timeout'))
+                except httpx.HTTPStatusError as e:
+                    failures.append((key, planup_id, f'status {e.response.status_code}'))
+                except (httpx.HTTPError, ValueError) as e:
+                    failures.append((key, planup_id, str(e) or type(e).__name__))
+
+        await asyncio.gather(*(one(*request) for request in requests))
+        return payments, failures
+
+    def fetch_windows(self, requests):
+        """Work orders for every (key, planup_id, start_date, end_date) in `requests`.
+
+        Requests run concurrently on the pooled client, at most
+        PLANUP['CONCURRENCY'] at a time, each bounded by REQUEST_TIMEOUT.
+        Returns ({key: [order, ...]}, [(key, planup_id, error), ...]).
+        """
+        return self.run_sync(self._fetch_many(list(requests)))
+
+    def fetch_payments(self, installers, start_date, end_date):
+        """Work orders of every (user_id, planup_id) in `installers` for one period.
+
+        Returns ({user_id: [order, ...]}, [{'user_id', 'planup_id', 'error'}, ...]).
+        """
+        payments, failures = self.fetch_windows(
+            (user_id, planup_id, start_date, end_date) for user_id, planup_id in installers
+        )
+        return payments, [{'user_id': user_id, 'planup_id': planup_id, 'error': error}
+                          for user_id, planup_id, error in failures]
+
+
+planup = PlanupClient()
@@ -0,0 +1,163 @@
+import decimal
+import logging
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from localpay.models import PlanupPayment, PlanupSyncWindow
+from localpay.services.planup import planup
+
+
+logger = logging.getLogger('payment_actions')
+
+DEFAULT_PLANUP_MIRROR = {
+    # сверка читает наряды из локальной копии, забирая из Planup только устаревшие дни
+    'ENABLED': True,
+    # сколько секунд синхронизированный день считается свежим
+    'FRESH_FOR': 600,
+    # день, забранный позже чем через столько дней после него, больше не перезапрашивается
+    'SETTLED_AFTER_DAYS': 7,
+    # сколько окон запрашивается за один проход: ответы держатся в памяти до записи
+    'BATCH_SIZE': 50,
+}
+
+
+def planup_mirror_settings():
+    return {**DEFAULT_PLANUP_MIRROR, **getattr(settings, 'PLANUP_MIRROR', {})}
+
+
+def to_day(value):
+    if isinstance(value, date):
+        return value if not isinstance(value, datetime) else value.date()
+    return datetime.fromisoformat(value).date()
+
+
+def days(start, end):
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def is_stale(day, synced_at, now, conf):
+    if synced_at is None:
+        return True
+    if timezone.localdate(synced_at) > day + timedelta(days=conf['SETTLED_AFTER_DAYS']):
+        return False
+    return (now - synced_at).total_seconds() >= conf['FRESH_FOR']
+
+
+def stale_runs(installer_ids, start, end, force=False, now=None):
+    """{installer_id: [(first_day, last_day), ...]} - consecutive days that need a Planup request."""
+    conf = planup_mirror_settings()
+    now = now or timezone.now()
+    synced = {}
+    if not force:
+        synced = {
+            (installer_id, day): synced_at
+            for installer_id, day, synced_at in PlanupSyncWindow.objects
+            .filter(installer_id__in=installer_ids, day__range=(start, end))
+            .values_list('installer_id', 'day', 'synced_at')
+        }
+
+    runs = {}
+    for installer_id in installer_ids:
+        for day in days(start, end):
+            if not is_stale(day, synced.get((installer_id, day)), now, conf):
+                continue
+            installer_runs = runs.setdefault(installer_id, [])
+            if installer_runs and installer_runs[-1][1] == day - timedelta(days=1):
+                installer_runs[-1] = (installer_runs[-1][0], day)
+            else:
+                installer_runs.append((day, day))
+    return runs
+
+
+def order_day(order, first_day, last_day):
+    # наряд относится к дню своего end_date; без даты или вне окна - к первому дню окна
+    try:
+        day = to_day(str(order.get('end_date'))[:10])
+    except (TypeError, ValueError):
+        return first_day
+    return day if first_day <= day <= last_day else first_day
+
+
+def parse_money(money_str):
+    try:
+        return int(decimal.Decimal(money_str) * 100)
+    except (ValueError, TypeError, decimal.InvalidOperation):
+        return 0
+
+
+def store_window(installer_id, first_day, last_day, orders, synced_at):
+    # повтор наряда в ответе: ON CONFLICT не может обновить одну строку дважды
+    rows = list({
+        order['id']: PlanupPayment(
+            planup_id=order['id'], installer_id=installer_id, ls_abon=order['ls_abon'],
+            amount_minor=parse_money(order['money']), end_date=order.get('end_date'),
+            closed_on=order_day(order, first_day, last_day),
+        )
+        for order in orders
+    }.values())
+    windows = [PlanupSyncWindow(installer_id=installer_id, day=day, synced_at=synced_at)
+               for day in days(first_day, last_day)]
+    with transaction.atomic():
+        # наряды, которых Planup за эти дни больше не отдает
+        (PlanupPayment.objects
+         .filter(installer_id=installer_id, closed_on__range=(first_day, last_day))
+         .exclude(planup_id__in=[row.planup_id for row in rows])
+         .delete())
+        PlanupPayment.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['planup_id'],
+            update_fields=['installer', 'ls_abon', 'amount_minor', 'end_date', 'closed_on', 'synced_at'],
+        )
+        PlanupSyncWindow.objects.bulk_create(
+            windows, update_conflicts=True, unique_fields=['installer', 'day'], update_fields=['synced_at'],
+        )
+
+
+def sync_planup(installers, date_from, date_to, force=False, client=None):
+    """Refresh the stale days of (user_id, planup_id) installers from Planup.
+
+    Consecutive stale days of one installer go in a single request.
+    Returns (number of refreshed windows, [{'user_id', 'planup_id', 'error'}, ...]).
+    """
+    start, end = to_day(date_from), to_day(date_to)
+    planup_ids = dict(installers)
+    runs = stale_runs(list(planup_ids), start, end, force=force)
+    requests = [
+        ((user_id, first_day, last_day), planup_ids[user_id], first_day.isoformat(), last_day.isoformat())
+        for user_id, installer_runs in runs.items() for first_day, last_day in installer_runs
+    ]
+    if not requests:
+        return 0, []
+
+    batch_size = planup_mirror_settings()['BATCH_SIZE']
+    synced, errors = 0, {}
+    for i in range(0, len(requests), batch_size):
+        # окно помечается временем начала запроса: изменения во время запроса подберет следующая синхронизация
+        synced_at = timezone.now()
+        fetched, failures = (client or planup).fetch_windows(requests[i:i + batch_size])
+        for (user_id, first_day, last_day), orders in fetched.items():
+            store_window(user_id, first_day, last_day, orders, synced_at)
+        synced += len(fetched)
+        for (user_id, _, _), planup_id, error in failures:
+            errors.setdefault(user_id, {'user_id': user_id, 'planup_id': planup_id, 'error': error})
+
+    if errors:
+        logger.warning('Planup sync failed for installers %s', sorted(errors))
+    return synced, list(errors.values())
+
+
+def mirror_payments(user_ids, date_from, date_to, chunk_size=2000):
+    """Non-zero mirrored Planup payments of the period ordered by installer, in the shape reconcile() expects."""
+    queryset = PlanupPayment.objects.filter(closed_on__range=(to_day(date_from), to_day(date_to))).exclude(amount_minor=0)
+    if user_ids is not None:
+        queryset = queryset.filter(installer_id__in=user_ids)
+    rows = (queryset
+            .order_by('installer_id', 'closed_on', 'planup_id')
+            .values_list('installer_id', 'ls_abon', 'amount_minor', 'planup_id', 'end_date')
+            .iterator(chunk_size=chunk_size))
+    return (
+        {'user_id': user_id, 'ls_abon': ls_abon, 'money': money, 'planup_id': planup_id, 'end_date': end_date}
+        for user_id, ls_abon, money, planup_id, end_date in rows
+    )
@@ -0,0 +1,99 @@
+import asyncio
+import atexit
+import itertools
+import threading
+import weakref
+
+import httpx
+
+
+# все клиенты процесса, в порядке создания; закрываются вместе (close_all_clients)
+_clients = weakref.WeakValueDictionary()
+_client_ids = itertools.count()
+
+
+class PooledAsyncClient:
+    """Process-wide keep-alive httpx client served from one background event loop.
+
+    httpx connections belong to the event loop that opened them, so every
+    request is executed on one dedicated loop thread. Async callers await
+    it from any loop (ASGI, async_to_sync) through submit(), sync callers
+    use run_sync(), and all of them share the same connection pool.
+    Subclasses provide settings() with TIMEOUT, CONNECT_TIMEOUT,
+    MAX_CONNECTIONS, MAX_KEEPALIVE_CONNECTIONS and KEEPALIVE_EXPIRY.
+    Every instance is registered for close_all_clients().
+    """
+    thread_name = 'http-pool'
+
+    def __init__(self, transport=None):
+        self._transport = transport
+        self._client = None
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        _clients[next(_client_ids)] = self
+
+    def settings(self):
+        raise NotImplementedError
+
+    def _build_client(self):
+        conf = self.settings()
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(conf['TIMEOUT'], connect=conf['CONNECT_TIMEOUT']),
+            limits=httpx.Limits(
+                max_connections=conf['MAX_CONNECTIONS'],
+                max_keepalive_connections=conf['MAX_KEEPALIVE_CONNECTIONS'],
+                keepalive_expiry=conf['KEEPALIVE_EXPIRY'],
+            ),
+            transport=self._transport,
+        )
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name=self.thread_name, daemon=True)
+                self._thread.start()
+            return self._loop
+
+    @property
+    def client(self):
+        # только из фонового цикла
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+
+    async def submit(self, coro):
+        """Run `coro` on the client loop and await its result from the caller's loop."""
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        return await asyncio.wrap_future(future)
+
+    def run_sync(self, coro):
+        """Run a coroutine on the client loop from sync code and wait for it."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    async def _close_client(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def close(self):
+        """Close pooled connections and stop the loop."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._close_client(), loop).result(timeout=10)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=10)
+        loop.close()
+
+
+def close_all_clients():
+    """Close every pooled client of the process, newest first (ASGI lifespan shutdown, exit)."""
+    for client in reversed(list(_clients.values())):
+        client.close()
+
+
+atexit.register(close_all_clients)
@@ -0,0 +1,159 @@
+import heapq
+from collections import defaultdict, deque
+from itertools import groupby
+
+from django.utils import timezone
+
+from localpay.utils import format_payment_date
+
+
+MISSING_IN_PLANUP = "ТАКОЙ ОТСУТСВУЕТ В PLANUP"
+MISSING_IN_LOCALPAY = "ПЛАТЕЖ ОТСУТСВУЕТ В LOCALPAY"
+
+LOCALPAY_COLUMNS = ('user_id', 'ls_abon', 'amount_minor', 'status_payment', 'paid_at', 'user__name', 'user__surname')
+
+
+def localpay_rows(queryset):
+    """LocalPay side of the reconciliation: plain dicts with the installer name joined in."""
+    return queryset.order_by('user_id', 'paid_at', 'id').values(*LOCALPAY_COLUMNS)
+
+
+def format_money(cents):
+    return f"{cents / 100:.2f}"
+
+
+class Reconciliation:
+    """Hash-join of LocalPay and Planup payments on (user_id, ls_abon, amount in tyiyn).
+
+    LocalPay rows are added first; every one waits in a per-key queue. Each
+    Planup payment then takes the oldest unmatched LocalPay row with the
+    same key, so duplicates are paired one to one and surplus rows on
+    either side are reported as missing. Work is linear in the number of
+    payments on both sides.
+    """
+
+    def __init__(self):
+        self.installers = {}
+        self._unmatched = defaultdict(deque)
+        self.localpay_total = 0
+        self.planup_total = 0
+        self._tz = timezone.get_current_timezone()
+
+    def _installer(self, user_id, name=None, surname=None):
+        installer = self.installers.get(user_id)
+        if installer is None:
+            installer = self.installers[user_id] = {
+                "user_id": user_id,
+                "name": name,
+                "surname": surname,
+                "payments": [],
+                "localpay_total": 0,
+                "planup_total": 0
+            }
+        return installer
+
+    def add_localpay(self, row):
+        money = row['amount_minor'] or 0
+        installer = self._installer(row['user_id'], row['user__name'], row['user__surname'])
+        entry = {
+            "ls_abon": row['ls_abon'],
+            "localpay_money": format_money(money),
+            "planup_money": MISSING_IN_PLANUP,
+            "status_payment": row['status_payment'],
+            "date_payment": format_payment_date(row['paid_at'], self._tz),
+            "end_date": None,
+            "planup_id": None
+        }
+        installer["payments"].append(entry)
+        installer["localpay_total"] += money
+        self.localpay_total += money
+        self._unmatched[(row['user_id'], row['ls_abon'], money)].append(entry)
+
+    def add_planup(self, payment):
+        user_id, money = payment["user_id"], payment["money"]
+        installer = self._installer(user_id)
+        queue = self._unmatched.get((user_id, payment["ls_abon"], money))
+        if queue:
+            entry = queue.popleft()
+            entry["planup_money"] = format_money(money)
+            entry["planup_id"] = payment["planup_id"]
+        else:
+            installer["payments"].append({
+                "ls_abon": payment["ls_abon"],
+                "localpay_money": MISSING_IN_LOCALPAY,
+                "planup_money": format_money(money),
+                "status_payment": None,
+                "date_payment": None,
+                "end_date": payment["end_date"],
+                "planup_id": payment["planup_id"]
+            })
+        installer["planup_total"] += money
+        self.planup_total += money
+
+    def missing_names(self):
+        """Installers seen only in Planup, whose names are still unknown."""
+        return [user_id for user_id, installer in self.installers.items() if installer["name"] is None]
+
+    def set_names(self, names):
+        for user_id, (name, surname) in names.items():
+            self.installers[user_id]["name"] = name
+            self.installers[user_id]["surname"] = surname
+
+    def totals(self):
+        return {
+            "user_id": "Итого",
+            "name": "",
+            "surname": "",
+            "payments": [],
+            "localpay_total": format_money(self.localpay_total),
+            "planup_total": format_money(self.planup_total)
+        }
+
+    def report(self):
+        return [*self.installers.values(), self.totals()]
+
+
+def reconcile(localpay, planup_payments, load_names=None):
+    """Report rows per installer followed by the totals row.
+
+    `localpay` are rows shaped like localpay_rows(); `load_names(user_ids)`
+    returns {user_id: (name, surname)} for installers present only in Planup.
+    """
+    reconciliation = Reconciliation()
+    for row in localpay:
+        reconciliation.add_localpay(row)
+    for payment in planup_payments:
+        reconciliation.add_planup(payment)
+    missing = reconciliation.missing_names()
+    if missing and load_names is not None:
+        reconciliation.set_names(load_names(missing))
+    return reconciliation.report()
+
+
+def reconcile_stream(localpay, planup_payments, names):
+    """Yield each installer's report row as soon as it is reconciled; return the totals row.
+
+    Both inputs must be ordered by user_id (localpay_rows(), mirror_payments()),
+    so only one installer's payments are held at a time. `names` is
+    {user_id: (name, surname)} for installers present only in Planup.
+    """
+    totals = Reconciliation()
+    # внутри монтажника строки LocalPay идут раньше платежей Planup
+    merged = heapq.merge(
+        ((row['user_id'], 0, row) for row in localpay),
+        ((payment['user_id'], 1, payment) for payment in planup_payments),
+        key=lambda item: item[:2],
+    )
+    for user_id, items in groupby(merged, key=lambda item: item[0]):
+        reconciliation = Reconciliation()
+        for _, side, row in items:
+            if side == 0:
+                reconciliation.add_localpay(row)
+            else:
+                reconciliation.add_planup(row)
+        if reconciliation.missing_names():
+            reconciliation.set_names({user_id: names.get(user_id, (None, None))})
+        totals.localpay_total += reconciliation.localpay_total
+        totals.planup_total += reconciliation.planup_total
+        yield reconciliation.installers[user_id]
+    return totals.totals()
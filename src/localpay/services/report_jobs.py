@@ -0,0 +1,143 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.utils import timezone
+
+from localpay.models import ComparisonReportJob
+from localpay.services.comparison_report import ReportCancelled, build_comparison_report
+
+
+logger = logging.getLogger('payment_actions')
+
+DEFAULT_REPORT_JOBS = {
+    # сколько секунд готовый отчет отдается повторно вместо нового расчета
+    'RESULT_TTL': 3600,
+    # пауза воркера при пустой очереди, секунды
+    'POLL_INTERVAL': 2.0,
+    # как часто воркер отмечается в задании, которое считает (секунды)
+    'HEARTBEAT_INTERVAL': 30,
+    # задание в статусе running без отметки воркера дольше этого считается брошенным (воркер упал)
+    'RUNNING_TIMEOUT': 300,
+    # как часто воркер ищет брошенные задания (секунды)
+    'REQUEUE_INTERVAL': 60,
+}
+
+
+def report_job_settings():
+    return {**DEFAULT_REPORT_JOBS, **getattr(settings, 'REPORT_JOBS', {})}
+
+
+def submit_report_job(installer_id, date_from, date_to, requested_by=None):
+    """Queue a comparison report, or reuse a queued, running or fresh finished one with the same parameters.
+
+    Returns (job, created).
+    """
+    fresh_since = timezone.now() - timedelta(seconds=report_job_settings()['RESULT_TTL'])
+    existing = (
+        ComparisonReportJob.objects
+        .filter(installer_id=installer_id, date_from=date_from, date_to=date_to, cancel_requested=False)
+        .filter(Q(status__in=[ComparisonReportJob.QUEUED, ComparisonReportJob.RUNNING]) |
+                Q(status=ComparisonReportJob.DONE, finished_at__gte=fresh_since))
+        .order_by('-created_at')
+        .first()
+    )
+    if existing is not None:
+        return existing, False
+    job = ComparisonReportJob.objects.create(
+        installer_id=installer_id, date_from=date_from, date_to=date_to, requested_by=requested_by,
+    )
+    return job, True
+
+
+def cancel_report_job(job):
+    """Cancel a queued job at once; a running one stops at the worker's next check."""
+    now = timezone.now()
+    if ComparisonReportJob.objects.filter(pk=job.pk, status=ComparisonReportJob.QUEUED).update(
+            status=ComparisonReportJob.CANCELLED, cancel_requested=True, finished_at=now):
+        return
+    ComparisonReportJob.objects.filter(pk=job.pk, status=ComparisonReportJob.RUNNING).update(cancel_requested=True)
+
+
+def claim_next_job():
+    """Take the oldest queued job; the conditional UPDATE lets several workers share the queue."""
+    candidates = (ComparisonReportJob.objects
+                  .filter(status=ComparisonReportJob.QUEUED)
+                  .order_by('created_at')
+                  .values_list('pk', flat=True)[:10])
+    for pk in candidates:
+        now = timezone.now()
+        if ComparisonReportJob.objects.filter(pk=pk, status=ComparisonReportJob.QUEUED).update(
+                status=ComparisonReportJob.RUNNING, started_at=now, heartbeat_at=now):
+            return ComparisonReportJob.objects.get(pk=pk)
+    return None
+
+
+def requeue_abandoned_jobs():
+    """Put back jobs whose worker died mid-run; a long report of a live worker keeps its heartbeat fresh."""
+    stale_before = timezone.now() - timedelta(seconds=report_job_settings()['RUNNING_TIMEOUT'])
+    return ComparisonReportJob.objects.filter(
+        Q(heartbeat_at__lt=stale_before) | Q(heartbeat_at__isnull=True, started_at__lt=stale_before),
+        status=ComparisonReportJob.RUNNING, cancel_requested=False,
+    ).update(status=ComparisonReportJob.QUEUED, started_at=None, heartbeat_at=None)
+
+
+class JobHeartbeat(threading.Thread):
+    """Touch heartbeat_at of a running job every HEARTBEAT_INTERVAL seconds until stopped."""
+
+    def __init__(self, job):
+        super().__init__(name=f'report-job-heartbeat-{job.pk}', daemon=True)
+        self.job_pk = job.pk
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(report_job_settings()['HEARTBEAT_INTERVAL']):
+                try:
+                    ComparisonReportJob.objects.filter(pk=self.job_pk, status=ComparisonReportJob.RUNNING).update(
+                        heartbeat_at=timezone.now(),
+                    )
+                except DatabaseError:
+                    logger.warning('Comparison report job %s: heartbeat failed', self.job_pk, exc_info=True)
+        finally:
+            # у потока свое соединение с базой
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_report_job(job):
+    heartbeat = JobHeartbeat(job)
+    heartbeat.start()
+    try:
+        _run_report_job(job)
+    finally:
+        heartbeat.stop()
+
+
+def _run_report_job(job):
+    def cancelled():
+        return ComparisonReportJob.objects.filter(pk=job.pk, cancel_requested=True).exists()
+
+    running = ComparisonReportJob.objects.filter(pk=job.pk, status=ComparisonReportJob.RUNNING)
+    try:
+        result = build_comparison_report(
+            job.installer_id, job.date_from.isoformat(), job.date_to.isoformat(), cancelled=cancelled,
+        )
+    except ReportCancelled:
+        running.update(status=ComparisonReportJob.CANCELLED, finished_at=timezone.now())
+        return
+    except Exception as e:
+        logger.exception('Comparison report job %s failed', job.pk)
+        running.update(status=ComparisonReportJob.FAILED, error=str(e) or type(e).__name__, finished_at=timezone.now())
+        return
+
+    # отмена, пришедшая уже после расчета, тоже выигрывает
+    if not running.filter(cancel_requested=False).update(
+            status=ComparisonReportJob.DONE, result=result, finished_at=timezone.now()):
+        running.update(status=ComparisonReportJob.CANCELLED, finished_at=timezone.now())
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+import httpx
+from django.conf import settings
+
+from localpay.services.pooled_client import PooledAsyncClient
+
+
+logger = logging.getLogger('kkm')
+
+DEFAULT_TELEGRAM = {
+    'URL': 'https://api.telegram.org',
+    # пустой токен или чат - уведомления выключены
+    'BOT_TOKEN': '',
+    'CHAT_ID': '',
+    'TIMEOUT': 20.0,
+    'CONNECT_TIMEOUT': 5.0,
+    'MAX_CONNECTIONS': 2,
+    'MAX_KEEPALIVE_CONNECTIONS': 1,
+    'KEEPALIVE_EXPIRY': 60.0,
+    # не чаще одного сообщения в MIN_INTERVAL секунд (в группу Telegram - до 20 в минуту)
+    'MIN_INTERVAL': 3.0,
+    # повторы одного уведомления в течение окна приходят одним сообщением в конце окна
+    'COALESCE_WINDOW': 300.0,
+    'MAX_PENDING': 500,
+    'MAX_ATTEMPTS': 3,
+    # сколько секунд при выходе процесса дожидаться отправки очереди
+    'FLUSH_TIMEOUT': 10.0,
+}
+
+
+def telegram_settings():
+    return {**DEFAULT_TELEGRAM, **getattr(settings, 'TELEGRAM', {})}
+
+
+class TelegramNotifier(PooledAsyncClient):
+    """Process-wide background queue of Telegram alerts for one chat.
+
+    notify() only hands the message to the client loop and returns, so
+    sync and async callers never wait for Telegram. On the loop a single
+    sender keeps one keep-alive connection, sends at most one message per
+    MIN_INTERVAL and honours 429 retry_after. Alerts with the same key
+    (the text by default) are coalesced: the first goes out at once, the
+    repeats within COALESCE_WINDOW follow as one message with a counter
+    and the latest text.
+    """
+    thread_name = 'telegram'
+
+    def __init__(self, transport=None):
+        super().__init__(transport)
+        # дальше - состояние только потока клиента
+        self._pending = OrderedDict()   # key -> [text, count]: ждут отправки
+        self._windows = {}              # key -> [конец окна, text, повторы]: недавно отправленные
+        self._wakeup = None
+        self._sender = None
+        self._last_sent = 0.0
+
+    def settings(self):
+        return telegram_settings()
+
+    def notify(self, text, key=None):
+        conf = telegram_settings()
+        if not conf['BOT_TOKEN'] or not conf['CHAT_ID']:
+            logger.info('Telegram is not configured, alert dropped: %s', text)
+            return
+        self._ensure_loop().call_soon_threadsafe(self._add, key or text, text)
+
+    def _add(self, key, text):
+        # в сводку идет последний текст: у уведомлений с общим key он может отличаться
+        window = self._windows.get(key)
+        if window is not None:
+            window[1:] = [text, window[2] + 1]
+            return
+        entry = self._pending.get(key)
+        if entry is not None:
+            entry[:] = [text, entry[1] + 1]
+            return
+        self._pending[key] = [text, 1]
+        while len(self._pending) > telegram_settings()['MAX_PENDING']:
+            dropped, _ = self._pending.popitem(last=False)
+            logger.warning('Telegram queue is full, alert dropped: %s', dropped)
+        self._wake()
+
+    def _wake(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.get_running_loop().create_task(self._run())
+        self._wakeup.set()
+
+    def _close_windows(self, now):
+        # окно закончилось: накопленные повторы уходят одним сообщением и открывают новое окно
+        for key, (ends_at, text, repeats) in list(self._windows.items()):
+            if ends_at <= now:
+                del self._windows[key]
+                if repeats:
+                    self._pending[key] = [text, repeats]
+
+    async def _run(self):
+        while True:
+            conf = telegram_settings()
+            now = time.monotonic()
+            self._close_windows(now)
+
+            if not self._pending:
+                timeout = min(ends_at for ends_at, _, _ in self._windows.values()) - now if self._windows else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            delay = self._last_sent + conf['MIN_INTERVAL'] - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            key, (text, count) = self._pending.popitem(last=False)
+            await self._send(text if count == 1 else f'{text}\n(таких уведомлений: {count})')
+            self._last_sent = time.monotonic()
+            self._windows[key] = [self._last_sent + conf['COALESCE_WINDOW'], text, 0]
+
+    async def _send(self, text):
+        conf = telegram_settings()
+        url = f"{conf['URL']}/bot{conf['BOT_TOKEN']}/sendMessage"
+        for attempt in range(1, conf['MAX_ATTEMPTS'] + 1):
+            try:
+                response = await self.client.post(url, json={'chat_id': conf['CHAT_ID'], 'text': text})
+            except httpx.HTTPError as e:
+                # в тексте ошибки httpx есть URL с токеном - пишем только тип
+                logger.warning('Telegram send failed (%s), attempt %s', type(e).__name__, attempt)
+                await asyncio.sleep(attempt)
+                continue
+            if response.status_code == 429:
+                try:
+                    retry_after = response.json()['parameters']['retry_after']
+                except (ValueError, KeyError, TypeError):
+                    retry_after = conf['MIN_INTERVAL']
+                await asyncio.sleep(retry_after)
+                continue
+            if response.is_error:
+                logger.error('Telegram rejected an alert: %s %s', response.status_code, response.text)
+            return
+        logger.error('Telegram alert dropped after %s attempts: %s', conf['MAX_ATTEMPTS'], text)
+
+    async def _flush(self, timeout):
+        deadline = time.monotonic() + timeout
+        while self._pending and self._sender is not None and not self._sender.done() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._sender is not None:
+            self._sender.cancel()
+            await asyncio.gather(self._sender, return_exceptions=True)
+        self._sender = self._wakeup = None
+        self._pending.clear()
+        self._windows.clear()
+
+    def close(self):
+        """Send what is queued (up to FLUSH_TIMEOUT), then close the connection."""
+        loop = self._loop
+        if loop is not None:
+            timeout = telegram_settings()['FLUSH_TIMEOUT']
+            asyncio.run_coroutine_threadsafe(self._flush(timeout), loop).result(timeout=timeout + 5)
+        super().close()
+
+
+notifier = TelegramNotifier()
+
+
+def notify(text, key=None):
+    """Queue a Telegram alert; never blocks the caller."""
+    notifier.notify(text, key)
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.db.models import Prefetch
+
+from localpay.models import Comment
+
+
+DEFAULT_USER_PROJECTIONS = {
+    # сколько последних операций баланса отдают карточка монтажника и мобильный профиль;
+    # полная история - постранично в users/<pk>/comments/ и mobile/user-comments/
+    'LATEST_COMMENTS': 10,
+}
+
+
+def user_projection_settings():
+    return {**DEFAULT_USER_PROJECTIONS, **getattr(settings, 'USER_PROJECTIONS', {})}
+
+
+def with_latest_comments(queryset, limit=None):
+    """Prefetch only the newest `limit` comments of every user into `latest_comments`.
+
+    A sliced Prefetch is one query per page (ROW_NUMBER() over user2) on the
+    (user2, -created_at, -id) index, however long the history is.
+    """
+    if limit is None:
+        limit = user_projection_settings()['LATEST_COMMENTS']
+    latest = Comment.objects.order_by('-created_at', '-id')[:limit]
+    return queryset.prefetch_related(Prefetch('comments', queryset=latest, to_attr='latest_comments'))
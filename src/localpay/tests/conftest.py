@@ -1,6 +1,18 @@
+import asyncio
+import json
 import pytest
+import httpx
+from django.core.cache import cache
+from urllib.parse import parse_qsl
 from rest_framework.test import APIClient
 from localpay.models import User_mon
+from localpay.services.osmp_gateway import OsmpGatewayClient
+from localpay.services.account_check_cache import account_checks
+from localpay.services.auth_user_cache import auth_users
+from localpay.services.planup import PlanupClient
+from localpay.services.kkm import KkmClient, TICKET_PATHS
+from localpay.services import comparison_report, planup_mirror
+from localpay.serializers.payment_serializers import payment_serializer
 from django.contrib.auth import get_user_model
 import factory
 
@@ -22,6 +34,16 @@ class UserFactory(factory.django.DjangoModelFactory):
     role = 'user'
 
 
+# Кэш Django и кэш пользователей JWT живут в процессе между тестами, а id в пустой БД повторяются
+@pytest.fixture(autouse=True)
+def clear_django_cache():
+    cache.clear()
+    auth_users.reset()
+    yield
+    cache.clear()
+    auth_users.reset()
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
@@ -38,4 +60,79 @@ def admin_user(db):
 @pytest.fixture
 def authenticated_client(api_client, admin_user):
     api_client.force_authenticate(user=admin_user)
-    return api_client
\ No newline at end of file
+    return api_client
+
+
+CHECK_REPLY = '<?xml version="1.0" encoding="UTF-8"?><response><result>0</result><fio>Иванов Иван</fio></response>'
+PAY_REPLY = ('<?xml version="1.0" encoding="UTF-8"?><response><osmp_txn_id>{txn_id}</osmp_txn_id>'
+             '<sum>{sum}</sum><result>0</result><comment>OK</comment></response>')
+
+
+# Фабрика клиентов без сети: клиент `client_class` отвечает через `handler`, подменяет `attr`
+# в модулях `modules` и закрывается после теста
+@pytest.fixture
+def fake_client(request, monkeypatch):
+    def make(client_class, handler, attr=None, modules=()):
+        client = client_class(transport=httpx.MockTransport(handler))
+        request.addfinalizer(client.close)
+        for module in modules:
+            monkeypatch.setattr(module, attr, client)
+        return client
+    return make
+
+
+# Шлюз OSMP без сети: отвечает успехом на check и pay
+@pytest.fixture
+def fake_gateway(fake_client):
+    requests_seen = []
+
+    def handler(request):
+        requests_seen.append(request)
+        params = request.url.params
+        if params['command'] == 'pay':
+            body = PAY_REPLY.format(txn_id=len(requests_seen), sum=params['sum'])
+        else:
+            body = CHECK_REPLY
+        return httpx.Response(200, content=body.encode('utf-8'))
+
+    client = fake_client(OsmpGatewayClient, handler, 'gateway', [payment_serializer])
+    account_checks.reset()
+    yield client, requests_seen
+    account_checks.reset()
+
+
+# Planup без сети: наряды берутся из словаря {planup_id: [наряд, ...]},
+# для planup_id из failing отвечает 500
+@pytest.fixture
+def fake_planup(fake_client):
+    orders, failing, requests_seen = {}, set(), []
+
+    def handler(request):
+        params = dict(parse_qsl(request.content.decode()))
+        planup_id = int(params['planup_id'])
+        requests_seen.append(params)
+        if planup_id in failing:
+            return httpx.Response(500)
+        return httpx.Response(200, json=orders.get(planup_id, []))
+
+    client = fake_client(PlanupClient, handler, 'planup', [comparison_report, planup_mirror])
+    return client, orders, failing, requests_seen
+
+
+# Касса без сети: записывает (шаг, тело) запросов чеков с небольшой задержкой;
+# статусы из failures отдаются по одному на запрос, затем 200
+@pytest.fixture
+def fake_kkm(fake_client):
+    requests_seen, failures = [], []
+    steps = {path: step for step, path in TICKET_PATHS.items()}
+
+    async def handler(request):
+        requests_seen.append((steps.get(request.url.path, request.url.path), json.loads(request.content or b'null')))
+        await asyncio.sleep(0.005)
+        failure = failures.pop(0) if failures else 200
+        # исключение - касса получила запрос, но ответ потерян (таймаут)
+        if isinstance(failure, Exception):
+            raise failure
+        return httpx.Response(failure, json={'ok': True})
+
+    return fake_client(KkmClient, handler), requests_seen, failures
@@ -0,0 +1,158 @@
+import asyncio
+from datetime import timedelta
+import httpx
+import pytest
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError
+from django.utils import timezone
+from localpay.models import FiscalReceipt
+from localpay.services import fiscal_receipts
+from localpay.services.fiscal_receipts import enqueue_receipt, run_receipt_worker, send_receipt
+from localpay.services.payments import PENDING_STATUS, create_payment, settle_payment
+from localpay.tests.conftest import UserFactory
+
+
+def receipt(name, items=1):
+    return enqueue_receipt({'ticket': name}, [{'ticket': name, 'item': i} for i in range(items)], {'ticket': name})
+
+
+def drain(client, started=None):
+    """Run the worker until nothing is queued or running; `started` is called once the worker runs."""
+    async def run():
+        stop = asyncio.Event()
+        worker = asyncio.create_task(run_receipt_worker(stop, client))
+        if started is not None:
+            await asyncio.sleep(0.05)
+            await sync_to_async(started)()
+        while await sync_to_async(FiscalReceipt.objects.filter(status__in=[FiscalReceipt.QUEUED, FiscalReceipt.RUNNING]).exists)():
+            await asyncio.sleep(0.01)
+        stop.set()
+        await worker
+    asyncio.run(run())
+
+
+@pytest.fixture
+def receipts_settings(settings):
+    settings.FISCAL_RECEIPTS = {'CONCURRENCY': 2, 'POLL_INTERVAL': 0.01, 'BACKOFF': 60}
+    return settings
+
+
+# Проведение платежа ставит чек в очередь той же транзакцией и один раз; по умолчанию выключено
+def test_settled_payment_enqueues_receipt(db, settings):
+    installer = UserFactory(balance=1000)
+    payment = create_payment(user=installer, ls_abon='175000001', status_payment=PENDING_STATUS, amount_minor=5000)
+
+    settle_payment(payment, 'txn-1', '50.00', '2024-11-10 12:00:01')
+    assert not FiscalReceipt.objects.exists()
+
+    settings.FISCAL_RECEIPTS = {'FOR_PAYMENTS': True}
+    second = create_payment(user=installer, ls_abon='175000002', status_payment=PENDING_STATUS, amount_minor=1050)
+    settle_payment(second, 'txn-2', '10.50', '2024-11-10 12:00:02')
+    settle_payment(second, 'txn-2', '10.50', '2024-11-10 12:00:02')
+
+    queued = FiscalReceipt.objects.get()
+    assert queued.payment == second and queued.status == FiscalReceipt.QUEUED
+    assert queued.payload['commodities'][0]['sum'] == '10.5'
+
+
+# Шаги одного чека идут строго по порядку, разные чеки идут на кассу одновременно (до CONCURRENCY)
+def test_worker_pipelines_receipts_in_order(transactional_db, receipts_settings, fake_kkm):
+    client, requests_seen, _ = fake_kkm
+    receipts = [receipt('a', items=2), receipt('b'), receipt('c')]
+
+    drain(client)
+
+    assert set(FiscalReceipt.objects.values_list('status', flat=True)) == {FiscalReceipt.DONE}
+    for r in receipts:
+        name = r.payload['open']['ticket']
+        steps = [step for step, body in requests_seen if body['ticket'] == name]
+        assert steps == ['open'] + ['add'] * len(r.payload['commodities']) + ['close']
+    order = [(step, body['ticket']) for step, body in requests_seen]
+    assert order.index(('open', 'b')) < order.index(('close', 'a'))
+    assert FiscalReceipt.objects.get(pk=receipts[0].pk).result == {'ok': True}
+
+
+# Ошибка кассы: повтор с паузой продолжает со следующего шага; отказ в данных (4xx) - сразу ошибка
+def test_retry_resumes_and_rejection_fails(transactional_db, receipts_settings, fake_kkm):
+    client, requests_seen, failures = fake_kkm
+    retried, rejected = receipt('retried'), receipt('rejected')
+
+    failures.extend([200, 503])
+    assert asyncio.run(send_receipt(retried, client)) is False
+    retried.refresh_from_db()
+    assert (retried.status, retried.steps_done, retried.attempts) == (FiscalReceipt.QUEUED, 1, 1)
+    assert retried.next_attempt_at > timezone.now() + timedelta(seconds=50)
+
+    retried.next_attempt_at = timezone.now()
+    retried.save()
+    requests_seen.clear()
+    failures.append(400)
+    assert asyncio.run(send_receipt(rejected, client)) is False
+    drain(client)
+
+    assert [step for step, body in requests_seen if body['ticket'] == 'retried'] == ['add', 'close']
+    retried.refresh_from_db()
+    rejected.refresh_from_db()
+    assert retried.status == FiscalReceipt.DONE
+    assert (rejected.status, rejected.attempts) == (FiscalReceipt.FAILED, 1)
+
+
+# Итог шага неизвестен (таймаут после приема кассой): шаг не повторяется, чек аннулируется и пробивается заново
+def test_unknown_outcome_cancels_and_restarts(transactional_db, receipts_settings, fake_kkm):
+    client, requests_seen, failures = fake_kkm
+    lost = receipt('lost', items=2)
+
+    failures.extend([200, httpx.ReadTimeout('timed out')])
+    assert asyncio.run(send_receipt(lost, client)) is False
+    lost.refresh_from_db()
+    assert (lost.status, lost.steps_done, lost.in_doubt) == (FiscalReceipt.QUEUED, 1, True)
+
+    lost.next_attempt_at = timezone.now()
+    lost.save()
+    drain(client)
+
+    assert [step for step, _ in requests_seen] == ['open', 'add', 'cancel', 'open', 'add', 'add', 'close']
+    lost.refresh_from_db()
+    assert (lost.status, lost.in_doubt) == (FiscalReceipt.DONE, False)
+
+
+# Неизвестен итог закрытия и открытого чека нет: чек, возможно, пробит - не повторяем, ошибка для ручной проверки
+def test_unknown_close_is_left_for_manual_check(transactional_db, receipts_settings, fake_kkm):
+    client, requests_seen, failures = fake_kkm
+    closing = receipt('closing')
+    FiscalReceipt.objects.filter(pk=closing.pk).update(steps_done=2, in_doubt=True)
+    closing.refresh_from_db()
+
+    failures.append(404)
+    assert asyncio.run(send_receipt(closing, client)) is False
+
+    assert [step for step, _ in requests_seen] == ['cancel']
+    closing.refresh_from_db()
+    assert (closing.status, closing.attempts) == (FiscalReceipt.FAILED, 1)
+    assert 'проверьте вручную' in closing.error
+
+
+# Воркер переживает сбой опроса и подбирает чек, брошенный другим воркером уже после своего старта
+def test_worker_requeues_on_poll_and_survives_errors(transactional_db, receipts_settings, fake_kkm, monkeypatch):
+    receipts_settings.FISCAL_RECEIPTS = {**receipts_settings.FISCAL_RECEIPTS, 'REQUEUE_INTERVAL': 0.05}
+    client, requests_seen, _ = fake_kkm
+    claim_receipts, polls = fiscal_receipts.claim_receipts, []
+
+    def flaky_claim(limit):
+        polls.append(limit)
+        if len(polls) == 1:
+            raise DatabaseError('connection lost')
+        return claim_receipts(limit)
+
+    def abandon():
+        # сразу running: обычный чек из очереди этот воркер взял бы сам
+        FiscalReceipt.objects.create(
+            payload={'open': {'ticket': 'abandoned'}, 'commodities': [], 'close': {'ticket': 'abandoned'}},
+            status=FiscalReceipt.RUNNING, steps_done=1, started_at=timezone.now() - timedelta(hours=1),
+        )
+
+    monkeypatch.setattr(fiscal_receipts, 'claim_receipts', flaky_claim)
+    drain(client, started=abandon)
+
+    assert [step for step, _ in requests_seen] == ['close']
+    assert FiscalReceipt.objects.get().status == FiscalReceipt.DONE
@@ -0,0 +1,117 @@
+import asyncio
+import importlib
+import threading
+from datetime import datetime
+import pytest
+from localpay.services.kkm_scheduler import DailyJob, IntervalJob, Scheduler, run_kkm_worker
+from localpay.views.kkm import cash_register_views
+
+
+class SharedLock:
+    """Замок в памяти вместо pg_advisory_lock: держать его может один воркер."""
+
+    def __init__(self):
+        self.holder = None
+        self.down = set()
+
+    def worker(self, name):
+        shared = self
+
+        class WorkerLock:
+            def acquire(self):
+                if name in shared.down or shared.holder not in (None, name):
+                    return False
+                shared.holder = name
+                return True
+
+            def held(self):
+                return name not in shared.down and shared.holder == name
+
+            def release(self):
+                if shared.holder == name:
+                    shared.holder = None
+
+        return WorkerLock()
+
+    def lose_connection(self, name):
+        # как у PostgreSQL: сессия пропала - замок свободен
+        self.down.add(name)
+        self.holder = None
+
+
+def counting_jobs(fired, name, every=0.01):
+    async def tick():
+        fired[name] += 1
+    return [IntervalJob('tick', every, tick)]
+
+
+@pytest.fixture
+def fast_poll(settings):
+    settings.KKM_SCHEDULER = {'LEADER_POLL': 0.02}
+
+
+# Импорт модуля ККМ больше не запускает поток планировщика
+def test_import_starts_no_thread():
+    before = threading.active_count()
+    importlib.reload(cash_register_views)
+    assert threading.active_count() == before
+
+
+# Ежедневное задание - сегодня, если время еще не прошло, иначе завтра
+def test_daily_next_run():
+    job = DailyJob('close_shift', '23:59', None)
+
+    assert job.next_run(datetime(2024, 11, 10, 10, 0)) == datetime(2024, 11, 10, 23, 59)
+    assert job.next_run(datetime(2024, 11, 10, 23, 59, 30)) == datetime(2024, 11, 11, 23, 59)
+
+
+# Упавшее задание не мешает следующим запускам; остановка дожидается начатых заданий
+def test_scheduler_survives_failing_job():
+    fired = {'ok': 0, 'failed': 0, 'finished': 0}
+
+    async def failing():
+        fired['failed'] += 1
+        raise RuntimeError('KKM is down')
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        fired['finished'] += 1
+
+    async def run():
+        stop = asyncio.Event()
+        jobs = counting_jobs(fired, 'ok') + [IntervalJob('failing', 0.01, failing), IntervalJob('slow', 0.08, slow)]
+        scheduler = asyncio.create_task(Scheduler(jobs, now=datetime.now).run(stop))
+        await asyncio.sleep(0.1)
+        stop.set()
+        await scheduler
+
+    asyncio.run(run())
+
+    assert fired['ok'] >= 3 and fired['failed'] >= 3
+    assert fired['finished'] == 1
+
+
+# Задания запускает только ведущий; после его падения их подхватывает резервный воркер
+def test_single_leader_and_failover(fast_poll):
+    lock = SharedLock()
+    fired = {'a': 0, 'b': 0}
+
+    async def run():
+        stop = asyncio.Event()
+        workers = [asyncio.create_task(run_kkm_worker(stop, counting_jobs(fired, name), lock.worker(name))) for name in 'ab']
+        await asyncio.sleep(0.15)
+        before_failover = dict(fired)
+
+        lock.lose_connection('a')
+        await asyncio.sleep(0.1)
+        a_stopped_at = fired['a']
+        await asyncio.sleep(0.1)
+        stop.set()
+        await asyncio.gather(*workers)
+        return before_failover, a_stopped_at
+
+    before_failover, a_stopped_at = asyncio.run(run())
+
+    assert before_failover['a'] > 0 and before_failover['b'] == 0
+    assert fired['b'] > 0
+    assert fired['a'] == a_stopped_at
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import time
+import httpx
+import pytest
+from localpay.services import kkm
+from localpay.services.telegram import TelegramNotifier
+
+
+@pytest.fixture
+def telegram(settings, fake_client):
+    """Notifier with a fake Bot API: (notifier, [(время, текст)], очередь ответов)."""
+    settings.TELEGRAM = {'BOT_TOKEN': 'token', 'CHAT_ID': '42', 'MIN_INTERVAL': 0.2, 'COALESCE_WINDOW': 0.6}
+    sent, responses = [], []
+
+    def handler(request):
+        assert request.url.path == '/bottoken/sendMessage'
+        body = json.loads(request.content)
+        sent.append((time.monotonic(), body['text']))
+        status, data = responses.pop(0) if responses else (200, {'ok': True})
+        return httpx.Response(status, json=data)
+
+    return fake_client(TelegramNotifier, handler), sent, responses
+
+
+def wait_for(sent, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while len(sent) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return [text for _, text in sent]
+
+
+# Повторы за окно приходят одним сообщением со счетчиком; сообщения идут не чаще MIN_INTERVAL
+def test_repeats_are_coalesced_and_paced(telegram):
+    notifier, sent, _ = telegram
+    notifier.notify('Касса недоступна')
+    wait_for(sent, 1)
+    for _ in range(4):
+        notifier.notify('Касса недоступна')
+    notifier.notify('Смена открыта')
+
+    assert wait_for(sent, 3) == ['Касса недоступна', 'Смена открыта', 'Касса недоступна\n(таких уведомлений: 4)']
+    times = [at for at, _ in sent]
+    assert all(later - earlier >= 0.19 for earlier, later in zip(times, times[1:]))
+    time.sleep(0.8)
+    assert len(sent) == 3
+
+
+# Уведомления с общим ключом сводятся вместе с последним текстом; 429 - ждем retry_after и повторяем
+def test_keyed_alerts_and_rate_limit_response(telegram):
+    notifier, sent, responses = telegram
+    responses.append((429, {'ok': False, 'parameters': {'retry_after': 0.3}}))
+    notifier.notify('Платеж 1 не подтвержден', key='unconfirmed')
+    wait_for(sent, 1)
+    notifier.notify('Платеж 2 не подтвержден', key='unconfirmed')
+    notifier.notify('Платеж 3 не подтвержден', key='unconfirmed')
+
+    texts = wait_for(sent, 2)
+    assert texts == ['Платеж 1 не подтвержден'] * 2
+    assert sent[1][0] - sent[0][0] >= 0.29
+    assert wait_for(sent, 3)[2] == 'Платеж 3 не подтвержден\n(таких уведомлений: 2)'
+
+
+# Без токена уведомления отбрасываются, фоновый поток не запускается
+def test_not_configured_does_nothing(settings, fake_client):
+    settings.TELEGRAM = {'BOT_TOKEN': '', 'CHAT_ID': ''}
+    notifier = fake_client(TelegramNotifier, lambda request: pytest.fail('unexpected request'))
+    notifier.notify('Смена открыта')
+    assert notifier._loop is None
+
+
+# Проверка ККМ пишет в чат только о сбое и о восстановлении, а не каждый час
+def test_keep_awake_reports_only_changes(monkeypatch):
+    alerts, healthy = [], []
+
+    async def state():
+        if not healthy.pop(0):
+            raise httpx.ConnectError('down')
+
+    monkeypatch.setattr(kkm, '_state', state)
+    monkeypatch.setattr(kkm, '_kkm_healthy', None)
+    monkeypatch.setattr(kkm, 'notify', lambda text, key=None: alerts.append(key or text))
+
+    healthy.extend([True, True, False, False, True, True])
+    for _ in range(6):
+        asyncio.run(kkm.keep_awake())
+
+    assert alerts == ['kkm:state', 'kkm:state', 'Проверка ККМ: касса снова работает']
@@ -0,0 +1,107 @@
+import asyncio
+import pytest
+from django.test import override_settings
+from rest_framework import status
+from localpay.serializers.payment_serializers.payment_serializer import check_ls
+from localpay.services.account_check_cache import AccountCheckCache
+
+
+# Повторная проверка того же ls берется из кэша
+def test_check_ls_cached(fake_gateway):
+    client, requests_seen = fake_gateway
+
+    first = client.run_sync(check_ls(175050620))
+    second = client.run_sync(check_ls(175050620))
+
+    assert first == second == {'fio': 'Иванов Иван', 'status': '0'}
+    assert len(requests_seen) == 1
+
+
+# Одновременные проверки одного ls делят один запрос к шлюзу
+def test_single_flight():
+    cache = AccountCheckCache()
+    calls = []
+
+    async def loader(ls):
+        calls.append(ls)
+        await asyncio.sleep(0.05)
+        return {'fio': 'Иванов Иван', 'status': '0'}
+
+    async def run():
+        return await asyncio.gather(*(cache.fetch(42, loader) for _ in range(10)))
+
+    results = asyncio.run(run())
+
+    assert calls == [42]
+    assert all(result == results[0] for result in results)
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['coalesced'] == 9
+
+
+# Отмена одного из ожидающих или владельца запроса не ломает проверку остальным
+def test_single_flight_survives_cancellation():
+    cache = AccountCheckCache()
+    calls = []
+
+    async def loader(ls):
+        calls.append(ls)
+        await asyncio.sleep(0.05)
+        return {'fio': 'Иванов Иван', 'status': '0'}
+
+    async def run():
+        owner = asyncio.create_task(cache.fetch(42, loader))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.fetch(42, loader)) for _ in range(3)]
+        await asyncio.sleep(0)
+        waiters[0].cancel()
+        owner_result = await owner
+
+        second_owner = asyncio.create_task(cache.fetch(7, loader))
+        await asyncio.sleep(0)
+        second_waiters = [asyncio.create_task(cache.fetch(7, loader)) for _ in range(2)]
+        await asyncio.sleep(0)
+        second_owner.cancel()
+        return owner_result, await asyncio.gather(*waiters, *second_waiters, return_exceptions=True)
+
+    owner_result, results = asyncio.run(run())
+
+    assert owner_result == {'fio': 'Иванов Иван', 'status': '0'}
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert all(result == owner_result for result in results[1:])
+    # по 42 - один запрос; по 7 - отмененный запрос владельца и один повтор ожидающих
+    assert calls == [42, 7, 7]
+
+
+# Неверный счет кэшируется на NEGATIVE_TTL, ошибки шлюза не кэшируются
+def test_negative_and_error_caching():
+    cache = AccountCheckCache()
+
+    async def invalid(ls):
+        return {'fio': 'Не указано', 'status': '5'}
+
+    async def error(ls):
+        return {'error': 'Ошибка при обращении к серверу'}
+
+    with override_settings(ACCOUNT_CHECK_CACHE={'NEGATIVE_TTL': 0}):
+        asyncio.run(cache.fetch(1, invalid))
+    assert cache.get_fresh(1) is None
+
+    asyncio.run(cache.fetch(2, invalid))
+    assert cache.get_fresh(2) == {'fio': 'Не указано', 'status': '5'}
+    assert not cache.has_valid(2)
+
+    asyncio.run(cache.fetch(3, error))
+    assert cache.get_fresh(3) is None
+
+
+# Счетчики кэша доступны админу
+@pytest.mark.django_db
+def test_cache_stats_view(fake_gateway, authenticated_client):
+    authenticated_client.post('/api/check-account/', {'ls': 175050620})
+    authenticated_client.post('/api/check-account/', {'ls': 175050620})
+
+    response = authenticated_client.get('/api/check-account/stats/')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['hits'] == 1
+    assert response.data['misses'] == 1
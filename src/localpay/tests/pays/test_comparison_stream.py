@@ -0,0 +1,84 @@
+import json
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+from localpay.management.commands.bench_reconciliation import synthetic
+from localpay.models import Pays
+from localpay.services.reconciliation import reconcile, reconcile_stream
+from localpay.tests.conftest import UserFactory
+
+
+def compare_stream(user, data):
+    async def run():
+        response = await AsyncClient().post(
+            reverse('payment-compare-stream'), data, content_type='application/json',
+            headers={'Authorization': f'Bearer {AccessToken.for_user(user)}'},
+        )
+        body = b''.join([chunk async for chunk in response.streaming_content]) if response.streaming else response.content
+        return response, body
+    return async_to_sync(run)()
+
+
+# Поток дает те же строки, что и обычная сверка, итоги - последней строкой
+def test_stream_matches_reconcile():
+    localpay, planup_payments = synthetic(installers=4, per_installer=50)
+    names = {user_id: (f'Имя{user_id}', 'Фамилия') for user_id in range(1, 5)}
+
+    report = reconcile(localpay, planup_payments, load_names=lambda ids: {i: names[i] for i in ids})
+
+    def collect():
+        totals = yield from reconcile_stream(iter(localpay), iter(planup_payments), names)
+        yield totals
+
+    assert list(collect()) == report
+
+
+# Монтажник отдается сразу после своей сверки, следующие еще не прочитаны
+def test_stream_holds_one_installer():
+    localpay, planup_payments = synthetic(installers=3, per_installer=20)
+    consumed = []
+
+    def tracked(rows):
+        for row in rows:
+            consumed.append(row['user_id'])
+            yield row
+
+    rows = reconcile_stream(tracked(localpay), tracked(planup_payments), {})
+    first = next(rows)
+
+    assert first['user_id'] == 1
+    # дальше первого монтажника прочитано не больше чем по строке с каждой стороны
+    assert sum(user_id != 1 for user_id in consumed) <= 2
+
+
+# Эндпоинт отдает NDJSON: строка на монтажника, затем итоги с отказами Planup
+def test_compare_stream_endpoint(admin_user, fake_planup):
+    _, orders, failing, _ = fake_planup
+    first, second, broken = UserFactory(planup_id=31), UserFactory(planup_id=32), UserFactory(planup_id=33)
+    Pays.objects.create(user=first, ls_abon='175000001', amount_minor=5000, status_payment='Выполнен', paid_at=timezone.now())
+    orders[31] = [{'id': 1, 'ls_abon': '175000001', 'money': '50.00'}]
+    orders[32] = [{'id': 2, 'ls_abon': '175000002', 'money': '20.00'}]
+    failing.add(33)
+    today = timezone.localdate().isoformat()
+
+    response, body = compare_stream(admin_user, {'date_from': today, 'date_to': today})
+
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('application/x-ndjson')
+    records = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+    assert [r['user_id'] for r in records] == [first.id, second.id, 'Итого']
+    assert records[0]['payments'][0]['planup_id'] == 1
+    assert records[1]['name'] == second.name
+    assert records[-1]['planup_total'] == '70.00'
+    assert records[-1]['failures'] == [{'user_id': broken.id, 'planup_id': 33, 'error': 'status 500'}]
+
+
+# Без дат поток не начинается, монтажнику сверка недоступна
+def test_compare_stream_validation(admin_user):
+    response, _ = compare_stream(admin_user, {'date_from': '2024-11-01'})
+    assert response.status_code == 400
+
+    response, _ = compare_stream(UserFactory(), {'date_from': '2024-11-01', 'date_to': '2024-11-02'})
+    assert response.status_code == 403
@@ -1,7 +1,8 @@
 import pytest
 from rest_framework import status
-from localpay.models import User_mon
+from localpay.models import User_mon, Pays
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
 
 @pytest.fixture
@@ -39,7 +40,7 @@ def create_user():
 
 # Проверка успешного создания Платежа
 @pytest.mark.django_db
-def test_create_payment_success(authenticated_user_client):
+def test_create_payment_success(authenticated_user_client, fake_gateway):
     user = User_mon.objects.filter(login="user").first()
     if user:
         user.balance = 1000.0 
@@ -94,3 +95,57 @@ def test_create_payment_insufficient_balance(authenticated_client, create_user):
     assert response.status_code == status.HTTP_403_FORBIDDEN
     assert response.data["detail"] == "You do not have permission to perform this action."
 
+
+
+# Платеж через async view с настоящим JWT токеном
+@pytest.mark.django_db
+def test_create_payment_async_jwt(fake_gateway, create_user):
+    user = create_user(
+        login="installer",
+        password="password123",
+        name="Test",
+        surname="User",
+        avail_balance=0,
+        region="Чуйская",
+        balance=1000,
+        role="user",
+    )
+    User_mon.objects.filter(pk=user.pk).update(access=True, is_active=True)
+    token = AccessToken.for_user(user)
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    payment_data = {
+        "ls": 175050620,
+        "login": "installer",
+        "money": 50.0,
+        "service_type": "test_service",
+    }
+
+    response = client.post("/api/create-payment/", payment_data)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["status"] == "0"
+    assert Pays.objects.filter(user=user, ls_abon="175050620").count() == 1
+    user.refresh_from_db()
+    assert user.balance == 950
+
+
+# Без токена платеж не проходит
+@pytest.mark.django_db
+def test_create_payment_requires_authentication(api_client):
+    response = api_client.post("/api/create-payment/", {"ls": 1})
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert "WWW-Authenticate" in response
+
+
+# Асинхронный эндпоинт платежа остается в схеме Swagger
+@pytest.mark.django_db
+def test_create_payment_in_swagger_schema(authenticated_user_client):
+    response = authenticated_user_client.get('/swagger.json')
+
+    assert response.status_code == status.HTTP_200_OK
+    operation = response.json()['paths']['/api/create-payment/']['post']
+    body, = [param for param in operation['parameters'] if param['in'] == 'body']
+    assert body['schema']['$ref'] == '#/definitions/Payment'
@@ -0,0 +1,93 @@
+from datetime import timedelta
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from localpay.models import Comment
+from localpay.services.payments import create_payment
+from localpay.tests.conftest import UserFactory
+
+
+@pytest.fixture
+def installer(db):
+    return UserFactory()
+
+
+@pytest.fixture
+def payments(installer):
+    now = timezone.now()
+    # по три платежа на одну и ту же секунду: курсор должен различать их по id
+    return [
+        create_payment(user=installer, ls_abon=str(175000000 + i), amount_minor=1000, status_payment='Выполнен',
+                       paid_at=now - timedelta(seconds=i // 3))
+        for i in range(30)
+    ]
+
+
+def walk(client, url, params, django_assert_num_queries, key='id', queries=1):
+    ids, cursor, pages = [], '', 0
+    while cursor is not None:
+        with django_assert_num_queries(queries):
+            response = client.get(url, {**params, 'cursor': cursor})
+        assert response.status_code == status.HTTP_200_OK
+        assert 'count' not in response.data
+        ids += [row[key] for row in response.data['results']]
+        cursor = response.data['next_cursor']
+        pages += 1
+    return ids, pages
+
+
+# Курсор проходит всю историю без пропусков и повторов, одним запросом на страницу
+def test_history_cursor_walk(authenticated_client, payments, django_assert_num_queries):
+    url = reverse('payment-history')
+    ids, pages = walk(authenticated_client, url, {'limit': 7}, django_assert_num_queries)
+
+    offset_ids = [row['id'] for row in authenticated_client.get(url, {'limit': 100}).data['results']]
+    assert ids == offset_ids
+    assert len(ids) == 30 and pages == 5
+
+
+# Старые клиенты с limit/offset получают прежний ответ
+def test_history_limit_offset_unchanged(authenticated_client, payments):
+    response = authenticated_client.get(reverse('payment-history'), {'limit': 10, 'offset': 20})
+
+    assert set(response.data) == {'count', 'limit', 'offset', 'results'}
+    assert response.data['count'] == 30
+    assert len(response.data['results']) == 10
+
+
+# Ссылка next содержит курсор и не содержит offset
+def test_history_next_link(authenticated_client, payments):
+    response = authenticated_client.get(reverse('payment-history'), {'limit': 10, 'offset': 5, 'cursor': ''})
+
+    assert 'cursor=' in response.data['next']
+    assert 'offset=' not in response.data['next']
+
+
+# Испорченный курсор - 404, как у CursorPagination в DRF
+def test_invalid_cursor(authenticated_client, payments):
+    response = authenticated_client.get(reverse('payment-history'), {'cursor': 'not-a-cursor'})
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# Операции баланса: курсор по (created_at, id)
+def test_comments_cursor_walk(authenticated_client, installer, django_assert_num_queries):
+    Comment.objects.bulk_create(Comment(user2=installer, text=str(i), type_pay='Пополнение') for i in range(12))
+    url = reverse('comments-list')
+
+    texts, pages = walk(authenticated_client, url, {'limit': 5}, django_assert_num_queries, key='text')
+
+    assert texts == list(Comment.objects.order_by('-created_at', '-id').values_list('text', flat=True))
+    assert pages == 3
+
+
+# Мобильная история: без курсора limit/offset по месяцу, с курсором - страницами
+def test_mobile_cursor(api_client, installer, payments, django_assert_num_queries):
+    api_client.force_authenticate(user=installer)
+    url = reverse('mobile-user-payments')
+
+    assert api_client.get(url).data['count'] == 30
+    # плюс чтение payments_version для ключа кэша
+    ids, pages = walk(api_client, url, {'limit': 10}, django_assert_num_queries, queries=2)
+    assert len(set(ids)) == 30 and pages == 3
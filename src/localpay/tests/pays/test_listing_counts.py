@@ -0,0 +1,93 @@
+from datetime import timedelta
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from localpay.models import Pays
+from localpay.services.listing_counts import listing_count
+from localpay.tests.conftest import UserFactory
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def payments(db):
+    user = UserFactory()
+    now = timezone.now()
+    return Pays.objects.bulk_create(
+        Pays(user=user, ls_abon=str(175000000 + i), amount_minor=1000, status_payment='Выполнен',
+             paid_at=now - timedelta(days=i))
+        for i in range(20)
+    )
+
+
+def history(client, **params):
+    response = client.get(reverse('payment-history'), {'limit': 5, **params})
+    assert response.status_code == status.HTTP_200_OK
+    return response.data
+
+
+# ?count=none - только выборка страницы, без COUNT(*)
+def test_history_count_none(authenticated_client, payments, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        data = history(authenticated_client, count='none', offset=5)
+
+    assert data['count'] is None
+    assert len(data['results']) == 5
+
+
+# ?count=estimate для отфильтрованного списка: подсчет кэшируется
+def test_history_count_estimate_cached(authenticated_client, payments, django_assert_num_queries):
+    date_from = (timezone.localdate() - timedelta(days=9)).isoformat()
+
+    with django_assert_num_queries(2):
+        assert history(authenticated_client, count='estimate', date_from=date_from)['count'] == 10
+    with django_assert_num_queries(1):
+        assert history(authenticated_client, count='estimate', date_from=date_from, offset=5)['count'] == 10
+
+
+# Неизвестный режим - 400
+def test_invalid_count_mode(authenticated_client, payments):
+    response = authenticated_client.get(reverse('payment-history'), {'count': 'fast'})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+# Оценка по pg_class.reltuples для всей таблицы (только PostgreSQL)
+@pytest.mark.skipif(connection.vendor != 'postgresql', reason='planner estimates')
+def test_unfiltered_estimate_uses_reltuples(payments, django_assert_num_queries):
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE localpay_pays')
+
+    with django_assert_num_queries(1) as captured:
+        assert listing_count(Pays.objects.all(), 'estimate') == 20
+    assert 'reltuples' in captured.captured_queries[0]['sql']
+
+
+# Список пользователей: один COUNT (раньше - два), при count=none ни одного
+def test_user_list_counts_once(authenticated_client, payments):
+    url = reverse('user-list-create')
+
+    with CaptureQueriesContext(connection) as captured:
+        response = authenticated_client.get(url, {'page_size': 1})
+    assert count_queries(captured) == 1
+    assert response.data['count'] == 2
+    assert response.data['total_pages'] == 2
+
+    with CaptureQueriesContext(connection) as captured:
+        response = authenticated_client.get(url, {'page_size': 1, 'page': 2, 'count': 'none'})
+    assert count_queries(captured) == 0
+    assert response.data['count'] is None
+    assert len(response.data['results']) == 1
+
+
+def count_queries(captured):
+    return sum('COUNT(' in query['sql'] for query in captured.captured_queries)
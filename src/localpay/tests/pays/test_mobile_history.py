@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from django.db.models import F
+from localpay.models import Pays, User_mon
+from localpay.services.payments import DONE_STATUS, annul_payment, create_payment
+from localpay.tests.conftest import UserFactory
+
+
+@pytest.fixture
+def installer(db):
+    return UserFactory()
+
+
+def pay(user, ls_abon, paid_at):
+    return create_payment(user=user, ls_abon=ls_abon, amount_minor=1000, status_payment=DONE_STATUS, paid_at=paid_at)
+
+
+def history(api_client, user, **params):
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+    with CaptureQueriesContext(connection) as captured:
+        response = api_client.get(reverse('mobile-user-payments'), params)
+    assert response.status_code == status.HTTP_200_OK
+    pays_queries = [q['sql'] for q in captured.captured_queries if 'localpay_pays' in q['sql']]
+    return response.data, pays_queries
+
+
+def in_month(day, hour=12):
+    return timezone.make_aware(datetime(2024, 11, day, hour))
+
+
+# История за выбранный месяц страницами; количество - из сводки, без COUNT(*) по платежам
+def test_month_history_paginated(api_client, installer):
+    for day in range(1, 13):
+        pay(installer, str(day), in_month(day))
+    pay(installer, 'october', in_month(1) - timedelta(hours=13))
+    pay(UserFactory(), 'other', in_month(5))
+
+    data, pays_queries = history(api_client, installer, month='2024-11', limit=5, offset=5)
+
+    assert data['count'] == 12
+    assert [row['ls_abon'] for row in data['results']] == ['7', '6', '5', '4', '3']
+    assert len(pays_queries) == 1 and 'COUNT(' not in pays_queries[0]
+
+
+# Повторный запрос отдается из кэша, новый платеж и аннулирование его сбрасывают
+def test_history_cache_invalidated_on_payment_writes(api_client, installer):
+    first = pay(installer, '1', in_month(1))
+
+    data, _ = history(api_client, installer, month='2024-11')
+    assert data['count'] == 1
+    _, pays_queries = history(api_client, installer, month='2024-11')
+    assert pays_queries == []
+
+    pay(installer, '2', in_month(2))
+    data, pays_queries = history(api_client, installer, month='2024-11')
+    assert [row['ls_abon'] for row in data['results']] == ['2', '1']
+    assert pays_queries
+
+    annul_payment(Pays.objects.get(pk=first.pk))
+    data, _ = history(api_client, installer, month='2024-11')
+    assert [row['annulment'] for row in data['results']] == [False, True]
+
+
+# Пополнение из бухгалтерии (save() монтажника после платежа) тоже меняет версию истории
+def test_accounting_refill_invalidates_history(installer, authenticated_client):
+    mobile = APIClient()
+    history(mobile, installer)
+
+    response = authenticated_client.put(reverse('update_user', args=[installer.pk]), {
+        'refill': 100, 'write_off': 0, 'login': installer.login, 'password': 'testpass123', 'region': installer.region,
+    }, format='json')
+    assert response.status_code == status.HTTP_200_OK
+
+    installer.refresh_from_db()
+    data, _ = history(mobile, installer)
+    assert [row['status_payment'] for row in data['results']] == ['Пополнение с бухгалтерии']
+
+
+# Неверный месяц - 400
+def test_invalid_month(api_client, installer):
+    api_client.force_authenticate(user=installer)
+
+    response = api_client.get(reverse('mobile-user-payments'), {'month': '2024-13'})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+# Платеж через другой воркер (его кэш пользователей JWT здесь не сброшен) тоже сбрасывает историю
+def test_history_cache_ignores_stale_auth_user(api_client, installer):
+    pay(installer, '1', in_month(1))
+    history(api_client, installer, month='2024-11')
+
+    Pays.objects.create(user=installer, ls_abon='2', amount_minor=1000, status_payment=DONE_STATUS, paid_at=in_month(2))
+    User_mon.objects.filter(pk=installer.pk).update(payments_version=F('payments_version') + 1)
+
+    data, _ = history(api_client, installer, month='2024-11')
+    assert [row['ls_abon'] for row in data['results']] == ['2', '1']
@@ -0,0 +1,65 @@
+import asyncio
+import httpx
+import pytest
+from rest_framework import status
+from core.asgi import application
+from localpay.services.telegram import TelegramNotifier
+
+
+@pytest.fixture
+def telegram_client(fake_client):
+    return fake_client(TelegramNotifier, lambda request: httpx.Response(200, json={'ok': True}))
+
+
+# Один клиент на все запросы к шлюзу
+def test_gateway_reuses_single_client(fake_gateway):
+    client, requests_seen = fake_gateway
+
+    first = client.run_sync(client.check(175050620))
+    pooled_client = client._client
+    second = client.run_sync(client.check(175050621))
+
+    assert first.text == second.text
+    assert client._client is pooled_client
+    assert len(requests_seen) == 2
+    assert requests_seen[0].url.params['command'] == 'check'
+    assert requests_seen[0].url.params['account'] == '175050620'
+
+
+# После закрытия клиент и фоновый цикл освобождаются
+def test_gateway_close(fake_gateway):
+    client, _ = fake_gateway
+    client.run_sync(client.check(1))
+
+    client.close()
+
+    assert client._client is None
+    assert client._loop is None
+
+
+# При остановке ASGI-сервера (lifespan shutdown) закрываются все клиенты процесса, а не только шлюз
+def test_lifespan_shutdown_closes_all_clients(fake_gateway, telegram_client):
+    gateway, _ = fake_gateway
+    gateway.run_sync(gateway.check(1))
+    telegram_client.run_sync(asyncio.sleep(0))
+    messages, sent = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}], []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message['type'])
+
+    asyncio.run(application({'type': 'lifespan'}, receive, send))
+
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+    assert gateway._loop is None and telegram_client._loop is None
+
+
+# Проверка лицевого счета через эндпоинт
+@pytest.mark.django_db
+def test_check_account_view(fake_gateway, authenticated_client):
+    response = authenticated_client.post('/api/check-account/', {'ls': 175050620})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == {'fio': 'Иванов Иван', 'status': '0'}
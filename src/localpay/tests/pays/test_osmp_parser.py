@@ -0,0 +1,51 @@
+import pytest
+from localpay.services.osmp_parser import parse_osmp_response, OsmpResponse, OsmpResponseError
+
+
+PAY_REPLY = (
+    '<?xml version="1.0" encoding="UTF-8"?><response><osmp_txn_id>777</osmp_txn_id>'
+    '<sum>50.0</sum><result>0</result><comment>OK</comment></response>'
+)
+
+
+# Разбор ответа на платеж
+def test_parse_pay_reply():
+    reply = parse_osmp_response(PAY_REPLY.encode('utf-8'))
+
+    assert reply == OsmpResponse(result='0', osmp_txn_id='777', sum='50.0', comment='OK')
+    assert reply.ok
+
+
+# Ответ на проверку: отсутствующие теги -> None, пустые -> ''
+def test_parse_check_reply():
+    reply = parse_osmp_response(
+        '<?xml version="1.0" encoding="UTF-8"?><response><osmp_txn_id></osmp_txn_id>'
+        '<result>5</result><fio>Иванов Иван</fio></response>'
+    )
+
+    assert reply.result == '5'
+    assert reply.fio == 'Иванов Иван'
+    assert reply.osmp_txn_id == ''
+    assert reply.sum is None
+    assert not reply.ok
+
+
+# Некорректные ответы дают понятную ошибку
+@pytest.mark.parametrize('body', [
+    b'',
+    b'<html><body>502 Bad Gateway',
+    b'<response><sum>1</sum></response>',
+])
+def test_parse_malformed_reply(body):
+    with pytest.raises(OsmpResponseError):
+        parse_osmp_response(body)
+
+
+# Сущности не подставляются
+def test_parse_does_not_resolve_entities():
+    body = (
+        b'<?xml version="1.0"?><!DOCTYPE r [<!ENTITY x "expanded">]>'
+        b'<response><result>0</result><comment>&x;</comment></response>'
+    )
+
+    assert parse_osmp_response(body).comment != 'expanded'
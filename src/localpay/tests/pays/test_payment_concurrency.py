@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection, close_old_connections
+from django.utils import timezone
+from localpay.models import User_mon, Pays
+from localpay.serializers.payment_serializers import payment_serializer
+from localpay.serializers.payment_serializers.payment_serializer import PaymentSerializer, PaymentUpdateSerializer
+from localpay.services.account_check_cache import account_checks
+from localpay.services.osmp_gateway import OsmpGatewayClient
+from localpay.services.payments import DONE_STATUS, reserve_payment, settle_payment
+
+
+logger = logging.getLogger(__name__)
+
+PAYMENTS = 40
+AMOUNT = 50
+BALANCE = 1000  # хватает ровно на 20 платежей
+
+
+# Шлюз с задержкой, чтобы платежи одного монтажника шли внахлест
+@pytest.fixture
+def slow_gateway(fake_client):
+    async def handler(request):
+        await asyncio.sleep(0.01)
+        params = request.url.params
+        if params['command'] == 'pay':
+            body = (f'<response><osmp_txn_id>{params["txn_id"]}</osmp_txn_id><sum>{params["sum"]}</sum>'
+                    f'<result>0</result><comment>OK</comment></response>')
+        else:
+            body = '<response><result>0</result><fio>Иванов Иван</fio></response>'
+        return httpx.Response(200, content=body.encode('utf-8'))
+
+    client = fake_client(OsmpGatewayClient, handler, 'gateway', [payment_serializer])
+    account_checks.reset()
+    yield client
+    account_checks.reset()
+
+
+@pytest.fixture
+def installer(db):
+    return User_mon.objects.create_user(
+        name='Hot', login='hot-installer', password='password123',
+        balance=BALANCE, avail_balance=0, access=True, is_active=True, role='user',
+    )
+
+
+def make_payment(ls):
+    serializer = PaymentSerializer(data={'ls': ls, 'login': 'hot-installer', 'money': AMOUNT, 'service_type': 'stress'})
+    serializer.is_valid(raise_exception=True)
+    return serializer.process_payment()
+
+
+def report_throughput(label, started):
+    # видно с pytest --log-cli-level=INFO; сравнимые цифры по HTTP дает manage.py bench_create_payment
+    elapsed = time.perf_counter() - started
+    logger.info('%s payments of one installer, %s: %.2f s, %.1f payments/s', PAYMENTS, label, elapsed, PAYMENTS / elapsed)
+
+
+def annul(payment_id):
+    serializer = PaymentUpdateSerializer(Pays.objects.get(pk=payment_id), data={'annulment': True})
+    serializer.is_valid(raise_exception=True)
+    return serializer.save()
+
+
+def done_payments(installer, count):
+    return [
+        settle_payment(reserve_payment(installer.pk, 175060000 + i, AMOUNT, timezone.now()), str(i), AMOUNT, '')
+        for i in range(count)
+    ]
+
+
+def assert_balance_consistent(results, installer):
+    succeeded = [r for r in results if r.get('status') == '0']
+    installer.refresh_from_db()
+
+    assert len(succeeded) == BALANCE // AMOUNT
+    assert installer.balance == 0
+    assert installer.avail_balance == -BALANCE
+    assert Pays.objects.filter(user=installer, status_payment=DONE_STATUS).count() == len(succeeded)
+    assert Pays.objects.filter(user=installer).count() == len(succeeded)
+
+
+# Параллельные платежи одного монтажника в одном event loop (как под ASGI):
+# без потерянных обновлений и без ухода баланса в минус; работает и на SQLite
+@pytest.mark.django_db
+def test_concurrent_payments_same_installer(slow_gateway, installer):
+    async def run():
+        return await asyncio.gather(*(make_payment(175050000 + i) for i in range(PAYMENTS)))
+
+    started = time.perf_counter()
+    results = async_to_sync(run)()
+    report_throughput('one event loop', started)
+
+    assert_balance_consistent(results, installer)
+
+
+# То же из нескольких потоков с отдельными соединениями к БД (только PostgreSQL)
+@pytest.mark.skipif(connection.vendor != 'postgresql', reason='needs row-level concurrency of PostgreSQL')
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_payments_same_installer_threads(slow_gateway, installer):
+    def one(i):
+        try:
+            return async_to_sync(make_payment)(175050000 + i)
+        finally:
+            close_old_connections()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(one, range(PAYMENTS)))
+    report_throughput('16 threads', started)
+
+    assert_balance_consistent(results, installer)
+
+
+# Списание, прошедшее между чтением баланса и записью аннулирования, не теряется
+@pytest.mark.django_db
+def test_annulment_keeps_concurrent_debit(installer, monkeypatch):
+    payment, = done_payments(installer, 1)
+    lock_balance = payment_serializer.lock_balance
+
+    def lock_and_pay(user_id):
+        locked = lock_balance(user_id)
+        # на PostgreSQL такой платеж ждал бы блокировки; здесь он проходит сразу
+        reserve_payment(user_id, 175050001, AMOUNT, timezone.now())
+        return locked
+
+    monkeypatch.setattr(payment_serializer, 'lock_balance', lock_and_pay)
+    annul(payment.pk)
+
+    installer.refresh_from_db()
+    assert installer.balance == BALANCE - AMOUNT
+    assert installer.avail_balance == -AMOUNT
+
+
+# Аннулирования и новые платежи одного монтажника из разных потоков (только PostgreSQL)
+@pytest.mark.skipif(connection.vendor != 'postgresql', reason='needs row-level concurrency of PostgreSQL')
+@pytest.mark.django_db(transaction=True)
+def test_annulments_against_payments_threads(slow_gateway, installer):
+    annulled = done_payments(installer, 10)
+
+    def in_thread(func, arg):
+        try:
+            return func(arg)
+        finally:
+            close_old_connections()
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        futures = [pool.submit(in_thread, async_to_sync(make_payment), 175050000 + i) for i in range(PAYMENTS)]
+        futures[::4] = [pool.submit(in_thread, annul, payment.pk) for payment in annulled]
+        for future in futures:
+            future.result()
+
+    installer.refresh_from_db()
+    done = Pays.objects.filter(user=installer, status_payment=DONE_STATUS, annulment=False).count()
+    assert installer.balance == BALANCE - done * AMOUNT
+    assert installer.avail_balance == -done * AMOUNT
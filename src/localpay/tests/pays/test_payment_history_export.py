@@ -0,0 +1,72 @@
+import csv
+import io
+from datetime import timedelta
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+from localpay.models import Pays
+from localpay.tests.conftest import UserFactory
+from localpay.views.payment_views.payment_history import stream_payment_history_csv, PAYMENT_HISTORY_EXPORT_FIELDS
+
+
+@pytest.fixture
+def payments(db):
+    installer = UserFactory(name='Азамат', surname='Токтогулов')
+    now = timezone.now()
+    return Pays.objects.bulk_create(
+        Pays(user=installer, ls_abon=str(175000000 + i), amount_minor=1050, status_payment='Выполнен',
+             paid_at=now - timedelta(days=i))
+        for i in range(10)
+    )
+
+
+def export(user, **params):
+    async def run():
+        response = await AsyncClient().get(
+            reverse('payment-history-export'), params, headers={'Authorization': f'Bearer {AccessToken.for_user(user)}'},
+        )
+        body = b''.join([chunk async for chunk in response.streaming_content]) if response.streaming else response.content
+        return response, body
+    return async_to_sync(run)()
+
+
+def parse(body):
+    return list(csv.reader(io.StringIO(body.decode('utf-8-sig'))))
+
+
+# Выгрузка отдает CSV потоком с теми же фильтрами, что и список
+def test_export_csv(admin_user, payments):
+    date_from = (timezone.localdate() - timedelta(days=4)).isoformat()
+
+    response, body = export(admin_user, date_from=date_from, search='Азамат')
+
+    assert response.status_code == 200
+    assert response.streaming
+    assert response['Content-Type'].startswith('text/csv')
+    assert 'attachment' in response['Content-Disposition']
+    rows = parse(body)
+    assert rows[0] == list(PAYMENT_HISTORY_EXPORT_FIELDS)
+    assert [row[4] for row in rows[1:]] == [str(175000000 + i) for i in range(5)]
+    assert rows[1][5] == '10.50'
+    assert rows[1][10] == 'Азамат Токтогулов'
+
+
+# Строки читаются порциями: заголовок + по одному куску на порцию
+def test_export_streams_in_chunks(payments):
+    async def collect():
+        return [chunk async for chunk in stream_payment_history_csv(Pays.objects.order_by('-paid_at', '-id'), chunk_size=3)]
+
+    chunks = async_to_sync(collect)()
+
+    assert len(chunks) == 1 + 4
+    assert len(parse(b''.join(chunks))) == 11
+
+
+# Монтажнику выгрузка недоступна
+def test_export_forbidden_for_installer(payments):
+    response, _ = export(payments[0].user)
+
+    assert response.status_code == 403
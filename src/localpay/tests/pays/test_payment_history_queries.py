@@ -0,0 +1,53 @@
+from datetime import timedelta
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from localpay.models import Pays
+from localpay.serializers.payment_serializers.payment_history_serializer import PaymentHistorySerializer
+from localpay.services.payments import create_payment
+from localpay.tests.conftest import UserFactory
+
+
+@pytest.fixture
+def payments(db):
+    now = timezone.now()
+    users = [UserFactory(planup_id=100 + i) for i in range(5)]
+    return [
+        create_payment(
+            user=users[i % len(users)], ls_abon=str(175000000 + i), number_payment=str(i),
+            amount_minor=1000 + i, status_payment='Выполнен', paid_at=now - timedelta(seconds=i),
+        )
+        for i in range(60)
+    ]
+
+
+# Страница истории: count + одна выборка с join, независимо от числа монтажников
+def test_history_page_query_count(authenticated_client, payments, django_assert_num_queries):
+    with django_assert_num_queries(2):
+        response = authenticated_client.get(reverse('payment-history'), {'limit': 50})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['count'] == 60
+    assert len(response.data['results']) == 50
+
+
+# Быстрый путь отдает то же, что и PaymentHistorySerializer
+def test_history_rows_match_serializer(authenticated_client, payments):
+    response = authenticated_client.get(reverse('payment-history'), {'limit': 10})
+
+    expected = PaymentHistorySerializer(Pays.objects.order_by('-paid_at', '-id')[:10], many=True).data
+    assert response.data['results'] == [dict(row) for row in expected]
+
+
+# Мобильная история монтажника за месяц: payments_version для ключа кэша, сводка по дням и страница
+def test_mobile_history_query_count(api_client, payments, django_assert_num_queries):
+    installer = payments[0].user
+    api_client.force_authenticate(user=installer)
+
+    with django_assert_num_queries(3):
+        response = api_client.get(reverse('mobile-user-payments'))
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['count'] == 12
+    assert {row['login'] for row in response.data['results']} == {installer.login}
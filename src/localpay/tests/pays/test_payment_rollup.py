@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from localpay.models import PaymentDailyRollup, Pays
+from localpay.services.payment_rollup import rebuild_rollup
+from localpay.services.payments import (
+    DONE_STATUS, PENDING_STATUS, annul_payment, create_payment, release_payment, settle_payment,
+)
+from localpay.tests.conftest import UserFactory
+
+
+def paid(day, hour=12):
+    return datetime(2024, 11, day, hour, tzinfo=dt_timezone.utc)
+
+
+def rollup():
+    return {
+        (row.user_id, row.day.day, row.status_payment, row.annulment): (row.count, row.amount_minor)
+        for row in PaymentDailyRollup.objects.filter(count__gt=0)
+    }
+
+
+@pytest.fixture
+def installer(db):
+    return UserFactory(balance=1000, avail_balance=0, access=True)
+
+
+# Строка монтажника блокируется раньше строки сводки во всех операциях с платежом (иначе deadlock на PostgreSQL)
+def test_installer_row_locked_before_rollup(installer):
+    payment = create_payment(user=installer, ls_abon='1', status_payment=PENDING_STATUS, amount_minor=5000, paid_at=paid(10))
+    for change in (lambda: settle_payment(payment, 'txn-1', '50.00', '2024-11-10 12:00:01'), lambda: annul_payment(payment)):
+        with CaptureQueriesContext(connection) as ctx:
+            change()
+        sql = [query['sql'] for query in ctx.captured_queries]
+        first_user = next(i for i, q in enumerate(sql) if q.startswith('UPDATE') and 'user_mon' in q.lower())
+        first_rollup = next(i for i, q in enumerate(sql) if PaymentDailyRollup._meta.db_table in q)
+        assert first_user < first_rollup
+
+
+# Сводка следует за платежом: резерв, проведение с другой суммой, аннулирование, отказ шлюза
+def test_rollup_follows_payment_lifecycle(installer):
+    payment = create_payment(user=installer, ls_abon='1', status_payment=PENDING_STATUS, amount_minor=5000, paid_at=paid(10))
+    refused = create_payment(user=installer, ls_abon='2', status_payment=PENDING_STATUS, amount_minor=700, paid_at=paid(10))
+    assert rollup() == {(installer.id, 10, PENDING_STATUS, False): (2, 5700)}
+
+    settle_payment(payment, 'txn-1', '49.50', '2024-11-10 12:00:01')
+    release_payment(refused)
+    assert rollup() == {(installer.id, 10, DONE_STATUS, False): (1, 4950)}
+
+    annul_payment(Pays.objects.get(pk=payment.pk))
+    assert rollup() == {(installer.id, 10, DONE_STATUS, True): (1, 4950)}
+
+
+# Пересборка из Pays дает ту же сводку и чинит ее после записи в обход сервисов
+def test_rebuild_matches_maintained_rollup(installer):
+    for day in (9, 10, 10, 11):
+        create_payment(user=installer, ls_abon=str(day), status_payment=DONE_STATUS, amount_minor=day * 100, paid_at=paid(day))
+    maintained = rollup()
+    Pays.objects.create(user=installer, ls_abon='x', status_payment=DONE_STATUS, amount_minor=100, paid_at=paid(11))
+    out = StringIO()
+
+    call_command('rebuild_payment_rollup', '--date-from', '2024-11-10', stdout=out)
+
+    assert '2 rollup row(s) written' in out.getvalue()
+    assert rollup() == {**maintained, (installer.id, 11, DONE_STATUS, False): (2, 1200)}
+    assert rebuild_rollup() == 3
+    assert rollup()[(installer.id, 9, DONE_STATUS, False)] == (1, 900)
+
+
+# Количество в истории за период дат - из сводки, без COUNT(*) по платежам
+def test_history_count_from_rollup(authenticated_client, installer):
+    for day in range(1, 21):
+        create_payment(user=installer, ls_abon=str(day), status_payment=DONE_STATUS, amount_minor=100, paid_at=paid(day))
+
+    with CaptureQueriesContext(connection) as captured:
+        response = authenticated_client.get(
+            reverse('payment-history'), {'date_from': '2024-11-05', 'date_to': '2024-11-14', 'limit': 3},
+        )
+
+    assert response.data['count'] == 10
+    assert [row['ls_abon'] for row in response.data['results']] == ['14', '13', '12']
+    assert not any('COUNT(' in q['sql'] and 'localpay_pays' in q['sql'] for q in captured.captured_queries)
+
+
+# Итоги периода по дням и статусам; без пары дат - 400
+def test_payment_summary(authenticated_client, installer):
+    create_payment(user=installer, ls_abon='1', status_payment=DONE_STATUS, amount_minor=1050, paid_at=paid(10))
+    create_payment(user=installer, ls_abon='2', status_payment=DONE_STATUS, amount_minor=2000, paid_at=paid(11))
+    annul_payment(create_payment(user=installer, ls_abon='3', status_payment=DONE_STATUS, amount_minor=300, paid_at=paid(11)))
+    create_payment(user=installer, ls_abon='4', status_payment=DONE_STATUS, amount_minor=999, paid_at=paid(12))
+    url = reverse('payment-history-summary')
+
+    response = authenticated_client.get(url, {'date_from': '2024-11-10', 'date_to': '2024-11-11', 'user_id': installer.id})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [(str(row['day']), row['annulment'], row['count'], row['amount']) for row in response.data['days']] == [
+        ('2024-11-10', False, 1, '10.50'),
+        ('2024-11-11', False, 1, '20.00'),
+        ('2024-11-11', True, 1, '3.00'),
+    ]
+    assert [(row['annulment'], row['count'], row['amount']) for row in response.data['totals']] == [
+        (False, 2, '30.50'), (True, 1, '3.00'),
+    ]
+
+    response = authenticated_client.get(url, {'date_from': '2024-11-10 00:00'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,67 @@
+import asyncio
+import time
+import httpx
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from localpay.models import Pays
+from localpay.services.planup import PlanupClient
+from localpay.tests.conftest import UserFactory
+
+
+# Сверка: наряды Planup подтягиваются по planup_id, отказы Planup перечислены в отчете
+def test_comparison_reports_planup_failures(authenticated_client, fake_planup):
+    _, orders, failing, requests_seen = fake_planup
+    ok = UserFactory(planup_id=11)
+    broken = UserFactory(planup_id=12)
+    UserFactory(planup_id=0)  # без planup_id в Planup не ходим
+    Pays.objects.create(user=ok, ls_abon='175000001', amount_minor=5000, status_payment='Выполнен', paid_at=timezone.now())
+    orders[11] = [{'id': 901, 'ls_abon': '175000001', 'money': '50.00', 'end_date': '2024-11-01'}]
+    failing.add(12)
+    today = timezone.localdate().isoformat()
+
+    response = authenticated_client.post(reverse('payment-compare'), {'date_from': today, 'date_to': today})
+
+    assert response.status_code == 200
+    assert sorted(int(r['planup_id']) for r in requests_seen) == [11, 12]
+    assert response.data['failures'] == [{'user_id': broken.id, 'planup_id': 12, 'error': 'status 500'}]
+    row = next(r for r in response.data['results'] if r['user_id'] == ok.id)
+    assert row['payments'][0]['planup_id'] == 901
+    assert row['payments'][0]['planup_money'] == '50.00'
+
+
+# Запросы идут параллельно, но не больше CONCURRENCY одновременно
+def test_fetch_is_concurrent_and_bounded(settings, fake_client):
+    settings.PLANUP = {'CONCURRENCY': 3}
+    in_flight = peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return httpx.Response(200, json=[])
+
+    client = fake_client(PlanupClient, handler)
+    started = time.perf_counter()
+    payments, failures = client.fetch_payments([(i, 100 + i) for i in range(9)], '2024-11-01', '2024-11-30')
+    elapsed = time.perf_counter() - started
+
+    assert peak == 3
+    assert len(payments) == 9 and failures == []
+    assert elapsed < 9 * 0.05
+
+
+# Зависший запрос обрывается по REQUEST_TIMEOUT и попадает в отказы
+def test_fetch_timeout(settings, fake_client):
+    settings.PLANUP = {'REQUEST_TIMEOUT': 0.05}
+
+    async def handler(request):
+        await asyncio.sleep(1)
+        return httpx.Response(200, json=[])
+
+    payments, failures = fake_client(PlanupClient, handler).fetch_payments([(1, 101)], '2024-11-01', '2024-11-30')
+
+    assert payments == {}
+    assert failures == [{'user_id': 1, 'planup_id': 101, 'error': 'timeout'}]
@@ -0,0 +1,104 @@
+from datetime import date, timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.utils import timezone
+from localpay.models import PlanupPayment, PlanupSyncWindow
+from localpay.services.planup_mirror import mirror_payments, sync_planup
+from localpay.tests.conftest import UserFactory
+
+
+# Подряд идущие несинхронизированные дни - один запрос; наряд ложится на день своего end_date
+def test_sync_fetches_stale_days_in_one_request(db, fake_planup):
+    _, orders, _, requests_seen = fake_planup
+    user = UserFactory(planup_id=21)
+    orders[21] = [
+        {'id': 1, 'ls_abon': '175000001', 'money': '50.00', 'end_date': '2024-11-02 10:00:00'},
+        {'id': 2, 'ls_abon': '175000002', 'money': '0', 'end_date': '2024-11-03'},
+        {'id': 3, 'ls_abon': '175000003', 'money': '70.00', 'end_date': None},
+    ]
+
+    synced, failures = sync_planup([(user.id, 21)], '2024-11-01', '2024-11-03')
+
+    assert (synced, failures) == (1, [])
+    assert [(r['start_date'], r['end_date']) for r in requests_seen] == [('2024-11-01', '2024-11-03')]
+    assert dict(PlanupPayment.objects.values_list('planup_id', 'closed_on')) == {
+        1: date(2024, 11, 2),
+        2: date(2024, 11, 3),
+        3: date(2024, 11, 1),
+    }
+    assert PlanupSyncWindow.objects.filter(installer=user).count() == 3
+    # нулевые наряды в сверку не попадают
+    assert [p['planup_id'] for p in mirror_payments([user.id], '2024-11-02', '2024-11-03')] == [1]
+
+
+# Свежие и устоявшиеся дни не перезапрашиваются, между ними запрос только за недостающие
+def test_sync_skips_fresh_and_settled_days(db, fake_planup, settings):
+    _, orders, _, requests_seen = fake_planup
+    settings.PLANUP_MIRROR = {'FRESH_FOR': 600, 'SETTLED_AFTER_DAYS': 7}
+    user = UserFactory(planup_id=22)
+    today = timezone.localdate()
+    now = timezone.now()
+    PlanupSyncWindow.objects.bulk_create([
+        # забран через 9 дней после себя - больше не меняется
+        PlanupSyncWindow(installer=user, day=today - timedelta(days=10), synced_at=now - timedelta(days=1)),
+        # забран только что
+        PlanupSyncWindow(installer=user, day=today - timedelta(days=8), synced_at=now),
+        # недавний день, забранный час назад, устарел
+        PlanupSyncWindow(installer=user, day=today - timedelta(days=7), synced_at=now - timedelta(hours=1)),
+    ])
+
+    sync_planup([(user.id, 22)], (today - timedelta(days=10)).isoformat(), (today - timedelta(days=6)).isoformat())
+
+    assert [(r['start_date'], r['end_date']) for r in requests_seen] == [
+        ((today - timedelta(days=9)).isoformat(), (today - timedelta(days=9)).isoformat()),
+        ((today - timedelta(days=7)).isoformat(), (today - timedelta(days=6)).isoformat()),
+    ]
+
+
+# Повторная синхронизация обновляет наряды на месте и убирает исчезнувшие из Planup
+def test_resync_upserts_and_removes_vanished_orders(db, fake_planup):
+    _, orders, _, _ = fake_planup
+    user = UserFactory(planup_id=23)
+    orders[23] = [
+        {'id': 1, 'ls_abon': '175000001', 'money': '50.00', 'end_date': '2024-11-01'},
+        {'id': 2, 'ls_abon': '175000002', 'money': '60.00', 'end_date': '2024-11-01'},
+    ]
+    sync_planup([(user.id, 23)], '2024-11-01', '2024-11-01')
+
+    orders[23] = [{'id': 1, 'ls_abon': '175000001', 'money': '55.00', 'end_date': '2024-11-01'}] * 2
+    sync_planup([(user.id, 23)], '2024-11-01', '2024-11-01', force=True)
+
+    assert list(PlanupPayment.objects.values_list('planup_id', 'amount_minor')) == [(1, 5500)]
+
+
+# Окно, по которому Planup не ответил, не помечается синхронизированным и запрашивается снова
+def test_failed_window_is_retried(db, fake_planup):
+    _, orders, failing, requests_seen = fake_planup
+    user = UserFactory(planup_id=24)
+    failing.add(24)
+
+    synced, failures = sync_planup([(user.id, 24)], '2024-11-01', '2024-11-02')
+
+    assert synced == 0
+    assert failures == [{'user_id': user.id, 'planup_id': 24, 'error': 'status 500'}]
+    assert not PlanupSyncWindow.objects.exists()
+
+    failing.clear()
+    orders[24] = [{'id': 5, 'ls_abon': '175000005', 'money': '10.00', 'end_date': '2024-11-02'}]
+    assert sync_planup([(user.id, 24)], '2024-11-01', '2024-11-02') == (1, [])
+    assert len(requests_seen) == 2
+
+
+# Команда синхронизации по умолчанию обходит всех монтажников с planup_id
+def test_sync_planup_command(db, fake_planup):
+    _, orders, _, requests_seen = fake_planup
+    user = UserFactory(planup_id=25)
+    UserFactory(planup_id=None)
+    orders[25] = [{'id': 7, 'ls_abon': '175000007', 'money': '30.00', 'end_date': '2024-11-05'}]
+    out = StringIO()
+
+    call_command('sync_planup', '--date-from', '2024-11-01', '--date-to', '2024-11-30', stdout=out)
+
+    assert '1 window(s) refreshed' in out.getvalue()
+    assert [int(r['planup_id']) for r in requests_seen] == [25]
+    assert PlanupPayment.objects.get().installer == user
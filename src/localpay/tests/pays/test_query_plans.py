@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+import pytest
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from localpay.models import Pays, Comment
+from localpay.tests.conftest import UserFactory
+from localpay.utils import filter_paid_period
+from localpay.views.comments_views.comments import CommentsList
+from localpay.services.comparison_report import localpay_payments
+
+
+START = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+ROWS_PER_USER = 2000
+
+
+# Данные, на которых планировщик выбирает индекс, а не полный просмотр
+@pytest.fixture
+def seeded(db):
+    users = [UserFactory() for _ in range(10)]
+    Pays.objects.bulk_create(
+        Pays(
+            user=user, ls_abon=str(175000000 + i), number_payment=str(user.pk * 100000 + i),
+            amount_minor=5000, status_payment='Выполнен', paid_at=START + timedelta(hours=i),
+        )
+        for user in users for i in range(ROWS_PER_USER)
+    )
+    Comment.objects.bulk_create(
+        Comment(user2=users[i % len(users)], text='Пополнение баланса', type_pay='Пополнение')
+        for i in range(ROWS_PER_USER)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return users
+
+
+def assert_uses_index(queryset, index_name):
+    plan = queryset.explain()
+    assert index_name in plan, plan
+    assert 'Seq Scan' not in plan, plan
+
+
+# История платежей: период, новые сверху
+def test_history_plan(seeded):
+    queryset = filter_paid_period(Pays.objects.all(), '2024-01-10', '2024-01-20').order_by('-paid_at', '-id')[:50]
+
+    assert_uses_index(queryset, 'pays_paid_at_idx')
+
+
+# История одного монтажника
+def test_user_history_plan(seeded):
+    queryset = Pays.objects.filter(user=seeded[0]).order_by('-paid_at', '-id')[:50]
+
+    assert_uses_index(queryset, 'pays_user_paid_at_idx')
+
+
+# Сверка с Planup: user_id + период
+def test_comparison_plan(seeded):
+    queryset = localpay_payments('2024-01-10', '2024-01-20', user_id=seeded[0].pk)
+
+    assert_uses_index(queryset, 'pays_user_paid_at_idx')
+    # период - условие индекса, а не фильтр по всем платежам монтажника
+    assert 'Filter' not in queryset.explain()
+
+
+# Операции баланса: период created_at, новые сверху
+def test_comments_plan(seeded):
+    view = CommentsList()
+    today = datetime.now().date()
+    view.request = Request(APIRequestFactory().get('/comments_list/', {
+        'date_from': (today - timedelta(days=1)).isoformat(), 'date_to': today.isoformat(),
+    }))
+
+    assert_uses_index(view.get_queryset()[:50], 'comment_created_at_idx')
+
+
+# Поиск платежа по лицевому счету и номеру
+def test_lookup_plans(seeded):
+    assert_uses_index(Pays.objects.filter(ls_abon='175000042'), 'pays_ls_abon_idx')
+    assert_uses_index(Pays.objects.filter(number_payment='100042'), 'pays_number_payment_idx')
@@ -0,0 +1,81 @@
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from localpay.models import Pays
+from localpay.services.reconciliation import MISSING_IN_LOCALPAY, MISSING_IN_PLANUP, reconcile
+from localpay.tests.conftest import UserFactory
+
+
+def localpay_row(user_id, ls_abon, amount_minor):
+    return {'user_id': user_id, 'ls_abon': ls_abon, 'amount_minor': amount_minor, 'status_payment': 'Выполнен',
+            'paid_at': None, 'user__name': 'Азамат', 'user__surname': 'Токтогулов'}
+
+
+def planup_payment(user_id, ls_abon, money, planup_id):
+    return {'user_id': user_id, 'ls_abon': ls_abon, 'money': money, 'planup_id': planup_id, 'end_date': None}
+
+
+# Повторы сопоставляются один к одному: 2 платежа LocalPay и 3 наряда Planup -> 2 пары и 1 лишний
+def test_duplicates_matched_one_to_one():
+    report = reconcile(
+        [localpay_row(1, '175000001', 5000), localpay_row(1, '175000001', 5000)],
+        [planup_payment(1, '175000001', 5000, planup_id) for planup_id in (11, 12, 13)],
+    )
+
+    payments = report[0]['payments']
+    assert [(p['localpay_money'], p['planup_id']) for p in payments] == [
+        ('50.00', 11), ('50.00', 12), (MISSING_IN_LOCALPAY, 13),
+    ]
+    assert report[0]['localpay_total'] == 10000 and report[0]['planup_total'] == 15000
+    assert report[-1]['localpay_total'] == '100.00' and report[-1]['planup_total'] == '150.00'
+
+
+# Ключ - монтажник, лицевой счет и сумма: другая сумма или другой монтажник не совпадают
+def test_key_includes_user_and_amount():
+    report = reconcile(
+        [localpay_row(1, '175000001', 5000)],
+        [planup_payment(1, '175000001', 7000, 21), planup_payment(2, '175000001', 5000, 22)],
+        load_names=lambda ids: {user_id: ('Нурлан', 'Исаков') for user_id in ids},
+    )
+
+    first, second, _ = report
+    assert [p['planup_money'] for p in first['payments']] == [MISSING_IN_PLANUP, '70.00']
+    assert (second['user_id'], second['name']) == (2, 'Нурлан')
+    assert second['payments'][0]['localpay_money'] == MISSING_IN_LOCALPAY
+
+
+# Сверка через эндпоинт по свежей копии Planup: монтажники, окна синхронизации,
+# наряды, платежи и имена - по одному запросу, без обращений к Planup
+def test_comparison_view_queries(authenticated_client, fake_planup, django_assert_num_queries):
+    _, orders, _, requests_seen = fake_planup
+    installers = [UserFactory(planup_id=50 + i) for i in range(5)]
+    for i, user in enumerate(installers[:3]):
+        Pays.objects.create(user=user, ls_abon=f'17500000{i}', amount_minor=5000, status_payment='Выполнен',
+                            paid_at=timezone.now())
+    for i, user in enumerate(installers):
+        orders[user.planup_id] = [{'id': 900 + i, 'ls_abon': f'17500000{i}', 'money': '50.00'}]
+    today = timezone.localdate().isoformat()
+
+    authenticated_client.post(reverse('payment-compare'), {'date_from': today, 'date_to': today})
+    assert len(requests_seen) == 5
+
+    with django_assert_num_queries(5):
+        response = authenticated_client.post(reverse('payment-compare'), {'date_from': today, 'date_to': today})
+    assert len(requests_seen) == 5
+
+    results = response.data['results']
+    assert len(results) == 6
+    assert all(row['name'] for row in results[:-1])
+    assert results[-1]['localpay_total'] == '150.00' and results[-1]['planup_total'] == '250.00'
+
+
+# Монтажнику сверка недоступна: запрос не доходит до Planup
+def test_comparison_view_forbidden_for_installer(db, api_client, fake_planup):
+    _, _, _, requests_seen = fake_planup
+    api_client.force_authenticate(user=UserFactory(planup_id=50))
+    today = timezone.localdate().isoformat()
+
+    response = api_client.post(reverse('payment-compare'), {'date_from': today, 'date_to': today})
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert requests_seen == []
@@ -0,0 +1,144 @@
+from datetime import timedelta
+import pytest
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.urls import reverse
+from django.utils import timezone
+from localpay.management.commands import run_report_jobs
+from localpay.models import ComparisonReportJob, Pays
+from localpay.services import report_jobs
+from localpay.services.report_jobs import cancel_report_job, claim_next_job, requeue_abandoned_jobs, run_report_job
+from localpay.tests.conftest import UserFactory
+
+
+@pytest.fixture
+def report_data(db, fake_planup):
+    _, orders, _, _ = fake_planup
+    installer = UserFactory(planup_id=77)
+    Pays.objects.create(user=installer, ls_abon='175000001', amount_minor=5000, status_payment='Выполнен',
+                        paid_at=timezone.now())
+    orders[77] = [{'id': 901, 'ls_abon': '175000001', 'money': '50.00', 'end_date': None}]
+    today = timezone.localdate().isoformat()
+    return {'user_id': installer.pk, 'date_from': today, 'date_to': today}
+
+
+def submit(client, params):
+    return client.post(reverse('payment-compare-jobs'), params, format='json')
+
+
+# Задание: постановка, расчет воркером, статус и результат как у синхронной сверки
+def test_job_lifecycle(authenticated_client, report_data):
+    response = submit(authenticated_client, report_data)
+    assert response.status_code == 202
+    job_id = response.data['job_id']
+    assert response.data['status'] == 'queued'
+
+    pending = authenticated_client.get(reverse('payment-compare-job-result', args=[job_id]))
+    assert pending.status_code == 409
+
+    call_command('run_report_jobs', once=True)
+
+    status_response = authenticated_client.get(reverse('payment-compare-job', args=[job_id]))
+    assert status_response.data['status'] == 'done'
+    result = authenticated_client.get(reverse('payment-compare-job-result', args=[job_id]))
+    sync = authenticated_client.post(reverse('payment-compare'), report_data)
+    assert result.status_code == 200
+    assert result.json() == sync.json()
+
+
+# Те же параметры - то же задание; готовый отчет отдается без пересчета
+def test_same_parameters_reuse_job(authenticated_client, report_data):
+    first = submit(authenticated_client, report_data)
+    assert submit(authenticated_client, report_data).data['job_id'] == first.data['job_id']
+
+    call_command('run_report_jobs', once=True)
+
+    again = submit(authenticated_client, report_data)
+    assert again.status_code == 200
+    assert again.data['job_id'] == first.data['job_id']
+    assert ComparisonReportJob.objects.count() == 1
+
+
+# Отмена задания в очереди: воркер его не берет
+def test_cancel_queued_job(authenticated_client, report_data):
+    job_id = submit(authenticated_client, report_data).data['job_id']
+
+    response = authenticated_client.delete(reverse('payment-compare-job', args=[job_id]))
+
+    assert response.data['status'] == 'cancelled'
+    assert claim_next_job() is None
+
+
+# Отмена во время расчета: воркер останавливается на ближайшей проверке
+def test_cancel_running_job(authenticated_client, report_data):
+    submit(authenticated_client, report_data)
+    job = claim_next_job()
+
+    cancel_report_job(job)
+    run_report_job(job)
+
+    job.refresh_from_db()
+    assert job.status == ComparisonReportJob.CANCELLED
+    assert job.result is None
+
+
+# Ошибка расчета сохраняется в задании
+def test_failed_job(authenticated_client, report_data, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError('planup is down')
+    monkeypatch.setattr(report_jobs, 'build_comparison_report', broken)
+    submit(authenticated_client, report_data)
+
+    call_command('run_report_jobs', once=True)
+
+    job = ComparisonReportJob.objects.get()
+    assert job.status == ComparisonReportJob.FAILED
+    assert job.error == 'planup is down'
+
+
+# Долгий отчет живого воркера (свежая отметка) не возвращается в очередь, брошенный - возвращается
+def test_requeue_only_without_heartbeat(authenticated_client, report_data):
+    submit(authenticated_client, report_data)
+    job = claim_next_job()
+    long_ago = timezone.now() - timedelta(hours=2)
+    ComparisonReportJob.objects.filter(pk=job.pk).update(started_at=long_ago, heartbeat_at=timezone.now())
+
+    assert requeue_abandoned_jobs() == 0
+
+    ComparisonReportJob.objects.filter(pk=job.pk).update(heartbeat_at=long_ago)
+    assert requeue_abandoned_jobs() == 1
+    job.refresh_from_db()
+    assert job.status == ComparisonReportJob.QUEUED
+
+
+# Воркер переживает сбой опроса и сам возвращает в очередь задание, брошенное другим воркером
+def test_worker_requeues_on_poll_and_survives_errors(authenticated_client, report_data, monkeypatch, settings):
+    settings.REPORT_JOBS = {'POLL_INTERVAL': 0, 'REQUEUE_INTERVAL': 0}
+    submit(authenticated_client, report_data)
+    job = claim_next_job()
+    polls = []
+
+    def claim():
+        polls.append(len(polls) + 1)
+        if polls[-1] == 1:
+            # другой воркер упал с заданием на руках, а у этого отвалилась БД
+            long_ago = timezone.now() - timedelta(hours=2)
+            ComparisonReportJob.objects.filter(pk=job.pk).update(started_at=long_ago, heartbeat_at=long_ago)
+            raise DatabaseError('connection lost')
+        if polls[-1] == 4:
+            raise KeyboardInterrupt
+        return claim_next_job()
+
+    monkeypatch.setattr(run_report_jobs, 'claim_next_job', claim)
+    monkeypatch.setattr(run_report_jobs, 'close_old_connections', lambda: None)
+    call_command('run_report_jobs')
+
+    job.refresh_from_db()
+    assert job.status == ComparisonReportJob.DONE
+
+
+# Монтажнику задания сверки недоступны
+def test_jobs_forbidden_for_installer(api_client, report_data):
+    api_client.force_authenticate(user=UserFactory())
+
+    assert submit(api_client, report_data).status_code == 403
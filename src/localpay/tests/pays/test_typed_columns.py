@@ -0,0 +1,75 @@
+import importlib
+from datetime import datetime, timezone as dt_timezone
+import pytest
+from django.apps import apps
+from django.db import connection
+from rest_framework import status
+from localpay.models import Pays
+from localpay.services.payments import create_payment
+from localpay.tests.conftest import UserFactory
+
+
+backfill_migration = importlib.import_module('localpay.migrations.0005_backfill_pays_typed_columns')
+
+
+# Перенос сумм и дат из строковых колонок партиями
+@pytest.mark.django_db
+def test_backfill_typed_columns(monkeypatch):
+    user = UserFactory()
+    # bulk_create мимо Pays.save(), как строки, записанные до появления amount_minor
+    legacy = Pays.objects.bulk_create([
+        Pays(user=user, money='50.0', date_payment='2024-11-13 08:48:12.12'),
+        Pays(user=user, money='1200', date_payment='2024-11-14 00:00:01.5'),
+        Pays(user=user, money='не число', date_payment='мусор'),
+    ])
+    monkeypatch.setattr(backfill_migration, 'BATCH_SIZE', 2)
+
+    class SchemaEditor:
+        pass
+    SchemaEditor.connection = connection
+    backfill_migration.backfill(apps, SchemaEditor())
+
+    first, second, broken = [Pays.objects.get(pk=p.pk) for p in legacy]
+    assert first.amount_minor == 5000
+    assert first.paid_at == datetime(2024, 11, 13, 8, 48, 12, 120000, tzinfo=dt_timezone.utc)
+    assert second.amount_minor == 120000
+    assert broken.amount_minor is None
+    assert broken.paid_at == broken.updated_at
+
+
+# Фильтр истории по датам работает по paid_at, date_to включительно
+@pytest.mark.django_db
+def test_history_date_filter(authenticated_client):
+    user = UserFactory()
+    for day in (9, 10, 11):
+        create_payment(
+            user=user, ls_abon=str(day), amount_minor=day * 100, status_payment='Выполнен',
+            paid_at=datetime(2024, 11, day, 23, 59, tzinfo=dt_timezone.utc),
+        )
+
+    response = authenticated_client.get('/api/payment-history/', {'date_from': '2024-11-10', 'date_to': '2024-11-10'})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['count'] == 1
+    assert response.data['results'][0]['ls_abon'] == '10'
+    assert response.data['results'][0]['money'] == '10.00'
+    assert response.data['results'][0]['date_payment'] == '2024-11-10 23:59:00.00'
+
+
+# Платеж без amount_minor (например, из админки) получает сумму из money;
+# без суммы аннулирование отклоняется, а не падает
+@pytest.mark.django_db
+def test_amount_minor_from_legacy_money(authenticated_client):
+    user = UserFactory()
+    payment = Pays.objects.create(user=user, money='150,5', status_payment='Выполнен')
+    broken = Pays.objects.create(user=user, money='не число', status_payment='Выполнен')
+
+    payment.refresh_from_db()
+    assert payment.amount_minor == 15050
+    assert broken.amount_minor is None
+
+    response = authenticated_client.put(f'/api/payment_update/{broken.pk}/', {'annulment': True})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'не указана сумма' in str(response.data)
+    broken.refresh_from_db()
+    assert broken.annulment is False
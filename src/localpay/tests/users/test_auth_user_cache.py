@@ -0,0 +1,79 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from localpay.services.auth_user_cache import AuthUserCache
+from localpay.tests.conftest import UserFactory
+
+
+def bearer(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+    return client
+
+
+def user_lookups(client, url):
+    with CaptureQueriesContext(connection) as captured:
+        response = client.get(url)
+    return response, [q['sql'] for q in captured.captured_queries if 'FROM "localpay_user_mon"' in q['sql']]
+
+
+@pytest.fixture
+def installer(db):
+    return UserFactory()
+
+
+# Повторные запросы с тем же токеном не читают монтажника из БД
+def test_repeated_requests_skip_user_query(installer):
+    client = bearer(installer)
+    url = reverse('mobile-user-comments')
+
+    response, lookups = user_lookups(client, url)
+    assert response.status_code == status.HTTP_200_OK
+    assert len(lookups) == 1
+
+    response, lookups = user_lookups(client, url)
+    assert response.status_code == status.HTTP_200_OK
+    assert lookups == []
+
+
+# Отключение и удаление через API сразу действуют на закэшированного монтажника
+def test_update_and_delete_invalidate(installer, authenticated_client):
+    client = bearer(installer)
+    url = reverse('mobile-user-comments')
+    assert client.get(url).status_code == status.HTTP_200_OK
+
+    response = authenticated_client.put(reverse('update_user', args=[installer.pk]), {
+        'login': installer.login, 'password': 'testpass123', 'region': installer.region, 'is_active': False,
+    }, format='json')
+    assert response.status_code == status.HTTP_200_OK
+    assert client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+
+    other = UserFactory()
+    client = bearer(other)
+    assert client.get(url).status_code == status.HTTP_200_OK
+    authenticated_client.delete(reverse('delete-user', args=[other.pk]))
+    assert client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+# Кэш отдает копии, держит не больше MAX_ENTRIES и забывает записи по TTL
+def test_cache_copies_and_bounds(installer, settings):
+    settings.AUTH_USER_CACHE = {'TTL': 60, 'MAX_ENTRIES': 2}
+    users = AuthUserCache()
+    others = [UserFactory(), UserFactory()]
+
+    users.put(installer)
+    users.get(installer.pk).balance = 999
+    assert users.get(installer.pk).balance == installer.balance
+
+    for user in others:
+        users.put(user)
+    assert users.get(installer.pk) is None
+    assert users.stats() == {'hits': 2, 'misses': 1, 'entries': 2}
+
+    settings.AUTH_USER_CACHE = {'TTL': 0}
+    users.put(installer)
+    assert users.get(installer.pk) is None
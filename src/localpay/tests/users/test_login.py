@@ -0,0 +1,75 @@
+import pytest
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.urls import reverse
+from rest_framework import status
+from localpay.models import User_mon
+from localpay.tests.conftest import UserFactory
+
+
+@pytest.fixture
+def fast_hashing(db, settings):
+    settings.PASSWORD_HASHING = {'PBKDF2_ITERATIONS': 1000}
+    return settings
+
+
+@pytest.fixture
+def hash_calls(monkeypatch):
+    calls = []
+    encode = PBKDF2PasswordHasher.encode
+
+    def counting_encode(self, password, salt, iterations=None):
+        calls.append(iterations or self.iterations)
+        return encode(self, password, salt, iterations)
+
+    monkeypatch.setattr(PBKDF2PasswordHasher, 'encode', counting_encode)
+    return calls
+
+
+def make_user(**kwargs):
+    # UserFactory не сохраняет пароль после set_password()
+    user = UserFactory(**kwargs)
+    user.save()
+    return user
+
+
+def login(api_client, user_login, password='testpass123'):
+    return api_client.post(reverse('token_obtain_pair'), {'login': user_login, 'password': password}, format='json')
+
+
+# Вход хеширует пароль один раз и отдает токены с login и role
+def test_login_hashes_password_once(api_client, fast_hashing, hash_calls):
+    user = make_user()
+    hash_calls.clear()
+
+    response = login(api_client, user.login)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert set(response.data) == {'refresh', 'access'}
+    assert hash_calls == [1000]
+
+
+# Смена политики: пароль перехешируется при первом входе, дальше не трогается
+def test_rehash_on_login(api_client, fast_hashing, hash_calls):
+    user = make_user()
+    fast_hashing.PASSWORD_HASHING = {'PBKDF2_ITERATIONS': 2000}
+
+    assert login(api_client, user.login).status_code == status.HTTP_200_OK
+    rehashed = User_mon.objects.get(pk=user.pk).password
+    assert rehashed.startswith('pbkdf2_sha256$2000$')
+
+    hash_calls.clear()
+    assert login(api_client, user.login).status_code == status.HTTP_200_OK
+    assert User_mon.objects.get(pk=user.pk).password == rehashed
+    assert hash_calls == [2000]
+
+
+# Неверный пароль и неизвестный логин - 400 (одно хеширование), отключенный монтажник - 401
+def test_login_failures(api_client, fast_hashing, hash_calls):
+    user = make_user()
+    inactive = make_user(is_active=False)
+    hash_calls.clear()
+
+    assert login(api_client, user.login, 'wrong').status_code == status.HTTP_400_BAD_REQUEST
+    assert login(api_client, 'nobody').status_code == status.HTTP_400_BAD_REQUEST
+    assert hash_calls == [1000, 1000]
+    assert login(api_client, inactive.login).status_code == status.HTTP_401_UNAUTHORIZED
@@ -0,0 +1,66 @@
+import pytest
+from django.db import connection
+from django.urls import reverse
+from rest_framework import status
+from localpay.models import User_mon, Pays
+from localpay.search import IcontainsSearchBackend, TrigramSearchBackend, get_search_backend
+from localpay.tests.conftest import UserFactory
+
+
+@pytest.fixture
+def installers(db):
+    return [
+        UserFactory(name='Азамат', surname='Токтогулов', login='azamat'),
+        UserFactory(name='Айбек', surname='Азаматов', login='aibek'),
+        UserFactory(name='Нурлан', surname='Исаков', login='nurlan'),
+    ]
+
+
+# Бэкенд выбирается по базе, настройка SEARCH_BACKEND его переопределяет
+def test_backend_selection(settings):
+    expected = TrigramSearchBackend if connection.vendor == 'postgresql' else IcontainsSearchBackend
+    assert type(get_search_backend()) is expected
+
+    settings.SEARCH_BACKEND = 'localpay.search.IcontainsSearchBackend'
+    assert type(get_search_backend()) is IcontainsSearchBackend
+
+
+# Каждое слово должно найтись хотя бы в одном поле
+# (SQLite не сравнивает кириллицу без учета регистра, поэтому регистр проверяется на логине)
+def test_search_matches_every_term(installers):
+    fields = ['name', 'surname', 'login']
+
+    found = User_mon.search_manager.search(query='Азамат', fields=fields)
+    assert {u.login for u in found} == {'azamat', 'aibek'}
+
+    found = User_mon.search_manager.search(query='AZAMAT', fields=fields)
+    assert [u.login for u in found] == ['azamat']
+
+    found = User_mon.search_manager.search(query='Азамат Токтогул', fields=fields)
+    assert [u.login for u in found] == ['azamat']
+
+    assert User_mon.search_manager.search(query='  ', fields=fields).count() == 3
+
+
+# Ранжирование: точное совпадение слова выше частичного (только PostgreSQL)
+@pytest.mark.skipif(connection.vendor != 'postgresql', reason='pg_trgm ranking')
+def test_trigram_ranking(installers):
+    found = list(User_mon.search_manager.search(query='Азамат', fields=['name', 'surname', 'login']))
+    assert found[0].login == 'azamat'
+    assert found[0].search_rank >= found[1].search_rank
+
+
+# Поиск в истории платежей: имя+фамилия, логин и лицевой счет
+def test_payment_history_search(authenticated_client, installers):
+    for i, user in enumerate(installers):
+        Pays.objects.create(user=user, ls_abon=f'17500000{i}', amount_minor=1000, status_payment='Выполнен')
+
+    def search(query):
+        response = authenticated_client.get(reverse('payment-history'), {'search': query})
+        assert response.status_code == status.HTTP_200_OK
+        return sorted(p['ls_abon'] for p in response.data['results'])
+
+    assert search('Азамат Токтогулов') == ['175000000']
+    assert search('Nurlan') == ['175000002']
+    assert search('Азамат') == ['175000000', '175000001']
+    assert search('175000001') == ['175000001']
@@ -0,0 +1,78 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from localpay.models import Comment
+from localpay.tests.conftest import UserFactory
+
+
+def add_comments(user, count):
+    return [Comment.objects.create(user2=user, text=f'{user.login}-{i}', type_pay='Пополнение') for i in range(count)]
+
+
+@pytest.fixture
+def installer(db):
+    return UserFactory()
+
+
+# Список монтажников: два запроса и тот же размер ответа, сколько бы операций ни было
+def test_list_has_no_comments(authenticated_client, django_assert_num_queries):
+    users = [UserFactory() for _ in range(3)]
+    before = authenticated_client.get(reverse('user-list-create')).content
+    for user in users:
+        add_comments(user, 20)
+
+    with django_assert_num_queries(2):
+        response = authenticated_client.get(reverse('user-list-create'), {'count': 'exact'})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert all('comments' not in row for row in response.data['results'])
+    assert response.content == before
+
+
+# Карточка: только последние LATEST_COMMENTS операций, одним prefetch-запросом
+def test_detail_latest_comments(authenticated_client, installer, settings, django_assert_num_queries):
+    settings.USER_PROJECTIONS = {'LATEST_COMMENTS': 5}
+    comments = add_comments(installer, 12)
+    add_comments(UserFactory(), 3)
+
+    with django_assert_num_queries(2):
+        response = authenticated_client.get(reverse('user-detail', args=[installer.pk]))
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [row['text'] for row in response.data['comments']] == [c.text for c in comments[:-6:-1]]
+
+
+# Мобильный профиль: свой набор полей и тоже только последние операции
+def test_mobile_detail_projection(installer, django_assert_num_queries):
+    add_comments(installer, 15)
+    client = APIClient()
+    client.force_authenticate(user=installer)
+
+    with django_assert_num_queries(2):
+        response = client.get(reverse('mobile-user-detail'))
+
+    assert response.status_code == status.HTTP_200_OK
+    assert set(response.data) == {
+        'id', 'name', 'surname', 'login', 'access', 'balance', 'avail_balance',
+        'region', 'date_reg', 'is_active', 'planup_id', 'comments',
+    }
+    assert len(response.data['comments']) == 10
+
+
+# Вся история операций - постранично и только выбранного монтажника
+def test_user_comments_paginated(authenticated_client, installer):
+    comments = add_comments(installer, 12)
+    other = UserFactory()
+    add_comments(other, 3)
+
+    response = authenticated_client.get(reverse('user-comments', args=[installer.pk]), {'limit': 5, 'offset': 5})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['count'] == 12
+    assert [row['text'] for row in response.data['results']] == [c.text for c in comments[6:1:-1]]
+
+    client = APIClient()
+    client.force_authenticate(user=other)
+    response = client.get(reverse('mobile-user-comments'))
+    assert [row['text'] for row in response.data['results']] == [f'{other.login}-{i}' for i in (2, 1, 0)]
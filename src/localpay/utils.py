@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.utils import timezone
+
+
+def to_minor_units(value):
+    """Money (str/int/float/Decimal in som) -> integer tyiyn."""
+    return int((Decimal(str(value)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def format_minor_units(minor):
+    if minor is None:
+        return None
+    return f'{Decimal(minor).scaleb(-2):.2f}'
+
+
+def format_payment_date(value, tz=None):
+    # тот же вид, что у прежней строки str(datetime.now())[:-4];
+    # tz передают в циклах, чтобы не искать текущую зону на каждой строке
+    if value is None:
+        return None
+    return timezone.localtime(value, tz).strftime('%Y-%m-%d %H:%M:%S.%f')[:-4]
+
+
+def payment_period(date_from=None, date_to=None):
+    """ISO dates from query params -> aware [start, end) bounds; date_to is inclusive."""
+    start = end = None
+    if date_from:
+        start = datetime.fromisoformat(date_from)
+        if timezone.is_naive(start):
+            start = timezone.make_aware(start)
+    if date_to:
+        end_day = datetime.fromisoformat(date_to)
+        end_day = datetime.combine(end_day.date(), datetime.min.time()) + timedelta(days=1)
+        end = timezone.make_aware(end_day)
+    return start, end
+
+
+def filter_paid_period(queryset, date_from=None, date_to=None, field='paid_at'):
+    start, end = payment_period(date_from, date_to)
+    if start is not None:
+        queryset = queryset.filter(**{f'{field}__gte': start})
+    if end is not None:
+        queryset = queryset.filter(**{f'{field}__lt': end})
+    return queryset
@@ -0,0 +1,95 @@
+from django.http import HttpResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+from localpay.authentication import AsyncJWTAuthentication
+
+
+class AsyncAPIView(View):
+    """Native async counterpart of APIView for hot paths served under ASGI.
+
+    DRF cannot await handlers, so this covers what our async endpoints need:
+    request parsing, async JWT authentication, permission classes and
+    DRF-style error bodies. Handlers return rest_framework Response objects;
+    they are rendered here so Django does not hop to a thread to render them.
+    Plain Django responses (e.g. streaming ones) are passed through.
+    Set schema_view_class to a DRF view describing the endpoint to keep
+    it in the Swagger schema.
+    """
+    authentication_classes = [AsyncJWTAuthentication]
+    permission_classes = []
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES
+    renderer_class = JSONRenderer
+    # APIView, по которому drf_yasg описывает эндпоинт: сам View в схему не попадает
+    schema_view_class = None
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        if cls.schema_view_class is not None:
+            view.cls, view.initkwargs = cls.schema_view_class, initkwargs
+        return csrf_exempt(view)
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(request, parsers=[parser() for parser in self.parser_classes], authenticators=())
+        self.request = request
+
+        try:
+            await self.perform_authentication(request)
+            self.check_permissions(request)
+
+            method = request.method.lower()
+            handler = getattr(self, method, None) if method in self.http_method_names else None
+            if handler is None:
+                raise exceptions.MethodNotAllowed(request.method)
+            response = await handler(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            response = self.handle_exception(exc)
+
+        return self.finalize_response(response)
+
+    async def perform_authentication(self, request):
+        # APIClient.force_authenticate() подставляет пользователя сам
+        if request.authenticators:
+            return
+
+        for authenticator in [auth() for auth in self.authentication_classes]:
+            user_auth_tuple = await authenticator.aauthenticate(request)
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+
+    def check_permissions(self, request):
+        for permission in [permission() for permission in self.permission_classes]:
+            if not permission.has_permission(request, self):
+                if not request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+
+    def handle_exception(self, exc):
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            exc.auth_header = self.authentication_classes[0]().authenticate_header(self.request)
+        return exception_handler(exc, {'view': self, 'request': self.request})
+
+    def finalize_response(self, response):
+        # обычные ответы Django (например, StreamingHttpResponse) отдаются как есть
+        if not isinstance(response, Response):
+            return response
+        renderer = self.renderer_class()
+        http_response = HttpResponse(
+            renderer.render(response.data),
+            status=response.status_code,
+            content_type=renderer.media_type,
+        )
+        for header, value in response.items():
+            if header.lower() != 'content-type':
+                http_response[header] = value
+        http_response.data = response.data
+        return http_response
@@ -3,40 +3,26 @@ from rest_framework.response import Response
 from rest_framework import status
 from localpay.models import Comment
 from localpay.serializers.comments_serializer.comments_serializer import CommentSerializer
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from localpay.permission import  IsAdmin , IsSupervisor
-from rest_framework.pagination import LimitOffsetPagination
+from localpay.authentication import CachedJWTAuthentication
+from localpay.permission import  IsAdmin , IsSupervisor , IsUser
+from localpay.pagination import CommentsPagination
 from datetime import datetime, timedelta, time
 from rest_framework.generics import ListAPIView
 from django.db.models import Q
 
 
-class CustomLimitOffsetPagination(LimitOffsetPagination):
-    default_limit = 50
-    limit_query_param = 'limit'
-    offset_query_param = 'offset'
-
-    def get_paginated_response(self, data):
-        return Response({
-            'count': self.count,
-            'limit': self.get_limit(self.request),
-            'offset': self.get_offset(self.request),
-            'results': data,
-        })
-
-
 class CommentsList(ListAPIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAdmin | IsSupervisor]
     serializer_class = CommentSerializer
-    pagination_class = CustomLimitOffsetPagination
+    pagination_class = CommentsPagination
 
     def get_queryset(self):
         search_query = self.request.query_params.get('search', '')
         date_from = self.request.query_params.get('date_from')
         date_to = self.request.query_params.get('date_to')
 
-        queryset = Comment.objects.all()
+        queryset = Comment.objects.select_related('user2')
 
         if search_query:
             queryset = queryset.filter(user2__name__icontains=search_query)
@@ -49,4 +35,24 @@ class CommentsList(ListAPIView):
             date_to_end_of_day = datetime.combine(date_to_obj, time.max)
             queryset = queryset.filter(created_at__lte=date_to_end_of_day)
 
-        return queryset.order_by('-created_at')
\ No newline at end of file
+        return queryset.order_by('-created_at', '-id')
+
+
+# Вся история операций одного монтажника постранично (в карточке - только последние)
+class UserCommentsList(ListAPIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAdmin | IsSupervisor]
+    serializer_class = CommentSerializer
+    pagination_class = CommentsPagination
+
+    def get_queryset(self):
+        # по индексу (user2, -created_at, -id)
+        return Comment.objects.select_related('user2').filter(user2_id=self.kwargs['pk']).order_by('-created_at', '-id')
+
+
+# То же для монтажника в мобильном приложении - только свои операции
+class MobileUserCommentsList(UserCommentsList):
+    permission_classes = [IsUser]
+
+    def get_queryset(self):
+        return Comment.objects.select_related('user2').filter(user2=self.request.user).order_by('-created_at', '-id')
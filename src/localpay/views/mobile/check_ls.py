@@ -1,19 +1,30 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from localpay.authentication import CachedJWTAuthentication
+from asgiref.sync import async_to_sync
 from localpay.serializers.payment_serializers.payment_serializer import  check_ls
 from localpay.serializers.payment_serializers.payment_serializer import AccountCheckSerializer
+from localpay.services.account_check_cache import account_checks
+from localpay.permission import IsAdmin, IsSupervisor
 
 
 class AccountCheckView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     def post(self, request):
         serializer = AccountCheckSerializer(data=request.data)
         if serializer.is_valid():
             ls = serializer.validated_data['ls']
-            result = check_ls(ls)
+            result = async_to_sync(check_ls)(ls)
             if 'error' in result:
                 return Response(result, status=status.HTTP_400_BAD_REQUEST)
             return Response(result, status=status.HTTP_200_OK)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+# Счетчики кэша проверок лицевых счетов (в пределах процесса)
+class AccountCheckCacheStatsView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAdmin | IsSupervisor]
+
+    def get(self, request):
+        return Response(account_checks.stats(), status=status.HTTP_200_OK)
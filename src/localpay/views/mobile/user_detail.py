@@ -2,9 +2,10 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from localpay.authentication import CachedJWTAuthentication
 from localpay.models import User_mon
-from localpay.serializers.user import UserSerializer
+from localpay.serializers.user import MobileUserSerializer
+from localpay.services.user_projections import with_latest_comments
 from localpay.permission import IsUser
 import json
 from .logging_config import mobile_detail_user_logger
@@ -12,14 +13,15 @@ from .logging_config import mobile_detail_user_logger
 
 # Detail Payment for user
 class MobileUserDetailAPIView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsUser]
 
     def get(self, request):
         user = request.user  # Получаем пользователя из токена
 
         try:
-            user_instance = User_mon.objects.get(pk=user.id)
+            # последние операции; вся история - mobile/user-comments/
+            user_instance = with_latest_comments(User_mon.objects.all()).get(pk=user.id)
         except User_mon.DoesNotExist:
 
             error_message = {'Message':f'User with ID {user.id} not found.'}
@@ -27,7 +29,7 @@ class MobileUserDetailAPIView(APIView):
 
             return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = UserSerializer(user_instance)
+        serializer = MobileUserSerializer(user_instance)
 
         info_message = {'Message':f'User {user_instance} accessed their detail information.'}
         mobile_detail_user_logger.info(json.dumps(info_message))
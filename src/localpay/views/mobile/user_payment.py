@@ -1,52 +1,52 @@
 from rest_framework.response import Response
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from localpay.authentication import CachedJWTAuthentication
 from rest_framework import status
+from django.core.cache import cache
+from drf_yasg.utils import swagger_auto_schema
 from localpay.permission import IsUser
 from localpay.models import Pays
-from localpay.models import User_mon
 from localpay.views.payment_views.payment_history import PaymentHistoryListAPIView
+from localpay.serializers.payment_serializers.payment_history_serializer import payment_history_rows, serialize_payment_history
+from localpay.schema.swagger_schema import month_param
+from localpay.services.mobile_history import history_cache_key, mobile_history_settings, month_bounds, parse_month
+from localpay.services.payment_rollup import period_count
+from localpay.utils import filter_paid_period
 from .logging_config import mobile_detail_user_logger
 import json
-from datetime import datetime
 
 
 class MobileUserPaymentHistoryListAPIView(PaymentHistoryListAPIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsUser]
 
-    def get_queryset(self):
-        user = self.request.user
-        try:
-            info_message = {'Message':f'User {user.id} found for payments history request'}
-            mobile_detail_user_logger.info(json.dumps(info_message))
-
-        except User_mon.DoesNotExist:
+    def get_period(self):
+        first_day, last_day = month_bounds(self.month)
+        return first_day.isoformat(), last_day.isoformat()
 
-            error_message = {'Message':f'User with ID {user.id} not found.'}
-            mobile_detail_user_logger.warning(json.dumps(error_message))
-            return Pays.objects.none()
-        
-        now = datetime.now()
-        start_of_month = now.replace(day=1)
-        end_of_month = now.replace(month=now.month % 12 + 1 , day=1) if now.month < 12 else now.replace(month=1, year=now.year + 1)
+    def get_queryset(self):
+        # по индексу (user, -paid_at, -id)
+        queryset = filter_paid_period(Pays.objects.filter(user=self.request.user), *self.get_period())
+        return queryset.order_by('-paid_at', '-id')
 
-        return Pays.objects.filter(user=user ,created_at__gte=start_of_month, created_at__lt=end_of_month )
+    def known_count(self):
+        # количество за месяц - из сводки по дням
+        return period_count(*self.get_period(), user_id=self.request.user.pk)
 
+    @swagger_auto_schema(manual_parameters=[month_param])
     def list(self, request):
-        queryset = self.get_queryset()
-        total_count = queryset.count()
-
-        if total_count == 0:
-
-            error_message = {'Message':f'No payments found for user with ID {request.user.id}.'}
-            mobile_detail_user_logger.info(json.dumps(error_message))
-
-        info_message = {f'Payment history for user with ID {request.user.id} contains {total_count} records.'}
-        mobile_detail_user_logger.info(json.dumps(info_message))
-
-        serializer = self.get_serializer(queryset, many=True)
+        self.month = parse_month(request.query_params.get('month'))
+
+        # повторные запросы приложения отдаются из кэша, пока у монтажника не изменились платежи
+        key = history_cache_key(request.user, self.month, request.query_params)
+        data = cache.get(key)
+        if data is None:
+            # limit/offset или ?cursor= - постранично по (paid_at, id)
+            page = self.paginate_queryset(payment_history_rows(self.get_queryset()))
+            data = self.get_paginated_response(serialize_payment_history(page)).data
+            cache.set(key, data, mobile_history_settings()['TTL'])
+
+            info_message = {'Message': f'Payment history for user with ID {request.user.id} for {self.month:%Y-%m} '
+                                       f'contains {data.get("count")} records.'}
+            mobile_detail_user_logger.info(json.dumps(info_message))
 
-        return Response({
-            'count': total_count,
-            'results': serializer.data,
-        }, status=status.HTTP_200_OK)
+        return Response(data, status=status.HTTP_200_OK)
@@ -0,0 +1,77 @@
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.views import APIView
+from localpay.authentication import CachedJWTAuthentication
+from localpay.models import ComparisonReportJob
+from localpay.permission import IsAdmin, IsSupervisor
+from localpay.serializers.payment_serializers.comparison_report_serializer import (
+    ComparisonReportJobRequestSerializer, ComparisonReportJobSerializer,
+)
+from localpay.services.report_jobs import cancel_report_job, submit_report_job
+from .logging_config import payment_logger
+import json
+
+
+def job_links(request, job):
+    return {
+        'status_url': request.build_absolute_uri(reverse('payment-compare-job', args=[job.pk])),
+        'result_url': request.build_absolute_uri(reverse('payment-compare-job-result', args=[job.pk])),
+    }
+
+
+# Постановка сверки с Planup в очередь (считает воркер run_report_jobs)
+class ComparisonReportJobCreateView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAdmin | IsSupervisor]
+
+    def post(self, request):
+        serializer = ComparisonReportJobRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        installer = serializer.validated_data.get('user_id')
+
+        job, created = submit_report_job(
+            installer.pk if installer else None,
+            serializer.validated_data['date_from'],
+            serializer.validated_data['date_to'],
+            requested_by=request.user,
+        )
+
+        info_message = {'Message': f'User {request.user.login} requested comparison report job {job.pk} (new: {created})'}
+        payment_logger.info(json.dumps(info_message))
+
+        # готовый отчет с теми же параметрами - 200, новое или уже идущее задание - 202
+        code = status.HTTP_200_OK if job.status == ComparisonReportJob.DONE else status.HTTP_202_ACCEPTED
+        return Response({**ComparisonReportJobSerializer(job).data, **job_links(request, job)}, status=code)
+
+
+# Статус задания; DELETE - отмена
+class ComparisonReportJobDetailView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAdmin | IsSupervisor]
+
+    def get(self, request, pk):
+        job = get_object_or_404(ComparisonReportJob.objects.defer('result'), pk=pk)
+        return Response({**ComparisonReportJobSerializer(job).data, **job_links(request, job)})
+
+    def delete(self, request, pk):
+        job = get_object_or_404(ComparisonReportJob.objects.defer('result'), pk=pk)
+        cancel_report_job(job)
+        job.refresh_from_db(fields=['status', 'cancel_requested', 'finished_at'])
+
+        info_message = {'Message': f'User {request.user.login} cancelled comparison report job {job.pk}'}
+        payment_logger.info(json.dumps(info_message))
+        return Response(ComparisonReportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+# Результат готового задания (тот же формат, что у /api/user/payment-comparison/)
+class ComparisonReportJobResultView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAdmin | IsSupervisor]
+
+    def get(self, request, pk):
+        job = get_object_or_404(ComparisonReportJob, pk=pk)
+        if job.status != ComparisonReportJob.DONE:
+            return Response({'error': 'Отчет еще не готов', 'status': job.status}, status=status.HTTP_409_CONFLICT)
+        return Response(job.result)
@@ -1,77 +1,83 @@
 from rest_framework.generics import ListAPIView
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from localpay.authentication import CachedJWTAuthentication
 from localpay.permission import IsSupervisor , IsAdmin
 from localpay.models import Pays , User_mon 
-from localpay.serializers.payment_serializers.payment_history_serializer import PaymentHistorySerializer
-from localpay.schema.swagger_schema import search_param
+from localpay.serializers.payment_serializers.payment_history_serializer import (
+    PaymentHistorySerializer, payment_history_rows, serialize_payment_history,
+)
+from localpay.schema.swagger_schema import search_param, count_param
 from django.db.models import Q
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from drf_yasg.utils import swagger_auto_schema
-from datetime import datetime , timedelta , time
+from localpay.utils import filter_paid_period
+from localpay.services.payment_rollup import period_count, period_summary
 from .logging_config import payment_logger
+import csv
+import io
 import json
-from rest_framework.pagination import LimitOffsetPagination
-from rest_framework.response import Response
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from localpay.pagination import PaymentHistoryPagination
+from localpay.views.async_api import AsyncAPIView
+
+
+EXPORT_CHUNK_SIZE = 2000
+PAYMENT_HISTORY_EXPORT_FIELDS = (
+    'id', 'number_payment', 'date_payment', 'accept_payment', 'ls_abon', 'money', 'status_payment',
+    'annulment', 'user_id', 'login', 'user_name', 'planup_id',
+)
+
 
+def filter_payment_history(queryset, search_query='', date_from=None, date_to=None):
+    """Search and date filters of the payment history, newest first (shared by list and export)."""
+    # Фильтрация по поисковому запросу: монтажники ищутся отдельным подзапросом,
+    # чтобы и он, и ls_abon шли по trigram-индексам, а не по join всей таблицы
+    if search_query:
+        search_parts = search_query.split()
+        if len(search_parts) == 2:
+            name_query, surname_query = search_parts
+            users = User_mon.objects.filter(name__icontains=name_query, surname__icontains=surname_query)
+            queryset = queryset.filter(user__in=users.values('pk'))
+        else:
+            users = User_mon.objects.filter(
+                Q(login__icontains=search_query) |
+                Q(name__icontains=search_query) |
+                Q(surname__icontains=search_query)
+            )
+            queryset = queryset.filter(
+                Q(ls_abon__icontains=search_query) | Q(user__in=users.values('pk'))
+            )
 
-class CustomLimitOffsetPagination(LimitOffsetPagination):
-    default_limit = 50  # количество элементов на странице по умолчанию
-    limit_query_param = 'limit'  # параметр запроса для установки лимита
-    offset_query_param = 'offset'  # параметр запроса для установки смещения
+    # Фильтрация по датам (date_to включительно)
+    queryset = filter_paid_period(queryset, date_from, date_to)
+
+    return queryset.order_by('-paid_at', '-id')
 
-    def get_paginated_response(self, data):
-        return Response({
-            'count': self.count,               # Общее количество элементов
-            'limit': self.get_limit(self.request),    # Лимит (количество элементов на порцию)
-            'offset': self.get_offset(self.request),  # Текущее смещение
-            'results': data,                   # Данные текущей порции
-        })
 
 class PaymentHistoryListAPIView(ListAPIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAdmin | IsSupervisor]
     serializer_class = PaymentHistorySerializer
-    pagination_class = CustomLimitOffsetPagination  # Используем наш класс пагинации на основе смещения и лимита
+    pagination_class = PaymentHistoryPagination  # limit/offset, либо курсор по (paid_at, id) при ?cursor=
 
-    @swagger_auto_schema(manual_parameters=[search_param])
+    @swagger_auto_schema(manual_parameters=[search_param, count_param])
     def list(self, request, *args, **kwargs):
         search_query = request.query_params.get('search', '')
         date_from = request.query_params.get('date_from', None)
         date_to = request.query_params.get('date_to', None)
 
-        queryset = Pays.objects.all()
-
-        # Фильтрация по поисковому запросу
-        if search_query:
-            search_parts = search_query.split()
-            if len(search_parts) == 2:
-                name_query, surname_query = search_parts
-                queryset = queryset.filter(
-                    Q(user__name__icontains=name_query) & Q(user__surname__icontains=surname_query)
-                )
-            else:
-                queryset = queryset.filter(
-                    Q(ls_abon__icontains=search_query) |
-                    Q(user__login__icontains=search_query) |
-                    Q(user__name__icontains=search_query) |
-                    Q(user__surname__icontains=search_query)
-                )
-
-        # Фильтрация по датам
-        if date_from:
-            queryset = queryset.filter(date_payment__gte=datetime.fromisoformat(date_from))
-        if date_to:
-            # Если date_payment - это DateTimeField, включаем конечный день целиком
-            date_to_obj = datetime.fromisoformat(date_to) + timedelta(days=1)
-            date_to_end_of_day = datetime.combine(date_to_obj, time.max)
-            queryset = queryset.filter(date_payment__lte=date_to_end_of_day)
-
-        queryset = queryset.order_by('-date_payment')
-
-        # Количество всех записей
-        total_count = queryset.count()
+        queryset = filter_payment_history(Pays.objects.all(), search_query, date_from, date_to)
+
+        # Пагинация (смещение/лимит или курсор);
+        # строки берутся плоской выборкой с join на монтажника (без N+1)
+        page = self.paginate_queryset(payment_history_rows(queryset))
+
+        # Количество всех записей (пагинатор уже посчитал его; None при ?count=none и в режиме курсора)
+        total_count = self.paginator.count if page is not None else queryset.count()
 
         # Логирование
         info_message = {
@@ -80,16 +86,84 @@ class PaymentHistoryListAPIView(ListAPIView):
         }
         payment_logger.info(json.dumps(info_message))
 
-        # Применяем встроенную пагинацию DRF на основе смещения и лимита
-        page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            return self.get_paginated_response(serialize_payment_history(page))
 
-        # Если пагинация не применяется (например, когда количество объектов меньше, чем limit), возвращаем все данные
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Если пагинация не применяется, возвращаем все данные
+        return Response(serialize_payment_history(payment_history_rows(queryset)), status=status.HTTP_200_OK)
 
     def get_queryset(self):
         return Pays.objects.all()
-    
+
+    def known_count(self):
+        # без поиска количество за период дат берется из сводки по дням, а не COUNT(*) по платежам
+        params = self.request.query_params
+        if params.get('search'):
+            return None
+        return period_count(params.get('date_from'), params.get('date_to'))
+
+
+# Итоги платежей за период по дням и статусам (из сводки PaymentDailyRollup)
+class PaymentSummaryAPIView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAdmin | IsSupervisor]
+
+    def get(self, request, *args, **kwargs):
+        summary = period_summary(
+            request.query_params.get('date_from'), request.query_params.get('date_to'), request.query_params.get('user_id'),
+        )
+        if summary is None:
+            return Response({"error": "date_from и date_to обязательны (YYYY-MM-DD)"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary, status=status.HTTP_200_OK)
+
+
+async def stream_payment_history_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """CSV of the history, produced chunk by chunk from a server-side cursor.
+
+    Each chunk of `chunk_size` rows is fetched in the request's
+    thread-sensitive thread and written out before the next one is read,
+    so memory does not grow with the range and the header goes out at once.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data.encode('utf-8')
+
+    # BOM - чтобы Excel открыл кириллицу без мастера импорта
+    buffer.write('\ufeff')
+    writer.writerow(PAYMENT_HISTORY_EXPORT_FIELDS)
+    yield flush()
+
+    rows = payment_history_rows(queryset).iterator(chunk_size=chunk_size)
+    next_chunk = sync_to_async(lambda: list(islice(rows, chunk_size)))
+    while chunk := await next_chunk():
+        for row in serialize_payment_history(chunk):
+            writer.writerow([row[field] for field in PAYMENT_HISTORY_EXPORT_FIELDS])
+        yield flush()
+
+
+# Выгрузка истории платежей в CSV потоком (те же фильтры, что у списка)
+class PaymentHistoryExportAPIView(AsyncAPIView):
+    permission_classes = [IsAdmin | IsSupervisor]
+
+    async def get(self, request, *args, **kwargs):
+        search_query = request.query_params.get('search', '')
+        date_from = request.query_params.get('date_from', None)
+        date_to = request.query_params.get('date_to', None)
+
+        queryset = filter_payment_history(Pays.objects.all(), search_query, date_from, date_to)
+
+        info_message = {
+            "Message": f"User {request.user.login} exported payment history with search '{search_query}' "
+                       f"Date from {date_from}, Date to {date_to}"
+        }
+        payment_logger.info(json.dumps(info_message))
+
+        response = StreamingHttpResponse(stream_payment_history_csv(queryset), content_type='text/csv; charset=utf-8')
+        filename = f"payments_{date_from or 'start'}_{date_to or 'now'}.csv"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -2,11 +2,14 @@ from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from localpay.authentication import CachedJWTAuthentication
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from localpay.models import User_mon 
-from localpay.serializers.user import UserSerializer , RegionSerializer
-from localpay.schema.swagger_schema import search_param
+from localpay.serializers.user import UserSerializer , UserListSerializer , UserDetailSerializer , RegionSerializer
+from localpay.schema.swagger_schema import search_param, count_param
+from localpay.services.listing_counts import count_mode, listing_count
+from localpay.services.user_projections import with_latest_comments
+from localpay.services.auth_user_cache import invalidate_auth_user
 from localpay.permission import IsUser , IsSupervisor , IsAdmin
 from .logging_config import user_logger
 import json
@@ -16,22 +19,23 @@ from drf_yasg.utils import swagger_auto_schema
 
 
 class UserDetailAPIView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes= [IsUser|IsAdmin|IsSupervisor]
     def get(self, request, pk):
         try:
-            user = User_mon.objects.get(pk=pk)
+            # последние операции одним запросом; вся история - users/<pk>/comments/
+            user = with_latest_comments(User_mon.objects.all()).get(pk=pk)
         except User_mon.DoesNotExist:
             return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = UserSerializer(user)
+        serializer = UserDetailSerializer(user)
         return Response(serializer.data)
 
 
 
 # Views for create user (unly admin)
 class CreateUserAPIView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAdmin]
     def post(self, request):
         serializer = UserSerializer(data=request.data)
@@ -45,7 +49,9 @@ class CreateUserAPIView(APIView):
             }
             user_logger.info(json.dumps(log_data))
 
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            user = serializer.instance
+            user.latest_comments = []  # у нового монтажника операций еще нет
+            return Response(UserDetailSerializer(user).data, status=status.HTTP_201_CREATED)
         
         log_data = {
             "action": "create_user_failed",
@@ -60,7 +66,7 @@ class CreateUserAPIView(APIView):
 
 # Views for update user (only admin)
 class UpdateUserAPIView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAdmin]
     def put(self, request, pk):
         try:
@@ -75,9 +81,11 @@ class UpdateUserAPIView(APIView):
         serializer = UserSerializer(user, data=request.data)
         if serializer.is_valid():
             serializer.save()
+            invalidate_auth_user(user.pk)
             success_message = {"Message": f"Successfully updated user with ID: {user.pk}"}
             user_logger.info(json.dumps(success_message))
-            return Response(serializer.data)
+            user = with_latest_comments(User_mon.objects.all()).get(pk=user.pk)
+            return Response(UserDetailSerializer(user).data)
         
         error_message = {"Message": f'Failed to update user with id {user.pk}' ,"Error": serializer.errors}
         user_logger.info(json.dumps(error_message))
@@ -86,7 +94,7 @@ class UpdateUserAPIView(APIView):
 
 # Views for delete users (only admin)
 class DeleteUserAPIView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAdmin]
 
     def delete(self, request, pk):
@@ -100,6 +108,7 @@ class DeleteUserAPIView(APIView):
         
 
         user.delete()
+        invalidate_auth_user(pk)
 
         success_message = {"Message": f"Successfully deleted user with id {pk}"}
         user_logger.info(json.dumps(success_message))
@@ -109,11 +118,11 @@ class DeleteUserAPIView(APIView):
 
 # list of all users (for admin and supervisor)
 class UserListAPIView(ListAPIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAdmin | IsSupervisor]
-    serializer_class = UserSerializer
+    serializer_class = UserListSerializer
 
-    @swagger_auto_schema(manual_parameters=[search_param])
+    @swagger_auto_schema(manual_parameters=[search_param, count_param])
     def list(self, request, *args, **kwargs):
         search_query = request.query_params.get('search', '').strip()
         fields = ['name', 'surname', 'login']
@@ -123,23 +132,37 @@ class UserListAPIView(ListAPIView):
         user_logger.info(json.dumps(info_message))
 
         queryset = User_mon.search_manager.search(query=search_query, fields=fields)
+        if not queryset.ordered:
+            queryset = queryset.order_by('pk')
 
-        total_count = queryset.count()
         page_size = int(request.query_params.get('page_size', 50))  
         page_number = request.GET.get('page', 1)
-        paginator = Paginator(queryset, page_size)
 
-        try:
-            users = paginator.page(page_number)
-        except PageNotAnInteger:
-            users = paginator.page(1)
-        except EmptyPage:
-            users = paginator.page(paginator.num_pages)
+        # один подсчет на запрос (?count=exact|estimate|none)
+        total_count = listing_count(queryset, count_mode(request))
+        if total_count is None:
+            try:
+                page_number = max(int(page_number), 1)
+            except (TypeError, ValueError):
+                page_number = 1
+            users = queryset[(page_number - 1) * page_size:page_number * page_size]
+            total_pages = None
+        else:
+            paginator = Paginator(queryset, page_size)
+            paginator.count = total_count  # Paginator не считает повторно
+
+            try:
+                users = paginator.page(page_number)
+            except PageNotAnInteger:
+                users = paginator.page(1)
+            except EmptyPage:
+                users = paginator.page(paginator.num_pages)
+            total_pages = paginator.num_pages
         serializer = self.get_serializer(users, many=True)
 
         return Response({
             'count': total_count, 
-            'total_pages': paginator.num_pages,  
+            'total_pages': total_pages,  
             'page_size': page_size,  
             'current_page': page_number, 
             'results': serializer.data,